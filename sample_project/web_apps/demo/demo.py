@@ -11,6 +11,7 @@ from wepps.stage.parameters import (
     Enumeration,
     FloatList,
     Boolean,
+    Array,
 )
 
 import plotly.graph_objects as go
@@ -111,6 +112,14 @@ s2_params = [
         ["First", "Second", "Third"],
     ),
     FloatList("n", r"$n$", r"Placeholder: for FloatList", r"Hover docs", False),
+    Array(
+        "samples",
+        "Samples",
+        "Placeholder: for Array, e.g. linspace(0, 1, 11)",
+        r"Hover docs",
+        True,
+        "linspace(0, 1, 11)",
+    ),
     Boolean("b", r"$\mathbb{B}$", "Placeholder: for Boolean", r"Hover docs", False),
 ]
 
@@ -165,7 +174,7 @@ def dummy_fig_1():
         )
     )
     fig.update_layout(margin=dict(l=0, r=0, b=0, t=0))
-    return fig.to_json()
+    return fig
 
 
 # ====================================================
@@ -175,7 +184,10 @@ def dummy_fig_1():
 
 class Demo(App):
     def __init__(self) -> None:
-        super().__init__(title="API Demonstration")
+        # The results only depend on the settings, so they can be cached.
+        # The declared settings stages are used to normalize the cache keys.
+        super().__init__(title="API Demonstration", cacheable=True)
+        self.settings = [s1_settings, s2_settings]
 
     def compute(self, response_data: dict[str, Any] | None) -> ResponseStages:
         # Create a response, where stages will be added to
@@ -200,8 +212,7 @@ class Demo(App):
         # knows the types corresponding to each parameter in a stateless manner
         S1_data = s1_settings.convert_to_types(response_data["S1"])
         if "S2" in response_data.keys():
-            S2_data = s2_settings.convert_to_types(response_data["S2"])
-            print(S2_data)
+            S2_data = s2_settings.convert_to_types(response_data["S2"])  # Used like S1_data
 
         # Imagine someone filled a field with some unrealistic value,
         # just raise an Exception to display an error message.
@@ -214,7 +225,8 @@ class Demo(App):
         except Exception as e:
             # Just to be sure, wrap the conversion in a try/except block
             # If i is set as an integer, then it can't be filled with something else.
-            # TODO: This conversion might automatically happen in the flask backend.
+            # As the stages are listed in self.settings, invalid values are already
+            # rejected before compute is called.
             raise ResponseError(f"Unknown Error: {str(e)}")
 
         # === Fill stages with data ===
@@ -232,6 +244,7 @@ class Demo(App):
         # --- Settings
         # Create a copy with the values from the response,
         # so that there is no global change of the parameters for another request.
+        # (The parameters themselves are not copied, only overlaid with the new values.)
         # Same reasoning as for the docs.
         # !!! Note, that for parameter values to stay the same after computation,
         #     a copy must be made.
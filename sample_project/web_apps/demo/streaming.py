@@ -0,0 +1,66 @@
+import time
+from typing import Any, Iterator
+
+import numpy as np
+import plotly.graph_objects as go
+
+from wepps.app import App, ResponseError, ResponseStages
+import wepps.stage.stages as stages
+from wepps.stage.parameters import StrictlyPositiveInteger
+
+d1_docs = stages.DocsStage(
+    "Streaming",
+    r"""
+The plots of this app are computed one after another.
+Each one is sent to the frontend as soon as it is finished,
+instead of waiting for all of them.
+""",
+)
+
+s1_params = [
+    StrictlyPositiveInteger(
+        "n", r"$n$", "Number of plots", r"How many plots are computed", False, 3
+    ),
+]
+s1_settings = stages.SettingsStage("S1", "Settings", s1_params, False)
+
+# Every plot takes a second, so requests can't keep a server thread busy for long
+MAX_PLOTS = 10
+
+
+def slow_fig(k: int):
+    time.sleep(1)  # Imagine an expensive computation here
+    x = np.linspace(0, 2 * np.pi, 200)
+    fig = go.Figure(data=go.Scatter(x=x, y=np.sin(k * x)))
+    fig.update_layout(margin=dict(l=0, r=0, b=0, t=0))
+    return fig
+
+
+class Streaming(App):
+    def __init__(self) -> None:
+        super().__init__(title="Streaming Demonstration")
+        # Invalid values of n are rejected before compute is called
+        self.settings = [s1_settings]
+
+    def compute(
+        self, response_data: dict[str, Any] | None
+    ) -> Iterator[ResponseStages]:
+        # Every yielded response replaces the previous one in the frontend,
+        # so the same response is filled and yielded after each step.
+        r = ResponseStages()
+        r.add_docs_stage(d1_docs)
+        if not response_data:
+            r.add_settings_stage(s1_settings)
+            yield r
+            return
+
+        S1_data = s1_settings.convert_to_types(response_data["S1"])
+        if S1_data["n"] > MAX_PLOTS:
+            raise ResponseError(f"At most {MAX_PLOTS} plots can be computed.")
+        r.add_settings_stage(s1_settings.copy_from_response(response_data["S1"]))
+        yield r  # Docs and settings first
+
+        for k in range(1, S1_data["n"] + 1):
+            p = stages.PlotsStage(rf"$\sin({k}x)$", plot=slow_fig(k))
+            r.add_plot_stage(p)
+            yield r
@@ -26,11 +26,39 @@ export interface SettingsProp {
 export interface PlotsStageProp {
   title: string;
   caption: string;
-  plot: string;
+  plot: string | object | null;
+  // Set if the plot is decimated, then details are loaded when zooming in
+  lod?: boolean;
+  index?: number;
+  request?: ComputeRequest;
 }
 
 export interface PlotsProp {
   plots: Array<PlotsStageProp>;
+  request: ComputeRequest;
+}
+
+export interface ComputeRequest {
+  [stage: string]: { [id: string]: string };
+}
+
+export interface StagesData {
+  docs: Array<DocsComponentsProps>;
+  settings: Array<SettingsStageProp>;
+  plots: Array<PlotsStageProp>;
+}
+
+// A stage of a delta response, without the stage if the frontend already holds it
+export interface DeltaEntry<T> {
+  hash: string;
+  stage?: T;
+}
+
+export interface DeltaData {
+  delta: number;
+  docs: Array<DeltaEntry<DocsComponentsProps>>;
+  settings: Array<DeltaEntry<SettingsStageProp>>;
+  plots: Array<DeltaEntry<PlotsStageProp>>;
 }
 
 export interface ParameterProp {
@@ -60,4 +88,5 @@ export enum ParameterType {
   Enumeration = 'Enumeration',
   FloatList = 'FloatList',
   Boolean = 'Boolean',
+  Array = 'Array',
 }
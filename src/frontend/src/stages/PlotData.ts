@@ -0,0 +1,53 @@
+// Numeric arrays of plots are sent as base64 encoded typed arrays,
+// i.e. {dtype: 'f8', bdata: '...', shape: 'rows, cols'}
+const typedArrays: { [dtype: string]: any } = {
+  f8: Float64Array,
+  f4: Float32Array,
+  i4: Int32Array,
+  u4: Uint32Array,
+  i2: Int16Array,
+  u2: Uint16Array,
+  i1: Int8Array,
+  u1: Uint8Array,
+};
+
+interface TypedArrayData {
+  dtype: string;
+  bdata: string;
+  shape?: string;
+}
+
+function decodeTypedArray(value: TypedArrayData) {
+  const binary = atob(value.bdata);
+  const bytes = new Uint8Array(binary.length);
+  for (let i = 0; i < binary.length; i++) {
+    bytes[i] = binary.charCodeAt(i);
+  }
+  const array = new typedArrays[value.dtype](bytes.buffer);
+
+  // Split 2D arrays into their rows
+  const shape = value.shape ? value.shape.split(',').map(Number) : [];
+  if (shape.length !== 2) return array;
+  const [rows, cols] = shape;
+  return Array.from({ length: rows }, (_, i) =>
+    array.subarray(i * cols, (i + 1) * cols)
+  );
+}
+
+function decode(value: any): any {
+  if (Array.isArray(value)) return value.map(decode);
+  if (value !== null && typeof value === 'object') {
+    if (typeof value.bdata === 'string' && value.dtype in typedArrays) {
+      return decodeTypedArray(value);
+    }
+    return Object.fromEntries(
+      Object.entries(value).map(([key, v]) => [key, decode(v)])
+    );
+  }
+  return value;
+}
+
+// Plots are either figure objects or (for older apps) JSON strings
+export function parsePlot(plot: string | object) {
+  return decode(typeof plot === 'string' ? JSON.parse(plot) : plot);
+}
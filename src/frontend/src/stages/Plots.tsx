@@ -12,10 +12,13 @@ function Plots(props: PlotsProp) {
           title={element.title}
           caption={element.caption}
           plot={element.plot}
+          lod={element.lod}
+          index={i}
+          request={props.request}
           key={i}
         />
       )),
-    [props.plots]
+    [props.plots, props.request]
   );
 
   return (
@@ -1,5 +1,6 @@
-import { useState, useMemo } from 'react';
+import { useState, useMemo, useEffect } from 'react';
 import { PlotsStageProp } from './Interfaces';
+import { parsePlot } from './PlotData';
 
 import ReactMarkdown from 'react-markdown';
 import remarkMath from 'remark-math';
@@ -7,19 +8,31 @@ import rehypeKatex from 'rehype-katex';
 
 import Plot from 'react-plotly.js';
 
+// Returns the [min, max] of an axis in a plotly relayout event, if it was zoomed
+function axisRange(event: any, axis: string) {
+  if (`${axis}.range` in event) return event[`${axis}.range`];
+  if (`${axis}.range[0]` in event) {
+    return [event[`${axis}.range[0]`], event[`${axis}.range[1]`]];
+  }
+  return null;
+}
+
 function PlotModal(props: {
   plot: PlotsStageProp;
+  figure: string | object | null;
+  onRelayout: (event: any) => void;
   toggleVisibility: Function;
 }) {
   const plot = () => {
-    if (props.plot.plot != null) {
-      const p = JSON.parse(props.plot.plot);
+    if (props.figure != null) {
+      const p = parsePlot(props.figure);
       return (
         <Plot
           data={p.data}
           layout={p.layout}
           style={{ width: '100%', minHeight: '58vh' }}
           config={{ responsive: true }}
+          onRelayout={props.onRelayout}
         />
       );
     } else {
@@ -85,13 +98,44 @@ function PlotModal(props: {
 function PlotsStage(props: PlotsStageProp) {
   const [visibleModal, setVisibleModal] = useState(false);
 
+  // The plot with more details for the zoomed range of a decimated plot
+  const [zoomed, setZoomed] = useState<object | null>(null);
+  useEffect(() => setZoomed(null), [props.plot]);
+  const figure = zoomed ?? props.plot;
+
   function toggleVisibility() {
     setVisibleModal((m) => !m);
   }
 
+  function onRelayout(event: any) {
+    if (!props.lod) return;
+    if (event['xaxis.autorange'] || event['yaxis.autorange']) {
+      setZoomed(null);
+      return;
+    }
+    const xRange = axisRange(event, 'xaxis');
+    const yRange = axisRange(event, 'yaxis');
+    if (xRange === null && yRange === null) return;
+
+    fetch(`${window.location.pathname}/zoom`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({
+        request: props.request,
+        plot: props.index,
+        x_range: xRange,
+        y_range: yRange,
+      }),
+    })
+      .then((response) => (response.ok ? response.json() : null))
+      // Otherwise the decimated plot is just shown larger
+      .then((data) => data && setZoomed(data.plot))
+      .catch(console.error);
+  }
+
   function makePlot() {
-    if (props.plot != null) {
-      const p = JSON.parse(props.plot);
+    if (figure != null) {
+      const p = parsePlot(figure);
       return (
         <>
           <Plot
@@ -99,6 +143,7 @@ function PlotsStage(props: PlotsStageProp) {
             layout={p.layout}
             style={{ width: '100%', minHeight: '20vh' }}
             config={{ responsive: true }}
+            onRelayout={onRelayout}
           />
 
           <div className='uk-section uk-section-xsmall uk-text-center'>
@@ -142,10 +187,15 @@ function PlotsStage(props: PlotsStageProp) {
   }
   const plot = useMemo(() => {
     return makePlot();
-  }, [props.plot]);
+  }, [figure, props.request]);
 
   const modal = visibleModal ? (
-    <PlotModal plot={props} toggleVisibility={toggleVisibility} />
+    <PlotModal
+      plot={props}
+      figure={figure}
+      onRelayout={onRelayout}
+      toggleVisibility={toggleVisibility}
+    />
   ) : (
     <></>
   );
@@ -5,8 +5,14 @@ import Settings from './Settings';
 import InfoBar from '../infobar/InfoBar';
 
 import axios from 'axios';
-import { useEffect, useState } from 'react';
-import { ParameterValue } from './Interfaces';
+import { useEffect, useRef, useState } from 'react';
+import {
+  ComputeRequest,
+  DeltaData,
+  DeltaEntry,
+  ParameterValue,
+  StagesData,
+} from './Interfaces';
 
 interface Parameters {
   [stage: string]: {
@@ -22,9 +28,12 @@ interface Parameters {
 
 function Stages() {
   // The received data which are only changed, whenever the compute request is sent
-  const [docsData, setDocsData] = useState([]);
-  const [settingsData, setSettingsData] = useState([]);
-  const [plotsData, setPlotsData] = useState([]);
+  const [docsData, setDocsData] = useState<StagesData['docs']>([]);
+  const [settingsData, setSettingsData] = useState<StagesData['settings']>([]);
+  const [plotsData, setPlotsData] = useState<StagesData['plots']>([]);
+
+  // The request of the shown stages, decimated plots are zoomed into with it
+  const [request, setRequest] = useState<ComputeRequest>({});
 
   // The parameter values which are sent back to the server
   const [parameters, setParameters] = useState<Parameters>({});
@@ -32,12 +41,86 @@ function Stages() {
   // The invalid parameters that define the errors in the info bar
   const [invalidParameters, setInvalidParameters] = useState<string[]>([]);
 
+  // The received stages by their hash, the server only sends the hash of
+  // stages that are already known
+  const knownStages = useRef(new Map<string, any>());
+  const shownHashes = useRef<string[]>([]);
+  const pendingRequests = useRef(0);
+
+  // Replace the hashes of a delta response by the stages
+  function resolveStages(data: StagesData | DeltaData): StagesData {
+    if (!('delta' in data)) return data;
+    const hashes: string[] = [];
+    function resolve<T>(entries: Array<DeltaEntry<T>>): Array<T> {
+      return entries.map((entry) => {
+        if (entry.stage !== undefined) {
+          knownStages.current.set(entry.hash, entry.stage);
+        }
+        hashes.push(entry.hash);
+        return knownStages.current.get(entry.hash);
+      });
+    }
+    const stages = {
+      docs: resolve(data.docs),
+      settings: resolve(data.settings),
+      plots: resolve(data.plots),
+    };
+    shownHashes.current = hashes;
+    return stages;
+  }
+
+  // Only keep the shown stages, once no response can refer to others anymore
+  function forgetHiddenStages() {
+    const shown = new Set(shownHashes.current);
+    for (const hash of Array.from(knownStages.current.keys())) {
+      if (!shown.has(hash)) knownStages.current.delete(hash);
+    }
+  }
+
+  // Set all stages with the data
+  function setStages(received: StagesData | DeltaData) {
+    const data = resolveStages(received);
+    setDocsData(() => data.docs);
+    setSettingsData(() => data.settings);
+    setPlotsData(() => data.plots);
+  }
+
+  // If the server runs the computation as a background job, it answers with
+  // 202 and the job id, so poll for the result until it is finished
+  function awaitJob(job: { job: string }): Promise<StagesData> {
+    return axios
+      .get(`${window.location.pathname}/jobs/${job.job}/result`, {
+        params: { wait: 10 },
+      })
+      .then((response) =>
+        response.status === 202 ? awaitJob(response.data) : response.data
+      );
+  }
+
+  // Streamed results are newline-delimited JSON, where each line contains
+  // all stages computed so far
+  async function readStream(response: Response) {
+    const reader = response.body!.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    for (;;) {
+      const { value, done } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+      const lines = buffer.split('\n');
+      buffer = lines.pop()!;
+      for (const line of lines.filter((l) => l !== '')) {
+        const data = JSON.parse(line);
+        if ('error' in data) throw data.error;
+        setStages(data);
+      }
+    }
+  }
+
   // Compute sends the data and sets the returned data into this stage
   function computeCallback() {
     // Pack up the paramters into a compact object that will be send
-    const data: {
-      [stage: string]: { [id: string]: string };
-    } = {};
+    const data: ComputeRequest = {};
     Object.keys(parameters).forEach((stageKey) => {
       const stage = parameters[stageKey];
       data[stageKey] = {};
@@ -58,27 +141,53 @@ function Stages() {
       });
     }
 
-    axios
-      .post(`${window.location.pathname}/compute`, data)
-      .then((response) => {
-        // Remove the spinner if it exists
-        // @ts-expect-error
-        if (notification !== null) notification.close();
+    pendingRequests.current += 1;
+    fetch(`${window.location.pathname}/compute`, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+        Accept: 'application/x-ndjson, application/json;q=0.9',
+        // Unchanged stages are then only sent as hash
+        'X-Wepps-Delta': '1',
+        'X-Wepps-Stages': Array.from(knownStages.current.keys()).join(','),
+      },
+      body: JSON.stringify(data),
+    })
+      .then(async (response) => {
+        // Errors are sent as text, invalid settings as JSON with the message in `error`
+        const type = response.headers.get('Content-Type') || '';
+        if (!response.ok) {
+          throw type.startsWith('application/json')
+            ? (await response.json()).error
+            : await response.text();
+        }
 
-        // Set all stages with the data
-        setDocsData(() => response.data.docs);
-        setSettingsData(() => response.data.settings);
-        setPlotsData(() => response.data.plots);
+        if (type.startsWith('application/x-ndjson')) {
+          return readStream(response);
+        } else if (response.status === 202) {
+          return awaitJob(await response.json()).then(setStages);
+        }
+        setStages(await response.json());
       })
+      .then(() => setRequest(data))
       .catch((error) => {
+        if (typeof error === 'string') {
+          // @ts-expect-error
+          UIkit.notification(error, 'danger');
+        } else if (error.response && error.response.status === 400) {
+          const data = error.response.data;
+          // @ts-expect-error
+          UIkit.notification(data.error ?? data, 'danger');
+        } else {
+          console.error(error);
+        }
+      })
+      .finally(() => {
         // Remove the spinner if it exists
         // @ts-expect-error
         if (notification !== null) notification.close();
-
-        if (error.response.status === 400) {
-          // @ts-expect-error
-          UIkit.notification(error.response.data, 'danger');
-        }
+        pendingRequests.current -= 1;
+        if (pendingRequests.current === 0) forgetHiddenStages();
       });
   }
 
@@ -155,7 +264,7 @@ function Stages() {
             />
           </div>
           <div>
-            <Plots plots={plotsData} />
+            <Plots plots={plotsData} request={request} />
           </div>
         </div>
       </div>
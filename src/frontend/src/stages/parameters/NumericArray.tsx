@@ -0,0 +1,36 @@
+import NumberField from './NumberField';
+
+// Evenly spaced values, e.g. linspace(0, 1, 11)
+const linspace = /linspace\(\s*[^,()]+\s*,\s*[^,()]+\s*,\s*\d+\s*\)/g;
+
+function checkValidity(vl: string) {
+  const values = vl
+    .replace(linspace, ' ')
+    .split(/[\s,;]+/)
+    .filter((v) => v !== '');
+  return vl.trim() !== '' && values.every((v) => !isNaN(+v));
+}
+
+function NumericArray(props: {
+  id: string;
+  name: string;
+  value: string;
+  placeholder: string;
+  doc: string;
+  updateParameter: Function;
+}) {
+  return (
+    <NumberField
+      id={props.id}
+      name={props.name}
+      defaultValue={props.value}
+      placeholder={props.placeholder}
+      doc={props.doc}
+      updateParameter={props.updateParameter}
+      scalar={false}
+      checkValidity={checkValidity}
+    />
+  );
+}
+
+export default NumericArray;
@@ -9,6 +9,7 @@ import Enumeration from './Enumeration';
 import Float from './Float';
 import FloatList from './FloatList';
 import Integer from './Integer';
+import NumericArray from './NumericArray';
 import PositiveFloat from './PositiveFloat';
 import PositiveInteger from './PositiveInteger';
 import StrictlyPositiveInteger from './StrictlyPositiveInteger';
@@ -94,6 +95,17 @@ function Parameter(props: ParameterProp) {
             updateParameter={props.updateParameter}
           />
         );
+      case ParameterType.Array:
+        return (
+          <NumericArray
+            id={props.id}
+            name={props.name}
+            value={props.value}
+            placeholder={props.placeholder}
+            doc={props.doc}
+            updateParameter={props.updateParameter}
+          />
+        );
       case ParameterType.Boolean:
         return (
           <Boolean
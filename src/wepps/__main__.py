@@ -0,0 +1,120 @@
+import argparse
+import os
+
+import wepps
+from wepps import Site
+from wepps.compression import COMPRESSIBLE_EXTENSIONS, write_compressed
+from wepps.serving import SERVERS
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m wepps",
+        description="Run from the project folder, i.e. next to the README.md.",
+    )
+    parser.add_argument(
+        "--apps-path", default="web_apps", help="The folder containing the web apps."
+    )
+    parser.add_argument(
+        "--no-escape-html",
+        action="store_true",
+        help="Don't escape html inside of the markdown files.",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export = commands.add_parser(
+        "export", help="Pre-render all pages into a folder for a static web server."
+    )
+    export.add_argument("out_dir", help="The folder the files are written to.")
+    export.add_argument(
+        "--application-root", default="", help="The root the site is served at."
+    )
+    export.add_argument(
+        "--no-compress", action="store_true", help="Don't write .gz/.br files."
+    )
+
+    profile = commands.add_parser(
+        "profile-startup",
+        help="Start the site once and report where the startup spends its time.",
+    )
+    profile.add_argument("--json", help="Also write the report as JSON to this file.")
+    profile.add_argument(
+        "--lazy-apps", action="store_true", help="Only scan for apps, see Site."
+    )
+
+    serve = commands.add_parser(
+        "serve", help="Serve the site with several worker processes for production."
+    )
+    serve.add_argument("--host", default="0.0.0.0", help="The host to listen on.")
+    serve.add_argument("--port", type=int, default=8000, help="The port to listen on.")
+    serve.add_argument(
+        "--workers", type=int, help="The number of worker processes, by default the number of CPUs."
+    )
+    serve.add_argument(
+        "--threads", type=int, default=8, help="The number of threads per worker."
+    )
+    serve.add_argument(
+        "--server",
+        choices=SERVERS,
+        default="auto",
+        help="The WSGI server, 'auto' uses gunicorn if it is installed.",
+    )
+    serve.add_argument(
+        "--lazy-apps", action="store_true", help="Only scan for apps, see Site."
+    )
+    serve.add_argument(
+        "--no-preload",
+        action="store_true",
+        help="Let every worker import lazy apps and load datasets on their first request.",
+    )
+
+    commands.add_parser(
+        "compress-assets",
+        help="Write .gz/.br files next to the built frontend files, which are then served instead.",
+    )
+
+    args = parser.parse_args()
+
+    if args.command == "export":
+        site = Site(
+            apps_path=args.apps_path,
+            application_root=args.application_root,
+            escape_html_in_md=not args.no_escape_html,
+            verbose=True,
+        )
+        site.export(args.out_dir, compress=not args.no_compress)
+    elif args.command == "profile-startup":
+        site = Site(
+            apps_path=args.apps_path,
+            escape_html_in_md=not args.no_escape_html,
+            lazy_apps=args.lazy_apps,
+            profile_startup=True,
+        )
+        if args.json:
+            with open(args.json, "w") as f:
+                f.write(site.startup_profile.to_json())
+    elif args.command == "serve":
+        site = Site(
+            apps_path=args.apps_path,
+            escape_html_in_md=not args.no_escape_html,
+            lazy_apps=args.lazy_apps,
+        )
+        site.run(
+            production=True,
+            host=args.host,
+            port=args.port,
+            workers=args.workers,
+            threads=args.threads,
+            preload=not args.no_preload,
+            server=args.server,
+        )
+    elif args.command == "compress-assets":
+        folder = os.path.join(os.path.dirname(wepps.__file__), "static", "assets")
+        for file in sorted(os.listdir(folder)):
+            if file.endswith(COMPRESSIBLE_EXTENSIONS):
+                for path in write_compressed(os.path.join(folder, file)):
+                    print(f"Written {path}")
+
+
+if __name__ == "__main__":
+    main()
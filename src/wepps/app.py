@@ -1,6 +1,14 @@
 from wepps.stage.stages import DocsStage, SettingsStage, PlotsStage
+from wepps.datasets import Dataset
 
-from typing import Any
+import asyncio
+import inspect
+from typing import TYPE_CHECKING, Any, AsyncIterator, Awaitable, Iterator
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from wepps.producers import StageProducer
 
 
 class ResponseError(Exception):
@@ -28,17 +36,218 @@ class ResponseStages:
     ) -> tuple[list[DocsStage], list[SettingsStage], list[PlotsStage]]:
         return (self.docs, self.settings, self.plots)
 
+    def serialize(self) -> dict[str, Any]:
+        return {
+            "docs": [stage.serialize() for stage in self.docs],
+            "settings": [stage.serialize() for stage in self.settings],
+            "plots": [stage.serialize() for stage in self.plots],
+        }
+
+
+ComputeResult = (
+    ResponseStages
+    | Iterator[ResponseStages]
+    | Awaitable[ResponseStages]
+    | AsyncIterator[ResponseStages]
+)
+
+
+def iterate_stages(stages: ComputeResult) -> Iterator[ResponseStages]:
+    """Iterates over the (partial) results of a compute call in synchronous
+    code. The coroutine or async generator of an `async def` compute function
+    is run in an event loop of its own.
+    """
+    if isinstance(stages, ResponseStages):
+        yield stages
+    elif inspect.iscoroutine(stages):
+        yield asyncio.run(stages)
+    elif inspect.isasyncgen(stages):
+        loop = asyncio.new_event_loop()
+        try:
+            while True:
+                try:
+                    yield loop.run_until_complete(stages.__anext__())
+                except StopAsyncIteration:
+                    break
+        finally:
+            loop.run_until_complete(stages.aclose())
+            loop.close()
+    else:
+        yield from stages
+
+
+def collect_stages(stages: ComputeResult) -> ResponseStages:
+    """Returns the final stages of a compute call. If compute is a generator,
+    every yielded ResponseStages replaces the previous one, so the last is used.
+
+    Raises:
+        ResponseError: If the generator didn't yield anything.
+    """
+    if isinstance(stages, ResponseStages):
+        return stages
+    result = None
+    for result in iterate_stages(stages):
+        pass
+    if result is None:
+        raise ResponseError('The computation did not return any stages.')
+    return result
+
+
+async def collect_stages_async(stages: ComputeResult) -> ResponseStages:
+    """Same as `collect_stages`, but awaits `async def` compute functions in
+    the running event loop.
+    """
+    if inspect.isawaitable(stages):
+        stages = await stages
+    if inspect.isasyncgen(stages):
+        result = None
+        async for result in stages:
+            pass
+        if result is None:
+            raise ResponseError('The computation did not return any stages.')
+        return result
+    return collect_stages(stages)
+
 
 class App:
 
-    def __init__(self, title) -> None:
+    def __init__(
+        self,
+        title,
+        cacheable: bool = False,
+        cache_ignored_stages: list[str] | None = None,
+        convert_settings: bool = False,
+        concurrency: str = "shared",
+        max_concurrent: int | None = None,
+        queue_timeout: float | None = 10,
+    ) -> None:
+        """Create a new app.
+
+        Args:
+            title (str): The title of the app.
+            cacheable (bool): If the results of `compute` only depend on the settings and can be cached.
+            cache_ignored_stages (list[str] | None): Ids of settings stages that don't influence the result.
+            convert_settings (bool): If `compute` receives the values of the stages in `settings`
+                already converted to the types of the parameters instead of the raw values.
+            concurrency (str): How concurrent requests are computed, 'shared' if the app is thread-safe,
+                'locked' to compute one request at a time, 'thread' for an instance per server thread
+                or 'process' for instances in worker processes.
+            max_concurrent (int | None): The maximal number of requests computed at the same time,
+                None for no limit. For 'process' apps, this is also the number of worker processes.
+            queue_timeout (float | None): Seconds a request waits for a free slot before the app is
+                reported as busy, None to wait forever.
+        """
         self.title = title
         if self.title == '':
             raise NotImplementedError('App has no title')
+        self.cacheable = cacheable
+        self.cache_ignored_stages: list[str] = cache_ignored_stages or []
+        self.convert_settings = convert_settings
+        self.concurrency = concurrency
+        self.max_concurrent = max_concurrent
+        self.queue_timeout = queue_timeout
         self.docs: list[DocsStage] = []
+        # Validated before compute is called and used to normalize cache keys
         self.settings: list[SettingsStage] = []
         self.plots: list[PlotsStage] = []
+        # Loaded once per site and shared by all workers, see `dataset`
+        self.datasets: list[Dataset] = []
+        # Compute the docs and plots stages by default, see `produce_stages`
+        self.producers: list["StageProducer"] = []
 
-    def compute(self, response_data: dict[str, Any] | None) -> ResponseStages:
+    def dataset(self, name: str) -> np.ndarray:
+        """Returns the read-only array of a dataset declared in `datasets`.
+
+        Raises:
+            KeyError: If the app declares no dataset with this name.
+        """
+        for dataset in self.datasets:
+            if dataset.name == name:
+                return dataset.array
+        raise KeyError(name)
+
+    def compute(self, response_data: dict[str, Any] | None) -> ComputeResult:
         # response is None on initial request
+        # Might be a generator yielding the stages computed so far, which are
+        # then streamed to the frontend one after another
+        # Might also be `async def`, e.g. to wait for I/O, which is then awaited
+        # by the ASGI application of the site without blocking a thread
+        if self.producers:
+            return self.compute_stages(response_data)
         raise NotImplementedError('compute in App not implemented')
+
+    def settings_values(self, response_data: dict[str, Any]) -> dict[str, dict[str, Any]]:
+        """Returns the converted values of the settings stages declared in
+        `settings` which are in the response."""
+        values = {}
+        for stage in self.settings:
+            stage_data = response_data.get(stage.unique_name)
+            if isinstance(stage_data, dict):
+                # Already converted by the site if the app sets convert_settings
+                values[stage.unique_name] = (
+                    stage_data if self.convert_settings else stage.convert_to_types(stage_data)
+                )
+        return values
+
+    def produce_stages(
+        self, values: dict[str, dict[str, Any]], stages: ResponseStages
+    ) -> None:
+        """Adds the stages of all `producers` in their order. Only those whose
+        settings changed since they were cached are computed again, so e.g. a
+        setting only used by one plot doesn't recompute the others.
+
+        Args:
+            values (dict[str, dict[str, Any]]): The converted values of the settings stages.
+            stages (ResponseStages): The response the stages are added to.
+        """
+        for producer in self.producers:
+            stage = producer.produce(values)
+            if isinstance(stage, DocsStage):
+                stages.add_docs_stage(stage)
+            else:
+                stages.add_plot_stage(stage)
+
+    def compute_stages(self, response_data: dict[str, Any] | None) -> ResponseStages:
+        """The compute function of apps which declare `producers`. The initial
+        request gets the declared `docs`, `settings` and `plots`, later ones the
+        settings with the values of the request and the produced stages.
+        """
+        r = ResponseStages()
+        if not response_data:
+            for docs_stage in self.docs:
+                r.add_docs_stage(docs_stage)
+            for settings_stage in self.settings:
+                r.add_settings_stage(settings_stage)
+            for plots_stage in self.plots:
+                r.add_plot_stage(plots_stage)
+            return r
+
+        for stage in self.settings:
+            stage_data = response_data.get(stage.unique_name)
+            r.add_settings_stage(
+                stage.copy_from_response(stage_data) if isinstance(stage_data, dict) else stage
+            )
+        self.produce_stages(self.settings_values(response_data), r)
+        return r
+
+    @property
+    def is_async(self) -> bool:
+        compute = type(self).compute
+        return inspect.iscoroutinefunction(compute) or inspect.isasyncgenfunction(compute)
+
+    def compute_batch(
+        self, requests: list[dict[str, Any] | None]
+    ) -> list[ComputeResult]:
+        """Computes many requests at once, e.g. all points of a parameter sweep.
+
+        By default, the site runs `compute` for each request in a pool of workers.
+        Apps which can evaluate all parameter sets together (e.g. vectorized
+        with NumPy) override this, which is then called once for the whole batch.
+
+        Args:
+            requests (list[dict[str, Any] | None]): The requests of the batch.
+
+        Returns:
+            list[ComputeResult]: The stages of each request, in the same order.
+        """
+        return [self.compute(request) for request in requests]
@@ -0,0 +1,143 @@
+import asyncio
+import io
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, Awaitable, Callable
+
+if TYPE_CHECKING:
+    from wepps.site import Site
+
+Receive = Callable[[], Awaitable[dict[str, Any]]]
+Send = Callable[[dict[str, Any]], Awaitable[None]]
+
+
+def make_environ(scope: dict[str, Any], body: bytes) -> dict[str, Any]:
+    """Translates the scope of an ASGI HTTP request into a WSGI environ."""
+    root_path = scope.get("root_path", "")
+    path = scope["path"]
+    if root_path and path.startswith(root_path):
+        path = path[len(root_path) :]
+    server = scope.get("server") or ("localhost", 80)
+    client = scope.get("client") or ("", 0)
+
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        # WSGI strings are bytes decoded as latin-1
+        "SCRIPT_NAME": root_path.encode().decode("latin-1"),
+        "PATH_INFO": path.encode().decode("latin-1"),
+        "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+        "SERVER_NAME": str(server[0]),
+        "SERVER_PORT": str(server[1] or 0),
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "REMOTE_ADDR": client[0],
+        "REMOTE_PORT": str(client[1]),
+        "CONTENT_LENGTH": str(len(body)),
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": False,
+        "wsgi.run_once": False,
+    }
+    for name, value in scope.get("headers", []):
+        name = name.decode("latin-1").upper().replace("-", "_")
+        if name == "CONTENT_LENGTH":
+            continue
+        if name != "CONTENT_TYPE":
+            name = f"HTTP_{name}"
+        value = value.decode("latin-1")
+        environ[name] = f"{environ[name]},{value}" if name in environ else value
+    return environ
+
+
+def response_start(status: int, headers: list[tuple[str, str]]) -> dict[str, Any]:
+    return {
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in headers],
+    }
+
+
+class ASGIApp:
+    def __init__(self, site: "Site", threads: int | None = None) -> None:
+        """Serves a site as an ASGI application. Compute requests of apps with
+        an `async def` compute function are awaited directly, so thousands of
+        them can wait for I/O at the same time. All other requests, including
+        the synchronous (CPU-bound) compute functions, are handled by the flask
+        app in a pool of threads.
+
+        Args:
+            site (Site): The site to serve.
+            threads (int | None): The number of threads, None for the executors default.
+        """
+        self.site = site
+        self.executor = ThreadPoolExecutor(threads)
+
+    async def __call__(self, scope: dict[str, Any], receive: Receive, send: Send) -> None:
+        if scope["type"] == "lifespan":
+            await self.lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            raise ValueError(f'Unsupported ASGI scope "{scope["type"]}"!')
+
+        body = bytearray()
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            body += message.get("body", b"")
+            if not message.get("more_body", False):
+                break
+        environ = make_environ(scope, bytes(body))
+
+        app_name = self.site.async_compute_app(environ)
+        if app_name is not None:
+            response = await self.site.compute_response_async(app_name, environ)
+            await send(response_start(response.status_code, response.headers.to_wsgi_list()))
+            await send({"type": "http.response.body", "body": response.get_data()})
+        else:
+            await self.call_wsgi(environ, send)
+
+    async def call_wsgi(self, environ: dict[str, Any], send: Send) -> None:
+        loop = asyncio.get_running_loop()
+
+        def send_from_thread(message: dict[str, Any]) -> None:
+            # Waits until the message is sent, so slow clients slow down streams
+            asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+        def run() -> None:
+            status_headers: list[Any] = []
+
+            def start_response(status: str, headers: list[tuple[str, str]], exc_info: Any = None) -> None:
+                status_headers[:] = [int(status.split(" ", 1)[0]), headers]
+
+            started = False
+            body = self.site.flask_app(environ, start_response)
+            try:
+                for chunk in body:
+                    if not started:
+                        send_from_thread(response_start(*status_headers))
+                        started = True
+                    if chunk:
+                        send_from_thread(
+                            {"type": "http.response.body", "body": chunk, "more_body": True}
+                        )
+            finally:
+                if hasattr(body, "close"):
+                    body.close()
+            if not started:
+                send_from_thread(response_start(*status_headers))
+            send_from_thread({"type": "http.response.body", "body": b""})
+
+        await loop.run_in_executor(self.executor, run)
+
+    async def lifespan(self, receive: Receive, send: Send) -> None:
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                self.executor.shutdown(wait=False, cancel_futures=True)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
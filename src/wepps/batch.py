@@ -0,0 +1,100 @@
+import itertools
+from concurrent.futures import Future, as_completed
+from contextlib import AbstractContextManager
+from copy import deepcopy
+from typing import Any, Callable, Iterator
+
+from wepps.app import App
+from wepps.datasets import DatasetRegistry
+from wepps.jobs import WorkerPool
+
+
+def expand_sweep(
+    base: dict[str, Any] | None, sweep: dict[str, dict[str, list[Any]]]
+) -> list[dict[str, Any]]:
+    """Returns the Cartesian product of the swept parameter values, each
+    inserted into a copy of the base request.
+
+    Args:
+        base (dict[str, Any] | None): The request with the values of all other parameters.
+        sweep (dict[str, dict[str, list[Any]]]): The values per settings stage and parameter id,
+            e.g. {"S1": {"i": [1, 2, 3], "phi": [1, 2]}} for six requests.
+
+    Raises:
+        ValueError: If the sweep isn't a mapping of stages to parameters to lists.
+
+    Returns:
+        list[dict[str, Any]]: The requests, where the last parameter changes fastest.
+    """
+    axes = []
+    for stage_id, parameters in sweep.items():
+        if not isinstance(parameters, dict):
+            raise ValueError(f'The sweep of "{stage_id}" must map parameter ids to lists of values.')
+        for parameter_id, values in parameters.items():
+            if not isinstance(values, list):
+                raise ValueError(f'The sweep of "{stage_id}.{parameter_id}" must be a list of values.')
+            axes.append((stage_id, parameter_id, values))
+
+    requests = []
+    for combination in itertools.product(*(values for _, _, values in axes)):
+        request = deepcopy(base) if base else {}
+        for (stage_id, parameter_id, _), value in zip(axes, combination):
+            request.setdefault(stage_id, {})[parameter_id] = value
+        requests.append(request)
+    return requests
+
+
+class BatchRunner:
+    def __init__(
+        self,
+        apps: dict[str, App],
+        workers: int | None = None,
+        executor: str = "thread",
+        compute: Callable[[str, dict[str, Any] | None], dict[str, Any]] | None = None,
+        apps_path: str | None = None,
+        datasets: DatasetRegistry | None = None,
+        limit: Callable[[str], AbstractContextManager] | None = None,
+    ) -> None:
+        """Runs many compute requests of an app in parallel. The pool is only
+        started with the first batch.
+
+        Args:
+            apps (dict[str, App]): The app instances of the site.
+            workers (int | None): The number of workers, None for the executors default.
+            executor (str): Either 'process' or 'thread'.
+            compute (Callable[[str, dict[str, Any] | None], dict[str, Any]] | None): Computes and serializes
+                a request in the thread executor, by default directly with the app instance.
+            apps_path (str | None): The folder of the apps, see `WorkerPool`.
+            datasets (DatasetRegistry | None): The datasets of the site, see `WorkerPool`.
+            limit (Callable[[str], AbstractContextManager] | None): Limits the requests of an app
+                in the process executor, see `WorkerPool`.
+
+        Raises:
+            ValueError: If the executor is unknown.
+        """
+        self.pool = WorkerPool(apps, workers, executor, compute, limit, apps_path, datasets)
+
+    def run(
+        self, app_name: str, requests: list[tuple[int, dict[str, Any] | None]]
+    ) -> Iterator[tuple[int, Future]]:
+        """Submits all requests and yields them as soon as they are finished.
+
+        Args:
+            app_name (str): The name of the app, e.g. 'demo.demo'.
+            requests (list[tuple[int, dict[str, Any] | None]]): The requests with their index in the batch.
+
+        Yields:
+            tuple[int, Future]: The index and the finished future of a request.
+        """
+        futures = {
+            self.pool.submit(app_name, request_data): index for index, request_data in requests
+        }
+        try:
+            for future in as_completed(futures):
+                yield futures[future], future
+        finally:  # E.g. if the client disconnected from a stream
+            for future in futures:
+                future.cancel()
+
+    def shutdown(self) -> None:
+        self.pool.shutdown()
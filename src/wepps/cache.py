@@ -0,0 +1,179 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any
+
+from wepps.app import App
+from wepps.stage.validation import ValidationError
+
+
+def _canonical_default(value: Any) -> Any:
+    # NumPy arrays and scalars provide tolist, everything else falls back to repr
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    return repr(value)
+
+
+def make_cache_key(app: App, response_data: dict[str, Any] | None) -> str:
+    """Creates a content-addressed key for a compute request.
+
+    Settings stages declared in `app.settings` are normalized with
+    `convert_to_types`, so that e.g. "3" and "3.0" of a Float parameter result
+    in the same key. Stages listed in `app.cache_ignored_stages` are skipped.
+
+    Args:
+        app (App): The app the request is sent to.
+        response_data (dict[str, Any] | None): The response directly fed in from the frontend.
+
+    Returns:
+        str: A hex digest identifying the request.
+    """
+    stages = {stage.unique_name: stage for stage in app.settings}
+    normalized = {}
+    for stage_id, stage_data in (response_data or {}).items():
+        if stage_id in app.cache_ignored_stages:
+            continue
+        if stage_id in stages and isinstance(stage_data, dict):
+            try:
+                stage_data = {**stage_data, **stages[stage_id].convert_to_types(stage_data)}
+            except ValidationError:  # Invalid stages are kept as they were sent
+                pass
+        normalized[stage_id] = stage_data
+
+    canonical = json.dumps(
+        normalized, sort_keys=True, separators=(",", ":"), default=_canonical_default
+    )
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+class ResultCache:
+    def __init__(self, max_size: int = 128, ttl: float | None = None) -> None:
+        """Create an in-memory LRU cache for serialized compute results.
+
+        Args:
+            max_size (int): The maximal number of stored results.
+            ttl (float | None): Seconds after which a result expires, None to never expire.
+        """
+        self.max_size: int = max_size
+        self.ttl: float | None = ttl
+        self.hits: int = 0
+        self.misses: int = 0
+        self.lock = threading.Lock()
+        self.entries: OrderedDict[str, tuple[float, dict[str, Any]]] = OrderedDict()
+
+    def is_expired(self, created: float) -> bool:
+        return self.ttl is not None and time.time() - created > self.ttl
+
+    def get(self, key: str) -> dict[str, Any] | None:
+        with self.lock:
+            payload = self.load(key)
+            if payload is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return payload
+
+    def set(self, key: str, payload: dict[str, Any]) -> None:
+        with self.lock:
+            self.store(key, payload)
+
+    def load(self, key: str) -> dict[str, Any] | None:
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        created, payload = entry
+        if self.is_expired(created):
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        return payload
+
+    def store(self, key: str, payload: dict[str, Any]) -> None:
+        self.entries[key] = (time.time(), payload)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self),
+            "max_size": self.max_size,
+            "ttl": self.ttl,
+        }
+
+
+class DiskResultCache(ResultCache):
+    def __init__(
+        self, directory: str, max_size: int = 1024, ttl: float | None = None
+    ) -> None:
+        """Create an on-disk LRU cache, which survives restarts and is shared
+        between worker processes. Every result is stored as a JSON file, the
+        modification time is used for the LRU order and the TTL.
+
+        Args:
+            directory (str): The directory the results are stored in.
+            max_size (int): The maximal number of stored results.
+            ttl (float | None): Seconds after which a result expires, None to never expire.
+        """
+        super().__init__(max_size, ttl)
+        self.directory: str = directory
+        os.makedirs(self.directory, exist_ok=True)
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def files(self) -> list[str]:
+        return [
+            os.path.join(self.directory, f)
+            for f in os.listdir(self.directory)
+            if f.endswith(".json")
+        ]
+
+    def load(self, key: str) -> dict[str, Any] | None:
+        path = self.path(key)
+        try:
+            if self.is_expired(os.path.getmtime(path)):
+                os.remove(path)
+                return None
+            with open(path, "r") as f:
+                payload = json.load(f)
+        except (OSError, ValueError):
+            return None
+        os.utime(path)  # Mark as recently used
+        return payload
+
+    def store(self, key: str, payload: dict[str, Any]) -> None:
+        # Write to a temporary file first, so other processes never read partial files
+        tmp_path = f"{self.path(key)}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(payload, f, separators=(",", ":"))
+        os.replace(tmp_path, self.path(key))
+
+        files = self.files()
+        if len(files) > self.max_size:
+            files.sort(key=os.path.getmtime)
+            for path in files[: len(files) - self.max_size]:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def clear(self) -> None:
+        with self.lock:
+            for path in self.files():
+                os.remove(path)
+
+    def __len__(self) -> int:
+        return len(self.files())
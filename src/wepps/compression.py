@@ -0,0 +1,64 @@
+import gzip
+
+try:  # Brotli is optional, without it only gzip is used
+    import brotli
+except ImportError:
+    brotli = None
+
+# File types worth compressing, everything else (fonts, images) already is
+COMPRESSIBLE_EXTENSIONS = (".html", ".json", ".js", ".css", ".svg", ".txt", ".map")
+
+# Levels for compressing responses on the fly, trading size for speed
+DYNAMIC_LEVELS = {"gzip": 6, "br": 4}
+
+# Precompressed siblings of static files
+PRECOMPRESSED_EXTENSIONS = {"br": ".br", "gzip": ".gz"}
+
+
+def encodings() -> list[str]:
+    """Returns the supported content encodings, the preferred one first."""
+    return ["br", "gzip"] if brotli is not None else ["gzip"]
+
+
+def compress(data: bytes, encoding: str, level: int | None = None) -> bytes:
+    """Compresses data with the given content encoding.
+
+    Args:
+        data (bytes): The data to compress.
+        encoding (str): Either 'br' or 'gzip'.
+        level (int | None): The compression level (quality for brotli), None for the maximum.
+
+    Raises:
+        ValueError: If the encoding isn't supported.
+
+    Returns:
+        bytes: The compressed data.
+    """
+    if encoding == "gzip":
+        # A fixed mtime makes the output reproducible
+        return gzip.compress(data, 9 if level is None else level, mtime=0)
+    if encoding == "br" and brotli is not None:
+        return brotli.compress(data, quality=11 if level is None else level)
+    raise ValueError(f'Unsupported encoding "{encoding}"!')
+
+
+def write_compressed(path: str) -> list[str]:
+    """Writes precompressed `.gz` (and `.br`) siblings of a file, as they are
+    picked up by web servers like nginx (gzip_static/brotli_static).
+
+    Args:
+        path (str): The file to compress.
+
+    Returns:
+        list[str]: The paths of the written files.
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+
+    written = []
+    for encoding in encodings():
+        extension = PRECOMPRESSED_EXTENSIONS[encoding]
+        with open(path + extension, "wb") as f:
+            f.write(compress(data, encoding))
+        written.append(path + extension)
+    return written
@@ -0,0 +1,179 @@
+import asyncio
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Callable, Iterator
+
+from wepps.app import App, ResponseError, ResponseStages, collect_stages
+from wepps.jobs import (
+    _collect_batch_in_worker,
+    _collect_in_worker,
+    _compute_in_worker,
+    _init_worker,
+)
+
+CONCURRENCY_MODES = ("shared", "locked", "thread", "process")
+
+
+class ConcurrencyLimitError(ResponseError):
+    pass
+
+
+async def _acquire_async(lock: Any, timeout: float) -> bool:
+    # Only waits in a thread if the lock isn't free right away
+    if lock.acquire(blocking=False):
+        return True
+    waiting = asyncio.ensure_future(asyncio.to_thread(lock.acquire, True, timeout))
+    try:
+        return await asyncio.shield(waiting)
+    except asyncio.CancelledError:
+        # Release the lock if the thread still gets it after the request was cancelled
+        waiting.add_done_callback(lambda f: f.result() and lock.release())
+        raise
+
+
+class AppRunner:
+    def __init__(self, app_name: str, app: App) -> None:
+        """Runs the computations of an app according to its concurrency model:
+
+        - 'shared': All requests use the same instance at the same time, so the app must be thread-safe.
+        - 'locked': All requests use the same instance, but only one at a time.
+        - 'thread': Every thread of the server creates its own instance on first use.
+        - 'process': The requests are computed by instances in a pool of worker processes.
+
+        At most `app.max_concurrent` computations of the app run at the same
+        time, further requests wait up to `app.queue_timeout` seconds for a
+        free slot.
+
+        Args:
+            app_name (str): The name of the app, e.g. 'demo.demo'.
+            app (App): The instance created by the site.
+
+        Raises:
+            ValueError: If the concurrency model is unknown.
+        """
+        if app.concurrency not in CONCURRENCY_MODES:
+            raise ValueError(
+                f'Unknown concurrency "{app.concurrency}" of {app_name}, use one of {", ".join(CONCURRENCY_MODES)}!'
+            )
+        self.app_name: str = app_name
+        self.app: App = app
+        self.mode: str = app.concurrency
+        self.slots: threading.BoundedSemaphore | None = None
+        if app.max_concurrent is not None:
+            self.slots = threading.BoundedSemaphore(app.max_concurrent)
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.executor: ProcessPoolExecutor | None = None
+
+    def instance(self) -> App:
+        if self.mode != "thread":
+            return self.app
+        app = getattr(self.local, "app", None)
+        if app is None:
+            app = type(self.app)()
+            app.datasets = self.app.datasets  # The registered ones, which are already shared
+            self.local.app = app
+        return app
+
+    @contextmanager
+    def acquire(self) -> Iterator[App]:
+        """Waits for a free slot (and the lock of a 'locked' app) and yields
+        the instance to compute with.
+
+        Raises:
+            ConcurrencyLimitError: If no slot became free within `app.queue_timeout` seconds.
+        """
+        timeout = -1 if self.app.queue_timeout is None else self.app.queue_timeout
+        if self.slots is not None and not self.slots.acquire(timeout=timeout):
+            raise self.busy()
+        try:
+            if self.mode == "locked":
+                if not self.lock.acquire(timeout=timeout):
+                    raise self.busy()
+                try:
+                    yield self.app
+                finally:
+                    self.lock.release()
+            else:
+                yield self.instance()
+        finally:
+            if self.slots is not None:
+                self.slots.release()
+
+    @asynccontextmanager
+    async def acquire_async(self) -> AsyncIterator[App]:
+        """Same as `acquire`, but waits without blocking the event loop."""
+        timeout = -1 if self.app.queue_timeout is None else self.app.queue_timeout
+        if self.slots is not None and not await _acquire_async(self.slots, timeout):
+            raise self.busy()
+        try:
+            if self.mode == "locked":
+                if not await _acquire_async(self.lock, timeout):
+                    raise self.busy()
+                try:
+                    yield self.app
+                finally:
+                    self.lock.release()
+            else:
+                yield self.instance()
+        finally:
+            if self.slots is not None:
+                self.slots.release()
+
+    def busy(self) -> ConcurrencyLimitError:
+        return ConcurrencyLimitError(f"{self.app.title} is busy, please try again in a moment.")
+
+    def compute_in_process(
+        self,
+        request_data: dict[str, Any] | None,
+        worker: Callable[[str, dict[str, Any] | None], Any] = _compute_in_worker,
+    ) -> Any:
+        """Computes a request in the worker pool of a 'process' app.
+
+        Args:
+            request_data (dict[str, Any] | None): The request directly fed in from the frontend.
+            worker (Callable): The function run in the worker, by default it returns the
+                serialized stages.
+
+        Returns:
+            Any: The result of the worker function.
+        """
+        with self.acquire():
+            with self.lock:
+                if self.executor is None:
+                    self.executor = ProcessPoolExecutor(
+                        self.app.max_concurrent,
+                        initializer=_init_worker,
+                        initargs=(None, {self.app_name: self.app}),
+                    )
+            return self.executor.submit(
+                worker, self.app_name, request_data
+            ).result()
+
+    def compute(self, request_data: dict[str, Any] | None) -> dict[str, Any]:
+        """Computes a request and returns the serialized stages."""
+        if self.mode == "process":
+            return self.compute_in_process(request_data)
+        with self.acquire() as app:
+            return collect_stages(app.compute(request_data)).serialize()
+
+    def compute_stages(self, request_data: dict[str, Any] | None) -> ResponseStages:
+        """Computes a request and returns the stages themselves, e.g. to keep
+        their figures. The stages of a 'process' app are sent back from the worker."""
+        if self.mode == "process":
+            return self.compute_in_process(request_data, _collect_in_worker)
+        with self.acquire() as app:
+            return collect_stages(app.compute(request_data))
+
+    def compute_batch(self, requests: list[dict[str, Any] | None]) -> list[ResponseStages]:
+        """Computes all requests at once with `compute_batch` of the app and
+        returns the stages of each, for 'process' apps in the worker pool."""
+        if self.mode == "process":
+            return self.compute_in_process(requests, _collect_batch_in_worker)
+        with self.acquire() as app:
+            return [collect_stages(stages) for stages in app.compute_batch(requests)]
+
+    def shutdown(self) -> None:
+        if self.executor is not None:
+            self.executor.shutdown(cancel_futures=True)
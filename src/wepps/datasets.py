@@ -0,0 +1,150 @@
+import atexit
+import os
+import threading
+from multiprocessing import shared_memory
+from typing import Any, Callable
+
+import numpy as np
+
+
+class Dataset:
+    def __init__(
+        self,
+        name: str,
+        path: str | None = None,
+        loader: Callable[[], np.ndarray] | None = None,
+        dtype: str | None = None,
+        shape: tuple[int, ...] | None = None,
+        offset: int = 0,
+    ) -> None:
+        """A named NumPy array, which is loaded once per site and shared as
+        read-only view by all threads and worker processes.
+
+        Files are memory-mapped, so the operating system loads the used pages
+        once into its page cache. Arrays created by a loader are copied once
+        into shared memory, where worker processes attach to them.
+
+        Args:
+            name (str): The name of the dataset, unique within the site.
+            path (str | None): A .npy file or a raw binary file with the given `dtype` and `shape`.
+            loader (Callable[[], np.ndarray] | None): Creates the array instead of a file,
+                e.g. by computing a table.
+            dtype (str | None): The data type of a raw file.
+            shape (tuple[int, ...] | None): The shape of a raw file, None for a flat array.
+            offset (int): The number of bytes before the data in a raw file.
+
+        Raises:
+            ValueError: If not exactly one of `path` and `loader` is given, or a raw file has no dtype.
+        """
+        if (path is None) == (loader is None):
+            raise ValueError(f'Dataset "{name}" needs either a path or a loader!')
+        if path is not None and not path.endswith(".npy") and dtype is None:
+            raise ValueError(f'The raw file of dataset "{name}" needs a dtype!')
+        self.name = name
+        self.path = path
+        self.loader = loader
+        self.dtype = dtype
+        self.shape = shape
+        self.offset = offset
+        self.lock = threading.Lock()
+        self._array: np.ndarray | None = None
+        self._memory: shared_memory.SharedMemory | None = None
+        self._layout: tuple[str, tuple[int, ...], str] | None = None  # Name, shape and dtype in shared memory
+        self._owner: int | None = None  # The process which created the shared memory
+
+    @property
+    def array(self) -> np.ndarray:
+        """The read-only array, loaded on first access."""
+        array = self._array
+        if array is None:
+            with self.lock:
+                if self._array is None:
+                    self._array = self.load()
+                array = self._array
+        return array
+
+    def load(self) -> np.ndarray:
+        if self.path is not None:
+            if self.path.endswith(".npy"):
+                return np.load(self.path, mmap_mode="r")
+            return np.memmap(
+                self.path, dtype=self.dtype, mode="r", offset=self.offset, shape=self.shape
+            )
+
+        if self._layout is None:  # Not created by another process yet
+            data = np.ascontiguousarray(self.loader())
+            self._memory = shared_memory.SharedMemory(create=True, size=max(data.nbytes, 1))
+            self._layout = (self._memory.name, data.shape, data.dtype.str)
+            self._owner = os.getpid()
+            array = np.ndarray(data.shape, data.dtype, buffer=self._memory.buf)
+            array[...] = data
+        else:
+            name, shape, dtype = self._layout
+            self._memory = shared_memory.SharedMemory(name=name)
+            array = np.ndarray(shape, dtype, buffer=self._memory.buf)
+        array.flags.writeable = False
+        return array
+
+    def source(self) -> tuple[Any, ...]:
+        return (self.path, self.loader, self.dtype, self.shape, self.offset)
+
+    def close(self) -> None:
+        """Releases the array and removes the shared memory, if this process created it."""
+        with self.lock:
+            self._array = None
+            if self._memory is None:
+                return
+            try:
+                self._memory.close()
+            except BufferError:  # Views of the array are still in use
+                pass
+            if self._owner == os.getpid():
+                self._memory.unlink()
+                self._layout = None
+            self._memory = None
+
+    def __getstate__(self) -> dict[str, Any]:
+        # Sent to worker processes, which attach to the shared memory created here
+        if self.loader is not None:
+            self.array
+        state = self.__dict__.copy()
+        del state["lock"]
+        state["loader"] = None  # Might be a lambda, and isn't needed anymore
+        state["_array"] = None
+        state["_memory"] = None
+        state["_owner"] = None  # Only the creating process removes the shared memory
+        return state
+
+    def __setstate__(self, state: dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+
+
+class DatasetRegistry:
+    def __init__(self) -> None:
+        """The datasets of all apps of a site. Apps declaring a dataset with
+        the same name share the loaded array.
+        """
+        self.datasets: dict[str, Dataset] = {}
+        self.lock = threading.Lock()
+        atexit.register(self.close)
+
+    def add(self, dataset: Dataset) -> Dataset:
+        """Registers a dataset and returns the registered one with the same name.
+
+        Raises:
+            ValueError: If a different dataset with the same name was registered before.
+        """
+        with self.lock:
+            registered = self.datasets.setdefault(dataset.name, dataset)
+        if registered is not dataset and registered.source() != dataset.source():
+            raise ValueError(f'Dataset "{dataset.name}" is declared differently by several apps!')
+        return registered
+
+    def load_all(self) -> None:
+        for dataset in list(self.datasets.values()):
+            dataset.array
+
+    def close(self) -> None:
+        for dataset in list(self.datasets.values()):
+            dataset.close()
@@ -0,0 +1,68 @@
+import hashlib
+from typing import Any, Callable
+
+from wepps.stage.fragments import JSONFragment
+
+# The version of the delta protocol, requested by clients with the version header
+DELTA_VERSION = 1
+DELTA_HEADER = "X-Wepps-Delta"
+# The comma-separated hashes of the stages the client holds
+STAGES_HEADER = "X-Wepps-Stages"
+
+STAGE_KINDS = ("docs", "settings", "plots")
+
+
+def stage_hash(encoded: str) -> str:
+    """Returns the hash identifying the JSON encoding of a stage."""
+    return hashlib.blake2b(encoded.encode(), digest_size=8).hexdigest()
+
+
+def parse_known_stages(version: str | None, stages: str | None) -> set[str] | None:
+    """Returns the hashes of the stages a client holds, or None if it
+    doesn't request this version of the delta protocol.
+
+    Args:
+        version (str | None): The value of the version header.
+        stages (str | None): The value of the stages header.
+    """
+    if version is None or version.strip() != str(DELTA_VERSION):
+        return None
+    return {h.strip() for h in (stages or "").split(",") if h.strip()}
+
+
+def delta_payload(
+    payload: dict[str, Any], known: set[str], dumps: Callable[[Any], str]
+) -> dict[str, Any]:
+    """Replaces the serialized stages of a compute result by their hash and
+    the stage, or by only the hash if the client already holds the stage.
+
+    The stages are encoded once here and embedded as JSONFragments, so the
+    response doesn't encode them again. The payload isn't changed, as it might
+    be cached.
+
+    Args:
+        payload (dict[str, Any]): The serialized docs, settings and plots stages.
+        known (set[str]): The hashes of the stages the client holds. Hashes of sent
+            stages are added, so later parts of a stream can refer to them.
+        dumps (Callable[[Any], str]): Encodes stages that aren't JSONFragments yet.
+
+    Returns:
+        dict[str, Any]: The payload with {"hash": ..., "stage": ...} or {"hash": ...}
+            per stage and the protocol version as "delta".
+    """
+    delta: dict[str, Any] = {"delta": DELTA_VERSION}
+    for kind, stages in payload.items():
+        if kind not in STAGE_KINDS:
+            delta[kind] = stages
+            continue
+        entries = []
+        for stage in stages:
+            encoded = stage.json if isinstance(stage, JSONFragment) else dumps(stage)
+            digest = stage_hash(encoded)
+            if digest in known:
+                entries.append({"hash": digest})
+            else:
+                entries.append({"hash": digest, "stage": JSONFragment(stage, encoded)})
+                known.add(digest)
+        delta[kind] = entries
+    return delta
@@ -0,0 +1,119 @@
+import importlib
+import os
+import threading
+from collections.abc import Mapping
+from inspect import getmembers, isclass
+from types import ModuleType
+from typing import Callable, Iterator
+
+from wepps.app import App
+
+
+def find_app_class(name: str, module: ModuleType) -> type[App] | None:
+    """Returns the App subclass defined in a module.
+
+    Raises:
+        RuntimeError: If the module defines more than one app.
+    """
+    apps = [
+        a
+        for a in getmembers(module)
+        # If its a class, then check if its a subclass, but not the actual App-Class
+        if isclass(a[1]) and issubclass(a[1], App) and a[1] != App
+    ]
+    if len(apps) > 1:
+        raise RuntimeError(f"In {name} are multiple apps defined! Only define one!")
+    return apps[0][1] if apps else None
+
+
+def load_app_class(apps_path: str, name: str) -> type[App] | None:
+    """Imports the module of an app, e.g. 'demo.demo', and returns its app class.
+
+    Raises:
+        RuntimeError: If the module defines more than one app.
+    """
+    package = apps_path.replace("/", ".")
+    module = importlib.import_module(f"{package}.{name}")
+    return find_app_class(name, module)
+
+
+def scan_app_names(apps_path: str) -> list[str]:
+    """Returns the names of all modules inside of `apps_path`, e.g. 'demo.demo',
+    by only looking at the files, i.e. without importing anything.
+    """
+    names = []
+    for path, folders, files in os.walk(apps_path):
+        # Only descend into packages, as pkgutil.walk_packages does
+        folders[:] = sorted(
+            f for f in folders if os.path.exists(os.path.join(path, f, "__init__.py"))
+        )
+        package = os.path.relpath(path, apps_path).replace(os.sep, ".")
+        for file in sorted(files):
+            if not file.endswith(".py") or file == "__init__.py":
+                continue
+            name = file[:-3] if package == "." else f"{package}.{file[:-3]}"
+            names.append(name)
+    return names
+
+
+class LazyApps(Mapping):
+    def __init__(
+        self,
+        apps_path: str,
+        on_load: Callable[[str, App], None] | None = None,
+    ) -> None:
+        """A mapping of app names to app instances, where an app is only
+        imported and instantiated on first access. Modules which turn out not to
+        define an app are removed.
+
+        Args:
+            apps_path (str): The folder (and package) containing the web apps.
+            on_load (Callable[[str, App], None] | None): Called with every newly created app.
+        """
+        self.apps_path: str = apps_path
+        self.names: list[str] = scan_app_names(apps_path)
+        self.instances: dict[str, App] = {}
+        self.on_load = on_load
+        self.lock = threading.RLock()
+
+    def __getitem__(self, name: str) -> App:
+        app = self.instances.get(name)
+        if app is not None:
+            return app
+        if name not in self.names:
+            raise KeyError(name)
+
+        with self.lock:
+            if name in self.instances:  # Loaded by another thread in between
+                return self.instances[name]
+            app_class = load_app_class(self.apps_path, name)
+            if app_class is None:
+                self.names.remove(name)
+                raise KeyError(name)
+            app = app_class()  # Create an instance
+            self.instances[name] = app
+
+        if self.on_load is not None:
+            self.on_load(name, app)
+        return app
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(list(self.names))
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def load_all(self) -> None:
+        for name in self:
+            self.get(name)
+
+    def __getstate__(self) -> dict:
+        # Sent to worker processes without the lock and the callback of the site
+        state = self.__dict__.copy()
+        del state["lock"]
+        state["on_load"] = None
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self.lock = threading.RLock()
@@ -0,0 +1,309 @@
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import (
+    Executor,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    TimeoutError as FutureTimeoutError,
+)
+from contextlib import AbstractContextManager, nullcontext
+from multiprocessing import util
+from typing import Any, Callable
+
+from wepps.app import App, collect_stages
+from wepps.datasets import DatasetRegistry
+from wepps.discovery import load_app_class
+
+# The apps of a worker process, either set by the pool initializer or
+# imported by name on their first request
+_worker_apps: dict[str, App] = {}
+_worker_apps_path: str | None = None
+_worker_datasets: DatasetRegistry | None = None
+
+
+def _init_worker(
+    apps_path: str | None,
+    apps: dict[str, App] | None = None,
+    datasets: DatasetRegistry | None = None,
+) -> None:
+    global _worker_apps_path, _worker_datasets
+    _worker_apps_path = apps_path
+    _worker_datasets = datasets
+    _worker_apps.update(apps or {})
+    # Workers exit without the atexit handlers, but run the finalizers of multiprocessing
+    util.Finalize(None, _close_worker_datasets, exitpriority=0)
+
+
+def _close_worker_datasets() -> None:
+    # Removes the shared memory of the datasets which this worker loaded itself
+    for app in _worker_apps.values():
+        for dataset in app.datasets:
+            dataset.close()
+    if _worker_datasets is not None:
+        _worker_datasets.close()
+
+
+def _worker_args(
+    apps: dict[str, App], apps_path: str | None, datasets: DatasetRegistry | None
+) -> tuple[Any, ...]:
+    # Only the names are passed if possible, as `apps` might be lazy
+    if apps_path is not None:
+        return (apps_path, None, datasets)
+    return (None, dict(apps), datasets)
+
+
+def _worker_app(app_name: str) -> App:
+    app = _worker_apps.get(app_name)
+    if app is None:
+        app_class = None
+        if _worker_apps_path is not None:
+            app_class = load_app_class(_worker_apps_path, app_name)
+        if app_class is None:
+            raise KeyError(f'There is no app "{app_name}"!')
+        app = app_class()
+        if _worker_datasets is not None:  # Shared with the site, like its own apps
+            app.datasets = [_worker_datasets.add(dataset) for dataset in app.datasets]
+        _worker_apps[app_name] = app
+    return app
+
+
+def _compute_in_worker(app_name: str, request_data: dict[str, Any] | None):
+    return collect_stages(_worker_app(app_name).compute(request_data)).serialize()
+
+
+def _collect_in_worker(app_name: str, request_data: dict[str, Any] | None):
+    return collect_stages(_worker_app(app_name).compute(request_data))
+
+
+def _collect_batch_in_worker(app_name: str, requests: list[dict[str, Any] | None]):
+    return [collect_stages(stages) for stages in _worker_app(app_name).compute_batch(requests)]
+
+
+def _compute(app: App, request_data: dict[str, Any] | None):
+    return collect_stages(app.compute(request_data)).serialize()
+
+
+class WorkerPool:
+    def __init__(
+        self,
+        apps: dict[str, App],
+        workers: int | None = None,
+        executor: str = "process",
+        compute: Callable[[str, dict[str, Any] | None], dict[str, Any]] | None = None,
+        limit: Callable[[str], AbstractContextManager] | None = None,
+        apps_path: str | None = None,
+        datasets: DatasetRegistry | None = None,
+    ) -> None:
+        """Computes requests in a pool of threads or processes, which is only
+        started with the first request, so the site can be forked before.
+
+        The process executor submits the requests from as many threads as it has
+        processes, which hold the limit of the app while waiting for the result.
+
+        Args:
+            apps (dict[str, App]): The app instances of the site.
+            workers (int | None): The number of workers, None for the executors default.
+            executor (str): Either 'process' or 'thread'.
+            compute (Callable[[str, dict[str, Any] | None], dict[str, Any]] | None): Computes and serializes
+                a request in the thread executor, by default directly with the app instance.
+            limit (Callable[[str], AbstractContextManager] | None): Returns the context entered around
+                a request of an app computed by the process executor, e.g. `AppRunner.acquire`.
+            apps_path (str | None): The folder of the apps, from which the workers of the process
+                executor import an app by name on its first request. None to pass them the
+                instances in `apps` instead.
+            datasets (DatasetRegistry | None): The datasets of the site, shared with the apps
+                imported by the workers.
+
+        Raises:
+            ValueError: If the executor is unknown.
+        """
+        if executor not in ("process", "thread"):
+            raise ValueError(f'Unknown executor "{executor}"!')
+        self.apps: dict[str, App] = apps
+        self.workers: int | None = workers
+        self.executor_type: str = executor
+        self.compute = compute or (lambda app_name, data: _compute(self.apps[app_name], data))
+        self.limit = limit or (lambda app_name: nullcontext())
+        self.apps_path: str | None = apps_path
+        self.datasets: DatasetRegistry | None = datasets
+        self.executor: Executor | None = None
+        self.processes: ProcessPoolExecutor | None = None
+        self.lock = threading.Lock()
+
+    def get_executor(self) -> Executor:
+        with self.lock:
+            if self.executor is None:
+                if self.executor_type == "process":
+                    workers = self.workers or os.cpu_count() or 1
+                    self.processes = ProcessPoolExecutor(
+                        workers,
+                        initializer=_init_worker,
+                        initargs=_worker_args(self.apps, self.apps_path, self.datasets),
+                    )
+                    self.executor = ThreadPoolExecutor(workers)
+                else:
+                    self.executor = ThreadPoolExecutor(self.workers)
+            return self.executor
+
+    def compute_in_process(self, app_name: str, request_data: dict[str, Any] | None):
+        with self.limit(app_name):
+            return self.processes.submit(_compute_in_worker, app_name, request_data).result()
+
+    def submit(self, app_name: str, request_data: dict[str, Any] | None) -> Future:
+        """Submits a request and returns the future of its serialized stages."""
+        executor = self.get_executor()
+        if self.executor_type == "process":
+            return executor.submit(self.compute_in_process, app_name, request_data)
+        return executor.submit(self.compute, app_name, request_data)
+
+    def shutdown(self) -> None:
+        if self.executor is not None:
+            self.executor.shutdown(cancel_futures=True)
+        if self.processes is not None:
+            self.processes.shutdown(cancel_futures=True)
+
+
+class Job:
+    def __init__(self, app_name: str, key: str, future: Future) -> None:
+        self.id: str = uuid.uuid4().hex
+        self.app_name: str = app_name
+        self.key: str = key
+        self.future: Future = future
+        self.created: float = time.time()
+        self.finished: float | None = None
+
+    @property
+    def status(self) -> str:
+        if self.future.cancelled():
+            return "cancelled"
+        if self.future.running():
+            return "running"
+        if not self.future.done():
+            return "pending"
+        return "failed" if self.future.exception() is not None else "done"
+
+    def describe(self) -> dict[str, Any]:
+        return {"job": self.id, "status": self.status}
+
+
+class JobManager:
+    def __init__(
+        self,
+        apps: dict[str, App],
+        workers: int | None = None,
+        executor: str = "process",
+        ttl: float = 600,
+        compute: Callable[[str, dict[str, Any] | None], dict[str, Any]] | None = None,
+        apps_path: str | None = None,
+        datasets: DatasetRegistry | None = None,
+        limit: Callable[[str], AbstractContextManager] | None = None,
+    ) -> None:
+        """Create a manager running compute requests in the background. The
+        pool is only started with the first job, so the site can be forked
+        before.
+
+        Args:
+            apps (dict[str, App]): The app instances of the site.
+            workers (int | None): The number of workers, None for the executors default.
+            executor (str): Either 'process' or 'thread'.
+            ttl (float): Seconds after which finished jobs are forgotten.
+            compute (Callable[[str, dict[str, Any] | None], dict[str, Any]] | None): Computes and serializes
+                a request in the thread executor, by default directly with the app instance.
+            apps_path (str | None): The folder of the apps, see `WorkerPool`.
+            datasets (DatasetRegistry | None): The datasets of the site, see `WorkerPool`.
+            limit (Callable[[str], AbstractContextManager] | None): Limits the requests of an app
+                in the process executor, see `WorkerPool`.
+
+        Raises:
+            ValueError: If the executor is unknown.
+        """
+        self.pool = WorkerPool(apps, workers, executor, compute, limit, apps_path, datasets)
+        self.ttl: float = ttl
+
+        self.lock = threading.Lock()
+        self.jobs: dict[str, Job] = {}
+        self.in_flight: dict[tuple[str, str], Job] = {}  # For coalescing
+
+    def submit(
+        self,
+        app_name: str,
+        key: str,
+        request_data: dict[str, Any] | None,
+        on_done: Callable[[dict[str, Any]], None] | None = None,
+    ) -> Job:
+        """Submits a compute request. If an identical request is still
+        pending or running, its job is returned instead of starting a new one.
+
+        Args:
+            app_name (str): The name of the app, e.g. 'demo.demo'.
+            key (str): The key identifying identical requests.
+            request_data (dict[str, Any] | None): The request directly fed in from the frontend.
+            on_done (Callable[[dict[str, Any]], None] | None): Called with the serialized result on success.
+
+        Returns:
+            Job: The new or coalesced job.
+        """
+        with self.lock:
+            self.purge()
+            job = self.in_flight.get((app_name, key))
+            if job is not None:
+                return job
+
+            future = self.pool.submit(app_name, request_data)
+            job = Job(app_name, key, future)
+            self.jobs[job.id] = job
+            self.in_flight[(app_name, key)] = job
+
+        def finish(future: Future) -> None:
+            with self.lock:
+                job.finished = time.time()
+                if self.in_flight.get((app_name, key)) is job:
+                    del self.in_flight[(app_name, key)]
+            if on_done is not None and not future.cancelled() and future.exception() is None:
+                on_done(future.result())
+
+        future.add_done_callback(finish)
+        return job
+
+    def get(self, app_name: str, job_id: str) -> Job | None:
+        with self.lock:
+            self.purge()
+            job = self.jobs.get(job_id)
+        if job is None or job.app_name != app_name:
+            return None
+        return job
+
+    def result(self, job: Job, wait: float = 0) -> dict[str, Any] | None:
+        """Returns the result of a job, waiting at most `wait` seconds for it.
+
+        Raises:
+            CancelledError: If the job was cancelled.
+            Exception: Whatever the compute function of the app raised.
+
+        Returns:
+            dict[str, Any] | None: The serialized stages or None if the job isn't finished yet.
+        """
+        try:
+            return job.future.result(timeout=wait)
+        except FutureTimeoutError:
+            return None
+
+    def cancel(self, job: Job) -> bool:
+        # Only jobs which didn't start yet can be cancelled
+        return job.future.cancel()
+
+    def purge(self) -> None:
+        now = time.time()
+        expired = [
+            job_id
+            for job_id, job in self.jobs.items()
+            if job.finished is not None and now - job.finished > self.ttl
+        ]
+        for job_id in expired:
+            del self.jobs[job_id]
+
+    def shutdown(self) -> None:
+        self.pool.shutdown()
@@ -0,0 +1,139 @@
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Iterator
+
+# Upper bounds of the histogram buckets in seconds
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+QUANTILES = (0.5, 0.9, 0.99)
+
+
+class Histogram:
+    def __init__(self, buckets: tuple[float, ...] = BUCKETS, recent: int = 1024) -> None:
+        """A histogram of durations, which also keeps the most recent values to
+        compute exact quantiles.
+
+        Args:
+            buckets (tuple[float, ...]): The sorted upper bounds of the buckets.
+            recent (int): The number of recent values kept for the quantiles.
+        """
+        self.buckets = buckets
+        self.counts: list[int] = [0] * len(buckets)
+        self.count: int = 0
+        self.sum: float = 0.0
+        self.recent: deque[float] = deque(maxlen=recent)
+
+    def observe(self, value: float) -> None:
+        self.count += 1
+        self.sum += value
+        self.recent.append(value)
+        i = bisect_left(self.buckets, value)
+        if i < len(self.buckets):
+            self.counts[i] += 1
+
+    def cumulative_counts(self) -> list[int]:
+        counts, total = [], 0
+        for count in self.counts:
+            total += count
+            counts.append(total)
+        return counts
+
+    def quantile(self, q: float) -> float:
+        values = sorted(self.recent)
+        if not values:
+            return 0.0
+        return values[min(int(q * len(values)), len(values) - 1)]
+
+
+class RequestTimer:
+    def __init__(self, app_name: str) -> None:
+        """Measures the phases of one request."""
+        self.app_name: str = app_name
+        self.start: float = time.perf_counter()
+        self.phases: dict[str, float] = {}
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - start
+
+    def finish(self) -> None:
+        self.phases["total"] = time.perf_counter() - self.start
+
+    def server_timing(self) -> str:
+        """Returns the phases formatted for the Server-Timing header, which is
+        shown by the developer tools of browsers."""
+        return ", ".join(
+            f"{name};dur={duration * 1000:.2f}" for name, duration in self.phases.items()
+        )
+
+
+class Metrics:
+    def __init__(self) -> None:
+        """Collects the durations of the request phases per app."""
+        self.lock = threading.Lock()
+        self.histograms: dict[tuple[str, str], Histogram] = {}
+
+    def record(self, timer: RequestTimer) -> None:
+        with self.lock:
+            for phase, duration in timer.phases.items():
+                key = (timer.app_name, phase)
+                if key not in self.histograms:
+                    self.histograms[key] = Histogram()
+                self.histograms[key].observe(duration)
+
+    def summary(self) -> dict[str, dict[str, dict[str, float]]]:
+        """Returns count, mean and quantiles of every app and phase."""
+        result: dict[str, dict[str, dict[str, float]]] = {}
+        with self.lock:
+            for (app_name, phase), histogram in sorted(self.histograms.items()):
+                result.setdefault(app_name, {})[phase] = {
+                    "count": histogram.count,
+                    "mean": histogram.sum / histogram.count,
+                    **{f"p{int(q * 100)}": histogram.quantile(q) for q in QUANTILES},
+                }
+        return result
+
+    def prometheus(self, cache_stats: dict[str, dict[str, Any]] | None = None) -> str:
+        """Returns all metrics in the Prometheus text format.
+
+        Args:
+            cache_stats (dict[str, dict[str, Any]] | None): The statistics of the result caches per app.
+        """
+        name = "wepps_compute_phase_seconds"
+        recent = "wepps_compute_phase_recent_seconds"
+        lines = [
+            f"# HELP {name} Duration of the phases of compute requests.",
+            f"# TYPE {name} histogram",
+        ]
+        summaries = [
+            f"# HELP {recent} Quantiles of the most recent durations of the phases of compute requests.",
+            f"# TYPE {recent} summary",
+        ]
+        with self.lock:
+            for (app_name, phase), histogram in sorted(self.histograms.items()):
+                labels = f'app="{app_name}",phase="{phase}"'
+                for bound, count in zip(histogram.buckets, histogram.cumulative_counts()):
+                    lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {count}')
+                lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {histogram.count}')
+                lines.append(f"{name}_sum{{{labels}}} {histogram.sum}")
+                lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+                for q in QUANTILES:
+                    summaries.append(
+                        f'{recent}{{{labels},quantile="{q}"}} {histogram.quantile(q)}'
+                    )
+                summaries.append(f"{recent}_sum{{{labels}}} {histogram.sum}")
+                summaries.append(f"{recent}_count{{{labels}}} {histogram.count}")
+        lines += summaries
+
+        for counter in ("hits", "misses"):
+            lines.append(f"# HELP wepps_cache_{counter}_total Result cache {counter}.")
+            lines.append(f"# TYPE wepps_cache_{counter}_total counter")
+            for app_name, stats in sorted((cache_stats or {}).items()):
+                lines.append(f'wepps_cache_{counter}_total{{app="{app_name}"}} {stats[counter]}')
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,81 @@
+import hashlib
+import json
+from typing import Any, Callable
+
+from wepps.cache import ResultCache, _canonical_default
+from wepps.stage.stages import DocsStage, PlotsStage
+
+
+class StageProducer:
+    def __init__(
+        self,
+        function: Callable[[dict[str, dict[str, Any]]], DocsStage | PlotsStage],
+        depends_on: list[str] | None = None,
+        cache_size: int = 16,
+    ) -> None:
+        """Computes one docs or plots stage of an app from the settings it
+        depends on. The stages are cached by the values of these settings, so
+        a request only recomputes the stages whose settings changed.
+
+        Args:
+            function (Callable[[dict[str, dict[str, Any]]], DocsStage | PlotsStage]): Receives the
+                converted values of all settings stages, e.g. values["S1"]["i"], and returns the
+                stage. The stage is reused by later requests, so it must not be changed afterwards.
+            depends_on (list[str] | None): The settings used by the function, either whole stages
+                like "S1" or single parameters like "S1.i". None if it depends on all settings.
+            cache_size (int): The maximal number of cached stages.
+        """
+        self.function = function
+        self.depends_on: list[str] | None = depends_on
+        self.cache = ResultCache(cache_size)
+
+    def inputs(self, values: dict[str, dict[str, Any]]) -> dict[str, Any]:
+        if self.depends_on is None:
+            return values
+        inputs = {}
+        for dependency in self.depends_on:
+            stage_id, _, parameter_id = dependency.partition(".")
+            stage_values = values.get(stage_id)
+            if parameter_id and isinstance(stage_values, dict):
+                inputs[dependency] = stage_values.get(parameter_id)
+            elif parameter_id:
+                inputs[dependency] = None
+            else:
+                inputs[dependency] = stage_values
+        return inputs
+
+    def key(self, values: dict[str, dict[str, Any]]) -> str:
+        canonical = json.dumps(
+            self.inputs(values), sort_keys=True, separators=(",", ":"), default=_canonical_default
+        )
+        return hashlib.sha256(canonical.encode()).hexdigest()
+
+    def produce(self, values: dict[str, dict[str, Any]]) -> DocsStage | PlotsStage:
+        """Returns the cached stage for the values of the dependencies, or
+        computes it if they changed.
+
+        Raises:
+            TypeError: If the function doesn't return a docs or plots stage.
+        """
+        key = self.key(values)
+        stage = self.cache.get(key)
+        if stage is None:
+            stage = self.function(values)
+            if not isinstance(stage, (DocsStage, PlotsStage)):
+                raise TypeError(
+                    f"A stage producer returned {type(stage).__name__} instead of a docs or plots stage."
+                )
+            if isinstance(stage, PlotsStage):
+                stage.freeze()  # Serialized once, not for every request reusing it
+            self.cache.set(key, stage)
+        return stage
+
+    def __getstate__(self) -> dict[str, Any]:
+        # Sent to worker processes, which cache their stages on their own
+        state = self.__dict__.copy()
+        state["cache"] = self.cache.max_size
+        return state
+
+    def __setstate__(self, state: dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self.cache = ResultCache(state["cache"])
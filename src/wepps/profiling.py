@@ -0,0 +1,113 @@
+import builtins
+import importlib
+import importlib.util
+import json
+import sys
+import time
+from contextlib import contextmanager
+from typing import Any, Iterator
+
+
+class StartupProfile:
+    def __init__(self) -> None:
+        """Records where the start of a site spends its time: the phases of
+        `Site.__init__`, every module imported meanwhile and the import and
+        `__init__` of every app.
+        """
+        self.phases: dict[str, float] = {}
+        self.app_imports: dict[str, float] = {}
+        self.app_inits: dict[str, float] = {}
+        # Module name -> (cumulative time including nested imports, own time)
+        self.imports: dict[str, tuple[float, float]] = {}
+        self.total: float = 0.0
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = time.perf_counter() - start
+
+    @contextmanager
+    def trace_imports(self) -> Iterator[None]:
+        """Measures every module that is imported for the first time while active."""
+        original_import = builtins.__import__
+        original_import_module = importlib.import_module
+        stack: list[float] = []  # Time spent in nested imports of the running imports
+
+        def measure(name: str, load):
+            if name in sys.modules:
+                return load()
+            start = time.perf_counter()
+            stack.append(0.0)
+            try:
+                return load()
+            finally:
+                total = time.perf_counter() - start
+                nested = stack.pop()
+                if stack:
+                    stack[-1] += total
+                self.imports.setdefault(name, (total, total - nested))
+
+        def traced_import(name, globals=None, locals=None, fromlist=(), level=0):
+            absolute = name
+            if level > 0 and globals is not None:
+                package = globals.get("__package__") or ""
+                absolute = importlib.util.resolve_name("." * level + name, package)
+            return measure(
+                absolute,
+                lambda: original_import(name, globals, locals, fromlist, level),
+            )
+
+        def traced_import_module(name, package=None):
+            absolute = importlib.util.resolve_name(name, package) if name.startswith(".") else name
+            return measure(absolute, lambda: original_import_module(name, package))
+
+        builtins.__import__ = traced_import
+        importlib.import_module = traced_import_module
+        try:
+            yield
+        finally:
+            builtins.__import__ = original_import
+            importlib.import_module = original_import_module
+
+    def serialize(self, limit: int | None = None) -> dict[str, Any]:
+        imports = sorted(self.imports.items(), key=lambda i: i[1][0], reverse=True)
+        return {
+            "total": self.total,
+            "phases": self.phases,
+            "app_imports": dict(
+                sorted(self.app_imports.items(), key=lambda i: i[1], reverse=True)
+            ),
+            "app_inits": dict(
+                sorted(self.app_inits.items(), key=lambda i: i[1], reverse=True)
+            ),
+            "imports": [
+                {"module": name, "cumulative": total, "self": own}
+                for name, (total, own) in imports[:limit]
+            ],
+        }
+
+    def to_json(self) -> str:
+        return json.dumps(self.serialize(), indent=2)
+
+    def report(self, limit: int = 20) -> str:
+        """Returns a human readable report, the slowest entries first.
+
+        Args:
+            limit (int): The number of listed imports.
+        """
+        data = self.serialize(limit)
+        lines = [f"Site startup took {data['total'] * 1000:.1f} ms", "", "Phases:"]
+        lines += [f"  {t * 1000:10.1f} ms  {name}" for name, t in data["phases"].items()]
+        lines += ["", "App imports:"]
+        lines += [f"  {t * 1000:10.1f} ms  {name}" for name, t in data["app_imports"].items()]
+        lines += ["", "App __init__:"]
+        lines += [f"  {t * 1000:10.1f} ms  {name}" for name, t in data["app_inits"].items()]
+        lines += ["", f"Slowest imports (cumulative / self, top {limit}):"]
+        lines += [
+            f"  {i['cumulative'] * 1000:10.1f} ms {i['self'] * 1000:10.1f} ms  {i['module']}"
+            for i in data["imports"]
+        ]
+        return "\n".join(lines)
@@ -0,0 +1,198 @@
+import gc
+import os
+import signal
+import socket
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler
+
+SERVERS = ("auto", "gunicorn", "werkzeug")
+
+
+class KeepAliveRequestHandler(WSGIRequestHandler):
+    # Idle keep-alive connections are closed after some seconds, otherwise
+    # a few browser tabs would occupy all threads of the pool
+    timeout = 5
+
+
+class PooledWSGIServer(BaseWSGIServer):
+    multithread = True
+
+    def __init__(
+        self, host: str, port: int, app: Any, threads: int, fd: int | None = None
+    ) -> None:
+        """A WSGI server handling the requests in a fixed pool of threads,
+        unlike the development server, which starts a new thread per request.
+
+        Args:
+            host (str): The host to listen on.
+            port (int): The port to listen on.
+            app (Any): The WSGI application.
+            threads (int): The number of threads handling requests.
+            fd (int | None): An already bound socket, e.g. shared by forked workers.
+        """
+        super().__init__(host, port, app, handler=KeepAliveRequestHandler, fd=fd)
+        self.pool = ThreadPoolExecutor(threads)
+
+    def process_request(self, request: Any, client_address: Any) -> None:
+        self.pool.submit(self.process_request_thread, request, client_address)
+
+    def process_request_thread(self, request: Any, client_address: Any) -> None:
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+
+def gunicorn_available() -> bool:
+    try:
+        import gunicorn  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def serve_with_gunicorn(
+    app: Any,
+    host: str,
+    port: int,
+    workers: int,
+    threads: int,
+    on_worker_exit: Callable[[], None] | None = None,
+) -> None:
+    from gunicorn.app.base import BaseApplication
+
+    class Server(BaseApplication):
+        def load_config(self) -> None:
+            self.cfg.set("bind", f"[{host}]:{port}" if ":" in host else f"{host}:{port}")
+            self.cfg.set("workers", workers)
+            self.cfg.set("threads", threads)
+            self.cfg.set("worker_class", "gthread")
+            self.cfg.set("preload_app", True)
+            if on_worker_exit is not None:
+                self.cfg.set("worker_exit", lambda server, worker: on_worker_exit())
+
+        def load(self) -> Any:
+            return app  # Already created, so it is shared by the forked workers
+
+    Server().run()
+
+
+def serve_with_werkzeug(
+    app: Any,
+    host: str,
+    port: int,
+    workers: int,
+    threads: int,
+    on_worker_exit: Callable[[], None] | None = None,
+) -> None:
+    """Binds the socket and forks the workers, each serving it with a pool of
+    threads. Workers which exit unexpectedly are restarted.
+    """
+    if workers == 1:
+        PooledWSGIServer(host, port, app, threads).serve_forever()
+        return
+    if not hasattr(os, "fork"):
+        raise ValueError("Multiple workers need os.fork, which isn't available on this platform!")
+
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    listener = socket.create_server((host, port), family=family, backlog=128)
+    children: dict[int, float] = {}
+    stopping = False
+
+    def spawn() -> None:
+        pid = os.fork()
+        if pid == 0:
+            # Leave serve_forever, so the worker cleans up before it exits
+            signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+            signal.signal(signal.SIGINT, lambda signum, frame: sys.exit(0))
+            try:
+                PooledWSGIServer(host, port, app, threads, listener.fileno()).serve_forever()
+            finally:
+                try:
+                    if on_worker_exit is not None:
+                        on_worker_exit()
+                finally:
+                    os._exit(1)
+        children[pid] = time.monotonic()
+
+    def stop(signum: int, frame: Any) -> None:
+        nonlocal stopping
+        stopping = True
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    print(f"Serving on http://{host}:{port} with {workers} workers and {threads} threads each")
+    for _ in range(workers):
+        spawn()
+
+    while children:
+        try:
+            pid, _ = os.wait()
+        except ChildProcessError:
+            break
+        started = children.pop(pid, None)
+        if stopping or started is None:
+            continue
+        if time.monotonic() - started < 1:
+            print(f"Worker {pid} failed on startup, stopping", file=sys.stderr)
+            stop(signal.SIGTERM, None)
+        else:
+            print(f"Worker {pid} exited, restarting", file=sys.stderr)
+            spawn()
+    listener.close()
+
+
+def serve(
+    app: Any,
+    host: str = "0.0.0.0",
+    port: int = 8000,
+    workers: int | None = None,
+    threads: int = 8,
+    server: str = "auto",
+    on_worker_exit: Callable[[], None] | None = None,
+) -> None:
+    """Serves a WSGI application with several worker processes, which are
+    forked from the current process after everything was imported.
+
+    Args:
+        app (Any): The WSGI application.
+        host (str): The host to listen on.
+        port (int): The port to listen on.
+        workers (int | None): The number of worker processes, None for the number of CPUs.
+        threads (int): The number of threads per worker.
+        server (str): 'gunicorn', 'werkzeug' for the built-in pre-forking server,
+            or 'auto' to use gunicorn if it is installed.
+        on_worker_exit (Callable[[], None] | None): Called in every worker before it exits, as
+            forked workers don't run the atexit handlers of the process.
+
+    Raises:
+        ValueError: If the server is unknown or not installed.
+    """
+    if server not in SERVERS:
+        raise ValueError(f'Unknown server "{server}", use one of {", ".join(SERVERS)}!')
+    if server == "auto":
+        server = "gunicorn" if gunicorn_available() else "werkzeug"
+    elif server == "gunicorn" and not gunicorn_available():
+        raise ValueError("gunicorn isn't installed!")
+    workers = workers or os.cpu_count() or 1
+
+    # Objects created so far are never collected, so the garbage collector
+    # doesn't write to them and the pages stay shared between the workers
+    gc.collect()
+    gc.freeze()
+
+    if server == "gunicorn":
+        serve_with_gunicorn(app, host, port, workers, threads, on_worker_exit)
+    else:
+        serve_with_werkzeug(app, host, port, workers, threads, on_worker_exit)
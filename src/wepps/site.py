@@ -1,36 +1,109 @@
+import asyncio
+import hashlib
 import importlib
 import os
+import time
 import pkgutil
 import json
-from inspect import getmembers, isclass
-from typing import Any
+import mimetypes
+import shutil
+import threading
+from concurrent.futures import CancelledError
+from contextlib import AbstractContextManager, nullcontext
+from typing import Any, Callable, Iterator
 
 from flask import (
     Flask,
+    Request,
+    Response,
     jsonify,
+    make_response,
     render_template,
     abort,
+    g,
+    has_request_context,
     request,
     send_from_directory,
+    stream_with_context,
     url_for,
 )
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.exceptions import HTTPException
 
 import wepps
-from wepps.app import App, ResponseError
+from wepps.app import (
+    App,
+    ResponseError,
+    ResponseStages,
+    collect_stages,
+    collect_stages_async,
+    iterate_stages,
+)
+from wepps.asgi import ASGIApp
+from wepps.discovery import LazyApps, find_app_class
+from wepps.cache import ResultCache, DiskResultCache, make_cache_key
+from wepps.jobs import Job, JobManager
+from wepps.batch import BatchRunner, expand_sweep
+from wepps.concurrency import AppRunner, ConcurrencyLimitError
+from wepps.datasets import DatasetRegistry
+from wepps.delta import DELTA_HEADER, STAGES_HEADER, delta_payload, parse_known_stages
+from wepps.serving import serve
+from wepps.profiling import StartupProfile
+from wepps.metrics import Metrics, RequestTimer
+from wepps.stage.fragments import dumps_with_fragments
+from wepps.stage.validation import ValidationError
+from wepps.compression import (
+    COMPRESSIBLE_EXTENSIONS,
+    DYNAMIC_LEVELS,
+    PRECOMPRESSED_EXTENSIONS,
+    compress,
+    encodings,
+    write_compressed,
+)
 
 import mistune
 import emoji
 
 
-def import_module(path):
+def import_module(path, timings: dict[str, float] | None = None):
     package = importlib.import_module(path)
     results = {}
     for loader, module_name, _ in pkgutil.walk_packages(package.__path__):
+        start = time.perf_counter()
         module = loader.find_module(module_name).load_module(module_name)
+        if timings is not None:
+            timings[module_name] = time.perf_counter() - start
         results[module_name] = module
     return results
 
 
+def error_payload(e: Exception) -> dict[str, Any]:
+    """Returns the error message of a failed computation, as sent to the frontend."""
+    if isinstance(e, ValidationError):
+        return e.serialize()
+    if isinstance(e, ResponseError):
+        return {"error": str(e)}
+    return {"error": f"<b>Internal Error</b><br>{str(e)}"}
+
+
+def error_response(e: Exception) -> tuple[Any, ...]:
+    """Returns the response of a route to a failed computation."""
+    if isinstance(e, ConcurrencyLimitError):
+        return str(e), 503, {"Retry-After": "1"}
+    if isinstance(e, ValidationError):
+        return jsonify(e.serialize()), 400
+    if isinstance(e, ResponseError):
+        return str(e), 400
+    return f"<b>Internal Error</b><br>{str(e)}", 400
+
+
+class FragmentJSONProvider(DefaultJSONProvider):
+    """Embeds the memoized JSON encoding of unchanged stages into responses."""
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        return dumps_with_fragments(obj, lambda o: super(FragmentJSONProvider, self).dumps(o, **kwargs))
+
+
 class Site:
     def __init__(
         self,
@@ -39,7 +112,30 @@ class Site:
         enforce_dev_mode: bool = False,
         escape_html_in_md: bool = True,
         verbose: bool = False,
+        cache_size: int = 128,
+        cache_ttl: float | None = None,
+        cache_dir: str | None = None,
+        jobs: bool = False,
+        job_workers: int | None = None,
+        job_executor: str = "process",
+        job_ttl: float = 600,
+        batch_workers: int | None = None,
+        batch_executor: str = "thread",
+        batch_limit: int = 256,
+        figure_cache_size: int = 16,
+        page_etags: bool = True,
+        compress_threshold: int | None = 1024,
+        lazy_apps: bool = False,
+        warm_up: bool = False,
+        profile_startup: bool = False,
+        metrics: bool = False,
     ) -> None:
+        # Measure where the startup spends its time
+        self.startup_profile: StartupProfile | None = None
+        if profile_startup:
+            self.startup_profile = StartupProfile()
+        start = time.perf_counter()
+
         self.apps_path = apps_path
         self.application_root = application_root
         self.enforce_dev_mode = enforce_dev_mode
@@ -48,19 +144,104 @@ class Site:
             escape=escape_html_in_md,
         )
         self.verbose = verbose
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self.cache_dir = cache_dir
+        self.page_etags = page_etags
+        self.compress_threshold = compress_threshold
+        self.lazy_apps = lazy_apps
+        self.warm_up = warm_up
+        self.batch_limit = batch_limit
+        self.figure_cache_size = figure_cache_size
 
-        self.generate_apps()
+        # Durations of the phases of compute requests, exposed under /metrics
+        self.metrics: Metrics | None = Metrics() if metrics else None
 
-        # Initialize the index text from the readme once, it doesn't change
-        self.title, self.index_text = self.make_index_text("README.md")
+        # Rendered markdown, pages and the manifest, together with the
+        # modification times of their sources to detect changes
+        self.index_texts: dict[tuple[str, str], tuple[int, tuple[str, str]]] = {}
+        self.pages: dict[tuple[str, str], tuple[Any, str, str, float]] = {}
+        self.manifest: tuple[int, str, str] | None = None
+        self.hashed_assets: set[str] = set()
 
-        self.initialize_flask_server()
+        with self.profile_imports():
+            with self.profile_phase("apps"):
+                self.generate_apps()
+
+            # Run compute requests in the background and let the frontend poll for results
+            self.job_manager: JobManager | None = None
+            if jobs:
+                with self.profile_phase("jobs"):
+                    self.job_manager = JobManager(
+                        self.apps,
+                        job_workers,
+                        job_executor,
+                        job_ttl,
+                        self.compute_uncached,
+                        self.apps_path,
+                        self.datasets,
+                        self.limit,
+                    )
+
+            # Runs the requests of parameter sweeps in parallel, started with the first batch
+            self.batch_runner = BatchRunner(
+                self.apps,
+                batch_workers,
+                batch_executor,
+                self.compute_uncached,
+                self.apps_path,
+                self.datasets,
+                self.limit,
+            )
+
+            with self.profile_phase("flask"):
+                self.initialize_flask_server()
+
+        if self.startup_profile is not None:
+            self.startup_profile.total = time.perf_counter() - start
+            print(self.startup_profile.report())
+
+    def profile_phase(self, name: str):
+        if self.startup_profile is None:
+            return nullcontext()
+        return self.startup_profile.phase(name)
+
+    def profile_imports(self):
+        if self.startup_profile is None:
+            return nullcontext()
+        return self.startup_profile.trace_imports()
+
+    def timed(self, phase: str):
+        """Measures a phase of the current compute request, if metrics are enabled."""
+        timer = g.get("timer") if has_request_context() else None
+        if timer is None:
+            return nullcontext()
+        return timer.phase(phase)
+
+    def record_timing(self, response: Response) -> Response:
+        """Records the phases of a compute request and reports them in the
+        Server-Timing header. The phases of streamed responses are only measured
+        until the first part is computed.
+        """
+        timer = g.pop("timer", None)
+        if timer is None:
+            return response
+        timer.finish()
+        self.metrics.record(timer)
+        response.headers["Server-Timing"] = timer.server_timing()
+        return response
 
     def make_index_text(self, file: str, folder: str = "") -> tuple[str, str]:
         # Note that this conversion isn't really clean...
         if not os.path.exists(file):
             raise FileNotFoundError(f"{file} file couldn't be found!")
 
+        # Only render the markdown again if the file changed
+        mtime = os.stat(file).st_mtime_ns
+        cached = self.index_texts.get((file, folder))
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+
         raw = open(file).read()
 
         lines = raw.split("\n")
@@ -77,27 +258,567 @@ class Site:
 
         text = emoji.emojize(self.render_md(content))
 
+        self.index_texts[(file, folder)] = (mtime, (title, text))
         return title, text
 
+    def load_manifest(self) -> tuple[int, str, str]:
+        """Returns the built js and css files from the vite manifest, which is
+        only parsed again if it changed.
+
+        Returns:
+            tuple[int, str, str]: The modification time of the manifest and the js and css files,
+                which are empty in dev mode or if nothing was built.
+        """
+        path = f"{self.wepps_path}/static/manifest.json"
+        if self.enforce_dev_mode or not os.path.exists(path):
+            return 0, "", ""
+
+        mtime = os.stat(path).st_mtime_ns
+        if self.manifest is None or self.manifest[0] != mtime:
+            manifest = json.load(open(path, "r"))
+            json_file = os.path.basename(manifest["src/main.tsx"]["file"])
+            css_file = os.path.basename(manifest["src/main.css"]["file"])
+            self.manifest = (mtime, json_file, css_file)
+            # Built files have the hash of their content in the name, so they never change
+            self.hashed_assets = {
+                os.path.basename(file)
+                for chunk in manifest.values()
+                for file in [chunk["file"], *chunk.get("css", []), *chunk.get("assets", [])]
+            }
+            if self.verbose:
+                print("Using built js/css files!")
+        return self.manifest
+
+    def send_asset(self, file: str):
+        """Sends a file of the built frontend. Precompressed `.br`/`.gz` files
+        are preferred if the client accepts them, and files with a content hash
+        in their name are cached forever.
+        """
+        folder = os.path.join(self.wepps_path, "static", "assets")
+        available = [
+            encoding
+            for encoding, extension in PRECOMPRESSED_EXTENSIONS.items()
+            if os.path.isfile(os.path.join(folder, file + extension))
+        ]
+        encoding = request.accept_encodings.best_match(available)
+        if encoding is None:
+            response = send_from_directory(folder, file)
+        else:
+            response = send_from_directory(
+                folder,
+                file + PRECOMPRESSED_EXTENSIONS[encoding],
+                mimetype=mimetypes.guess_type(file)[0],
+            )
+            response.headers["Content-Encoding"] = encoding
+        if available:
+            response.vary.add("Accept-Encoding")
+
+        self.load_manifest()
+        if file in self.hashed_assets:
+            response.cache_control.no_cache = None
+            response.cache_control.public = True
+            response.cache_control.max_age = 31536000
+            response.cache_control.immutable = True
+        return response
+
+    def compress_response(self, response: Response) -> Response:
+        """Compresses JSON responses (e.g. compute results) larger than
+        `compress_threshold` bytes, if the client accepts it.
+        """
+        if (
+            self.compress_threshold is None
+            or response.direct_passthrough
+            or response.is_streamed
+            or response.mimetype != "application/json"
+            or "Content-Encoding" in response.headers
+        ):
+            return response
+
+        response.vary.add("Accept-Encoding")
+        data = response.get_data()
+        encoding = request.accept_encodings.best_match(encodings())
+        if encoding is None or len(data) < self.compress_threshold:
+            return response
+
+        response.set_data(compress(data, encoding, DYNAMIC_LEVELS[encoding]))
+        response.headers["Content-Encoding"] = encoding
+        return response
+
+    def render_index_page(self, file: str, folder: str = "") -> str:
+        title, text = self.make_index_text(file, folder)
+        return render_template("index.html", title=title, text=text)
+
+    def render_app_page(self, app_name: str) -> str:
+        # Get the app title (raises an error if empty)
+        app_title = self.apps[app_name].title
+        _, json_file, css_file = self.load_manifest()
+        return render_template(
+            "app.html", title=app_title, json_file=json_file, css_file=css_file
+        )
+
+    def documentation(self, app_path: str) -> str:
+        if os.path.exists(f"{self.apps_path}/{app_path}.md"):
+            return open(f"{self.apps_path}/{app_path}.md").read()
+        return "Sorry, but it seems that there is no dedicated documentation."
+
+    def index_folders(self) -> list[str]:
+        """Returns the folders inside of `apps_path` with an index.md, e.g. 'demo'."""
+        folders = []
+        for path, _, files in os.walk(self.apps_path):
+            folder = os.path.relpath(path, self.apps_path).replace(os.sep, "/")
+            if "index.md" in files and folder != ".":
+                folders.append(folder)
+        return sorted(folders)
+
+    def cached_page(self, page: str, version: Any, render: Callable[[], str]):
+        """Returns a rendered page, which is only rendered again if its version
+        changed. With `page_etags`, conditional requests are answered with 304.
+
+        Args:
+            page (str): A unique name of the page.
+            version (Any): Changes whenever the page has to be rendered again, e.g. the modification time of its source.
+            render (Callable[[], str]): Renders the page.
+
+        Returns:
+            Response: The response containing the page.
+        """
+        key = (page, request.script_root)
+        cached = self.pages.get(key)
+        if cached is None or cached[0] != version:
+            html = render()
+            etag = hashlib.sha1(html.encode()).hexdigest()
+            cached = (version, html, etag, time.time())
+            self.pages[key] = cached
+
+        _, html, etag, modified = cached
+        response = make_response(html)
+        if self.page_etags:
+            response.set_etag(etag)
+            response.last_modified = modified
+            response.cache_control.no_cache = True  # Always revalidate
+            response = response.make_conditional(request)
+        return response
+
     def generate_apps(self) -> None:
-        modules = import_module(self.apps_path)
+        self.caches: dict[str, ResultCache] = {}
+        # The full figures of decimated plots, which are zoomed into later
+        self.figure_caches: dict[str, ResultCache] = {}
+        self.datasets = DatasetRegistry()
+        self.runners: dict[str, AppRunner] = {}
+        if self.lazy_apps:
+            # Only scan the files, the apps are imported on their first request
+            self.apps = LazyApps(self.apps_path, on_load=self.register_app)
+            if self.verbose:
+                print(f"Found possible apps: {list(self.apps.keys())}")
+            if self.warm_up:
+                threading.Thread(target=self.apps.load_all, daemon=True).start()
+            return
+
+        profile = self.startup_profile
+        modules = import_module(
+            self.apps_path, None if profile is None else profile.app_imports
+        )
         self.apps = {}
         for name, module in modules.items():
-            apps = [
-                a
-                for a in getmembers(module)
-                # If its a class, then check if its a subclass, but not the actual App-Class
-                if isclass(a[1]) and issubclass(a[1], App) and a[1] != App
-            ]
-            if len(apps) == 1:
-                self.apps[name] = apps[0][1]()  # Create an instance
-            elif len(apps) > 1:
-                raise RuntimeError(
-                    f"In {name} are multiple apps defined! Only define one!"
-                )
+            app_class = find_app_class(name, module)
+            if app_class is not None:
+                start = time.perf_counter()
+                self.apps[name] = app_class()  # Create an instance
+                if profile is not None:
+                    profile.app_inits[name] = time.perf_counter() - start
+                self.register_app(name, self.apps[name])
         if self.verbose:
             print(f"Found apps: {list(self.apps.keys())}")
 
+    def register_app(self, name: str, app: App) -> None:
+        app.datasets = [self.datasets.add(dataset) for dataset in app.datasets]
+        self.runners.setdefault(name, AppRunner(name, app))
+        if app.cacheable:
+            self.caches[name] = self.make_cache(name)
+
+    def runner(self, app_name: str) -> AppRunner:
+        app = self.apps[app_name]
+        runner = self.runners.get(app_name)
+        if runner is None:  # A lazy app loaded by another thread, which didn't register it yet
+            runner = self.runners.setdefault(app_name, AppRunner(app_name, app))
+        return runner
+
+    def limit(self, app_name: str) -> AbstractContextManager[App]:
+        """Waits for a free slot of an app, see `AppRunner.acquire`. Entered around
+        the requests computed by the process pools of the jobs and batches."""
+        return self.runner(app_name).acquire()
+
+    def compute_uncached(
+        self, app_name: str, request_data: dict[str, Any] | None
+    ) -> dict[str, Any]:
+        """Computes a request with the concurrency model of the app, but
+        without validation and cache. Used by the jobs and batches running in threads.
+        """
+        return self.runner(app_name).compute(request_data)
+
+    def make_cache(self, app_name: str) -> ResultCache:
+        if self.cache_dir is not None:
+            return DiskResultCache(
+                os.path.join(self.cache_dir, app_name), self.cache_size, self.cache_ttl
+            )
+        return ResultCache(self.cache_size, self.cache_ttl)
+
+    def cache_stats(self) -> dict[str, dict[str, Any]]:
+        return {name: cache.stats() for name, cache in self.caches.items()}
+
+    def cached_result(self, app_name: str, key: str) -> dict[str, Any] | None:
+        cache = self.caches.get(app_name)
+        return None if cache is None else cache.get(key)
+
+    def cache_result(self, app_name: str, key: str, payload: dict[str, Any]) -> None:
+        cache = self.caches.get(app_name)
+        if cache is not None:
+            cache.set(key, payload)
+
+    def remember_figures(
+        self, app_name: str, request_data: dict[str, Any] | None, stages: ResponseStages
+    ) -> None:
+        """Keeps the plots of the stages if they are decimated, so zooming in
+        doesn't need to compute them again.
+        """
+        if not any(stage.decimates for stage in stages.plots):
+            return
+        cache = self.figure_caches.get(app_name)
+        if cache is None:
+            cache = self.figure_caches.setdefault(app_name, ResultCache(self.figure_cache_size))
+        cache.set(make_cache_key(self.apps[app_name], request_data), stages.plots)
+
+    def zoom(
+        self,
+        app_name: str,
+        request_data: dict[str, Any] | None,
+        index: int,
+        x_range: Any = None,
+        y_range: Any = None,
+    ) -> dict[str, Any]:
+        """Returns a decimated plot with more details within the axis ranges.
+        The plot is computed again, if it isn't remembered anymore, with the
+        concurrency model and limit of the app.
+
+        Args:
+            app_name (str): The name of the app, e.g. 'demo.demo'.
+            request_data (dict[str, Any] | None): The request the plot was computed for.
+            index (int): The index of the plots stage.
+            x_range (Any): The visible [min, max] of the x axis or None.
+            y_range (Any): The visible [min, max] of the y axis or None.
+
+        Raises:
+            ValidationError: If the settings are invalid.
+            ResponseError: If the app rejects the request, there is no such plot or
+                a range isn't a list of two numbers.
+
+        Returns:
+            dict[str, Any]: The serialized plots stage.
+        """
+        request_data = self.validate(app_name, request_data)
+        key = make_cache_key(self.apps[app_name], request_data)
+        cache = self.figure_caches.get(app_name)
+        plots = None if cache is None else cache.get(key)
+        if plots is None:  # Limited and run like any other computation of the app
+            with self.timed("compute"):
+                stages = self.runner(app_name).compute_stages(request_data)
+            self.remember_figures(app_name, request_data, stages)
+            plots = stages.plots
+
+        if not isinstance(index, int) or not 0 <= index < len(plots):
+            raise ResponseError(f"There is no plot {index}.")
+        with self.timed("serialize"):
+            try:
+                return plots[index].serialize_range(x_range, y_range)
+            except ValueError as e:
+                raise ResponseError(str(e))
+
+    def known_stages(self) -> set[str] | None:
+        """Returns the hashes of the stages the client of the current request
+        holds, or None if it doesn't use the delta protocol."""
+        return parse_known_stages(
+            request.headers.get(DELTA_HEADER), request.headers.get(STAGES_HEADER)
+        )
+
+    def delta(self, payload: dict[str, Any], known: set[str] | None) -> dict[str, Any]:
+        """Sends only the hashes of the stages the client already holds, see `delta_payload`."""
+        if known is None:
+            return payload
+        # Encoded like the memoized stages, so equal stages have the same hash
+        return delta_payload(
+            payload, known, lambda stage: self.flask_app.json.dumps(stage, separators=(",", ":"))
+        )
+
+    def validate(
+        self, app_name: str, request_data: dict[str, Any] | None
+    ) -> dict[str, Any] | None:
+        """Checks and converts the values of all settings stages declared in
+        `app.settings`, so invalid requests never reach `compute`.
+
+        Args:
+            app_name (str): The name of the app, e.g. 'demo.demo'.
+            request_data (dict[str, Any] | None): The request directly fed in from the frontend.
+
+        Raises:
+            ValidationError: With the errors of all invalid parameters.
+
+        Returns:
+            dict[str, Any] | None: The request with converted values if the app sets
+                `convert_settings`, otherwise the request unchanged.
+        """
+        app = self.apps[app_name]
+        if not isinstance(request_data, dict) or not app.settings:
+            return request_data
+
+        converted = {}
+        errors = {}
+        for stage in app.settings:
+            stage_data = request_data.get(stage.unique_name)
+            if not isinstance(stage_data, dict):  # Stages might be missing
+                continue
+            try:
+                converted[stage.unique_name] = stage.validator(stage_data)
+            except ValidationError as e:
+                errors.update(e.errors)
+        if errors:
+            raise ValidationError(errors)
+
+        if app.convert_settings:
+            return {**request_data, **converted}
+        return request_data
+
+    def prepare(
+        self, app_name: str, request_data: dict[str, Any] | None
+    ) -> tuple[dict[str, Any] | None, str, dict[str, Any] | None]:
+        """Validates a request and looks it up in the cache of the app, which
+        all ways to compute a request start with.
+
+        Raises:
+            ValidationError: If the settings are invalid.
+
+        Returns:
+            tuple[dict[str, Any] | None, str, dict[str, Any] | None]: The validated request,
+                its cache key ("" if the app isn't cacheable) and the cached payload or None.
+        """
+        with self.timed("convert"):
+            request_data = self.validate(app_name, request_data)
+
+        key = ""
+        payload = None
+        if app_name in self.caches:
+            with self.timed("cache"):
+                key = make_cache_key(self.apps[app_name], request_data)
+                payload = self.cached_result(app_name, key)
+        return request_data, key, payload
+
+    def store_result(
+        self,
+        app_name: str,
+        request_data: dict[str, Any] | None,
+        key: str,
+        payload: dict[str, Any],
+        stages: ResponseStages | None = None,
+    ) -> None:
+        """Caches a computed payload and remembers the decimated plots of its
+        stages, if they were computed in this process."""
+        if stages is not None:
+            self.remember_figures(app_name, request_data, stages)
+        self.cache_result(app_name, key, payload)
+
+    def compute(
+        self, app_name: str, request_data: dict[str, Any] | None
+    ) -> dict[str, Any]:
+        """Runs the compute function of an app and serializes the stages.
+        Results of cacheable apps are looked up in and stored to their cache.
+
+        Args:
+            app_name (str): The name of the app, e.g. 'demo.demo'.
+            request_data (dict[str, Any] | None): The request directly fed in from the frontend.
+
+        Raises:
+            ValidationError: If the settings are invalid.
+            ResponseError: If the app rejects the request.
+
+        Returns:
+            dict[str, Any]: The serialized docs, settings and plots stages.
+        """
+        request_data, key, payload = self.prepare(app_name, request_data)
+        if payload is not None:
+            return payload
+
+        runner = self.runner(app_name)
+        stages = None
+        if runner.mode == "process":
+            with self.timed("compute"):
+                payload = runner.compute_in_process(request_data)
+        else:
+            with runner.acquire() as app:
+                with self.timed("compute"):
+                    stages = collect_stages(app.compute(request_data))
+                with self.timed("serialize"):
+                    payload = stages.serialize()
+        self.store_result(app_name, request_data, key, payload, stages)
+        return payload
+
+    async def compute_async(
+        self, app_name: str, request_data: dict[str, Any] | None
+    ) -> dict[str, Any]:
+        """Same as `compute`, but awaits the `async def` compute function of
+        the app in the running event loop instead of occupying a thread.
+
+        Raises:
+            ValidationError: If the settings are invalid.
+            ResponseError: If the app rejects the request.
+
+        Returns:
+            dict[str, Any]: The serialized docs, settings and plots stages.
+        """
+        request_data, key, payload = self.prepare(app_name, request_data)
+        if payload is not None:
+            return payload
+
+        runner = self.runner(app_name)
+        stages = None
+        if runner.mode == "process":
+            with self.timed("compute"):
+                payload = await asyncio.to_thread(runner.compute_in_process, request_data)
+        else:
+            async with runner.acquire_async() as app:
+                with self.timed("compute"):
+                    stages = await collect_stages_async(app.compute(request_data))
+                with self.timed("serialize"):
+                    payload = stages.serialize()
+        self.store_result(app_name, request_data, key, payload, stages)
+        return payload
+
+    def compute_partial(
+        self, app_name: str, request_data: dict[str, Any] | None
+    ) -> Iterator[dict[str, Any]]:
+        """Same as `compute`, but yields the serialized stages every time the
+        compute function of the app yields. Plain compute functions (and cached
+        results) yield once.
+
+        Raises:
+            ValidationError: If the settings are invalid.
+            ResponseError: If the app rejects the request.
+
+        Yields:
+            dict[str, Any]: The serialized docs, settings and plots stages computed so far.
+        """
+        request_data, key, payload = self.prepare(app_name, request_data)
+        if payload is not None:
+            yield payload
+            return
+
+        runner = self.runner(app_name)
+        if runner.mode == "process":  # Partial results can't be sent from the workers
+            with self.timed("compute"):
+                payload = runner.compute_in_process(request_data)
+            self.store_result(app_name, request_data, key, payload)
+            yield payload
+            return
+
+        # The slot of the app is kept until the last part is computed
+        with runner.acquire() as app:
+            with self.timed("compute"):
+                stages = iterate_stages(app.compute(request_data))
+                response = next(stages, None)
+
+            payload = None
+            while response is not None:
+                with self.timed("serialize"):
+                    payload = response.serialize()
+                yield payload
+                final = response
+                with self.timed("compute"):
+                    response = next(stages, None)
+        if payload is None:
+            raise ResponseError("The computation did not return any stages.")
+        self.store_result(app_name, request_data, key, payload, final)
+
+    def submit_job(
+        self, app_name: str, request_data: dict[str, Any] | None
+    ) -> Job | dict[str, Any]:
+        """Submits a compute request to the job manager.
+
+        Raises:
+            ValidationError: If the settings are invalid.
+
+        Returns:
+            Job | dict[str, Any]: The job or the serialized stages, if they were cached.
+        """
+        request_data, key, payload = self.prepare(app_name, request_data)
+        if payload is not None:
+            return payload
+        if not key:  # Identical requests are coalesced, even if the app isn't cacheable
+            key = make_cache_key(self.apps[app_name], request_data)
+
+        def on_done(payload: dict[str, Any]) -> None:
+            self.cache_result(app_name, key, payload)
+
+        return self.job_manager.submit(app_name, key, request_data, on_done)
+
+    def compute_batch(
+        self, app_name: str, requests: list[dict[str, Any] | None]
+    ) -> Iterator[tuple[int, dict[str, Any]]]:
+        """Computes all requests of a batch. Every request is validated and
+        looked up in the cache on its own. The remaining requests are passed at
+        once to `compute_batch` of the app, if the app overrides it, otherwise
+        `compute` runs for each of them in the pool of the batch runner. Both
+        use the concurrency model of the app.
+
+        Args:
+            app_name (str): The name of the app, e.g. 'demo.demo'.
+            requests (list[dict[str, Any] | None]): The requests directly fed in from the frontend.
+
+        Raises:
+            ResponseError: If `compute_batch` of the app rejects the batch.
+
+        Yields:
+            tuple[int, dict[str, Any]]: The index of a request and its serialized stages, or the
+                error message as {"error": ...}, as soon as it is finished.
+        """
+        app = self.apps[app_name]
+        pending = []
+        for index, request_data in enumerate(requests):
+            try:
+                request_data, key, payload = self.prepare(app_name, request_data or None)
+            except ValidationError as e:
+                yield index, e.serialize()
+                continue
+            if payload is not None:
+                yield index, payload
+                continue
+            pending.append((index, key, request_data))
+        if not pending:
+            return
+
+        keys = {index: key for index, key, _ in pending}
+        if type(app).compute_batch is not App.compute_batch:
+            # The app computes the whole batch at once, e.g. vectorized
+            results = self.runner(app_name).compute_batch(
+                [request_data for _, _, request_data in pending]
+            )
+            if len(results) != len(pending):
+                raise ResponseError(
+                    f"compute_batch returned {len(results)} results for {len(pending)} requests."
+                )
+            payloads = [stages.serialize() for stages in results]
+            for (index, key, request_data), stages, payload in zip(pending, results, payloads):
+                self.store_result(app_name, request_data, key, payload, stages)
+                yield index, payload
+            return
+
+        requests = [(index, request_data) for index, _, request_data in pending]
+        for index, future in self.batch_runner.run(app_name, requests):
+            try:
+                payload = future.result()
+            except Exception as e:
+                yield index, error_payload(e)
+                continue
+            self.cache_result(app_name, keys[index], payload)
+            yield index, payload
+
     def initialize_flask_server(self) -> None:
         STATIC_FOLDER = f"{self.wepps_path}/static"
         self.flask_app = Flask(
@@ -105,6 +826,7 @@ class Site:
             static_folder=STATIC_FOLDER,
             template_folder=f"{self.wepps_path}/templates",
         )
+        self.flask_app.json = FragmentJSONProvider(self.flask_app)
 
         def url_for_root(route: str, **kwargs) -> str:
             url = url_for(route, **kwargs)
@@ -116,7 +838,10 @@ class Site:
 
         @self.flask_app.route("/")
         def index():
-            return render_template("index.html", title=self.title, text=self.index_text)
+            version = os.stat("README.md").st_mtime_ns
+            return self.cached_page(
+                "/", version, lambda: self.render_index_page("README.md")
+            )
 
         @self.flask_app.route("/favicon.ico")
         def favicon():
@@ -128,9 +853,27 @@ class Site:
 
         @self.flask_app.route("/assets/<file>")
         def assets(file):
-            return send_from_directory(
-                os.path.join(self.flask_app.root_path, "static", "assets"),
-                file,
+            return self.send_asset(file)
+
+        @self.flask_app.after_request
+        def compress_response(response):
+            with self.timed("compress"):
+                response = self.compress_response(response)
+            return self.record_timing(response)
+
+        @self.flask_app.route("/cache_stats")
+        def cache_stats():
+            return jsonify(self.cache_stats())
+
+        @self.flask_app.route("/metrics")
+        def metrics():
+            if self.metrics is None:
+                abort(404)
+            if request.args.get("format") == "json":
+                return jsonify(self.metrics.summary())
+            return Response(
+                self.metrics.prometheus(self.cache_stats()),
+                mimetype="text/plain; version=0.0.4",
             )
 
         @self.flask_app.route("/doc/images/<file>")
@@ -149,83 +892,390 @@ class Site:
         def app_path_route(app_path):
             app_name = app_path.replace("/", ".")
             # First check if the app_path corresponds to an index file
-            try:
-                index_file_path = os.path.join(self.apps_path, app_path, "index.md")
-                title, text = self.make_index_text(
-                    index_file_path, folder=app_path + "/"
+            index_file_path = os.path.join(self.apps_path, app_path, "index.md")
+            if os.path.exists(index_file_path):
+                version = os.stat(index_file_path).st_mtime_ns
+                return self.cached_page(
+                    app_path,
+                    version,
+                    lambda: self.render_index_page(index_file_path, app_path + "/"),
                 )
-            except FileNotFoundError:
-                pass
-            else:
-                return render_template("index.html", title=title, text=text)
 
             # Otherwise check if its an app
             # If the app_name doesn't exist raise a 404
-            if app_name not in self.apps.keys():
+            if self.apps.get(app_name) is None:
                 abort(404)
 
-            # Get the app title (raises an error if empty)
-            app_title = self.apps[app_name].title
-
-            json_file = ""
-            css_file = ""
-            if not self.enforce_dev_mode and os.path.exists(
-                f"{STATIC_FOLDER}/manifest.json"
-            ):
-                manifest = json.load(open(f"{STATIC_FOLDER}/manifest.json", "r"))
-                json_file = os.path.basename(manifest["src/main.tsx"]["file"])
-                css_file = os.path.basename(manifest["src/main.css"]["file"])
-                if self.verbose:
-                    print("Using built js/css files!")
-
             # Then render the template and inject the corresponding documentation
-            return render_template(
-                "app.html", title=app_title, json_file=json_file, css_file=css_file
+            manifest_mtime, _, _ = self.load_manifest()
+            return self.cached_page(
+                app_path, manifest_mtime, lambda: self.render_app_page(app_name)
             )
 
+        def stream_compute(
+            app_name: str, request_data: dict[str, Any] | None, stream_type: str
+        ):
+            # Stages sent in earlier parts are known as well
+            known = self.known_stages()
+
+            def encode(payload: dict[str, Any], event: str = "") -> str:
+                data = self.flask_app.json.dumps(self.delta(payload, known))
+                if stream_type == "text/event-stream":
+                    return f"event: {event}\ndata: {data}\n\n" if event else f"data: {data}\n\n"
+                return f"{data}\n"
+
+            # Compute the first part eagerly, so early errors still result in a 400
+            parts = self.compute_partial(app_name, request_data)
+            try:
+                first = next(parts)
+            except Exception as e:
+                return error_response(e)
+
+            def generate() -> Iterator[str]:
+                yield encode(first)
+                try:
+                    for payload in parts:
+                        yield encode(payload)
+                except Exception as e:
+                    yield encode(error_payload(e), "error")
+
+            return Response(stream_with_context(generate()), mimetype=stream_type)
+
         @self.flask_app.route("/<path:app_path>/compute", methods=["POST"])
         def app_path_compute(app_path):
             app_name = app_path.replace("/", ".")
             # If the app_name doesn't exist raise a 404
-            if app_name not in self.apps.keys():
+            if self.apps.get(app_name) is None:
                 abort(404)
+            if self.metrics is not None:
+                g.timer = RequestTimer(app_name)
 
             # Otherwise get the correct app
-            request_json = request.json
+            with self.timed("parse"):
+                request_json = request.json
             if self.verbose:
                 print(request_json)
             request_data = None if not request_json else request_json
+
+            # Stream partial results if the frontend supports it
+            stream_type = request.accept_mimetypes.best_match(
+                ["application/json", "application/x-ndjson", "text/event-stream"],
+                default="application/json",
+            )
+            if self.job_manager is None and stream_type != "application/json":
+                return stream_compute(app_name, request_data, stream_type)
+
+            try:
+                if self.job_manager is None:
+                    payload = self.compute(app_name, request_data)
+                else:
+                    payload = self.submit_job(app_name, request_data)
+                    if isinstance(payload, Job):
+                        return jsonify(payload.describe()), 202
+            except Exception as e:
+                return error_response(e)
+
+            with self.timed("jsonify"):
+                return jsonify(self.delta(payload, self.known_stages()))
+
+        @self.flask_app.route("/<path:app_path>/zoom", methods=["POST"])
+        def app_path_zoom(app_path):
+            app_name = app_path.replace("/", ".")
+            # If the app_name doesn't exist raise a 404
+            if self.apps.get(app_name) is None:
+                abort(404)
+
+            # The request of the plot, its index and the visible axis ranges
+            request_json = request.json
+            if not isinstance(request_json, dict):
+                return 'A "request" and a "plot" index are required.', 400
             try:
-                docs, settings, plots = (
-                    self.apps[app_name].compute(request_data).get_stages()
+                plot = self.zoom(
+                    app_name,
+                    request_json.get("request") or None,
+                    request_json.get("plot"),
+                    request_json.get("x_range"),
+                    request_json.get("y_range"),
                 )
-            except ResponseError as e:
+            except Exception as e:
+                return error_response(e)
+            return jsonify(plot)
+
+        @self.flask_app.route("/<path:app_path>/batch", methods=["POST"])
+        def app_path_batch(app_path):
+            app_name = app_path.replace("/", ".")
+            # If the app_name doesn't exist raise a 404
+            if self.apps.get(app_name) is None:
+                abort(404)
+            if self.metrics is not None:
+                g.timer = RequestTimer(app_name)
+
+            # Either a list of requests or a sweep over the values of some parameters
+            with self.timed("parse"):
+                request_json = request.json
+            try:
+                if not isinstance(request_json, dict):
+                    raise ValueError('Either "requests" or "sweep" is required.')
+                if "sweep" in request_json:
+                    requests = expand_sweep(request_json.get("base"), request_json["sweep"])
+                else:
+                    requests = request_json.get("requests")
+                if not isinstance(requests, list):
+                    raise ValueError('Either "requests" or "sweep" is required.')
+            except ValueError as e:
                 return str(e), 400
+            if len(requests) > self.batch_limit:
+                return f"A batch may contain at most {self.batch_limit} requests.", 400
+
+            results = self.compute_batch(app_name, requests)
+
+            # Stream the results as they finish if the frontend supports it
+            stream_type = request.accept_mimetypes.best_match(
+                ["application/json", "application/x-ndjson"],
+                default="application/json",
+            )
+            if stream_type == "application/x-ndjson":
+
+                def generate() -> Iterator[str]:
+                    try:
+                        for index, payload in results:
+                            yield self.flask_app.json.dumps({"index": index, "result": payload}) + "\n"
+                    except Exception as e:
+                        yield self.flask_app.json.dumps(error_payload(e)) + "\n"
+
+                return Response(stream_with_context(generate()), mimetype=stream_type)
+
+            ordered: list[dict[str, Any] | None] = [None] * len(requests)
+            try:
+                with self.timed("compute"):
+                    for index, payload in results:
+                        ordered[index] = payload
+            except Exception as e:
+                return error_response(e)
+
+            with self.timed("jsonify"):
+                return jsonify({"requests": requests, "results": ordered})
+
+        def get_job(app_path: str, job_id: str) -> Job:
+            job = None
+            if self.job_manager is not None:
+                job = self.job_manager.get(app_path.replace("/", "."), job_id)
+            if job is None:
+                abort(404)
+            return job
+
+        @self.flask_app.route(
+            "/<path:app_path>/jobs/<job_id>", methods=["GET", "DELETE"]
+        )
+        def app_path_job(app_path, job_id):
+            job = get_job(app_path, job_id)
+            if request.method == "DELETE":
+                cancelled = self.job_manager.cancel(job)
+                return jsonify({**job.describe(), "cancelled": cancelled})
+            return jsonify(job.describe())
+
+        @self.flask_app.route("/<path:app_path>/jobs/<job_id>/result", methods=["GET"])
+        def app_path_job_result(app_path, job_id):
+            job = get_job(app_path, job_id)
+
+            # Long polling: wait (at most 30s) for the result before answering
+            wait = min(request.args.get("wait", 0, type=float), 30)
+            try:
+                payload = self.job_manager.result(job, wait)
+            except CancelledError:
+                return "The computation was cancelled.", 400
             except Exception as e:
-                return f"<b>Internal Error</b><br>{str(e)}", 400
+                return error_response(e)
 
-            # Serialize them to objects
-            docs = [stage.serialize() for stage in docs]
-            settings = [stage.serialize() for stage in settings]
-            plots = [stage.serialize() for stage in plots]
-            return jsonify({"docs": docs, "settings": settings, "plots": plots})
+            if payload is None:
+                return jsonify(job.describe()), 202
+            return jsonify(payload)
 
         @self.flask_app.route("/<path:app_path>/documentation", methods=["GET"])
         def app_path_documentation(app_path):
             app_name = app_path.replace("/", ".")
             # If the app_name doesn't exist raise a 404
-            if app_name not in self.apps.keys():
+            if self.apps.get(app_name) is None:
                 abort(404)
 
-            documentation = (
-                "Sorry, but it seems that there is no dedicated documentation."
+            return jsonify({"text": self.documentation(app_path)})
+
+    def export(
+        self,
+        out_dir: str,
+        application_root: str | None = None,
+        compress: bool = True,
+    ) -> list[str]:
+        """Pre-renders all pages, so that everything except the compute requests
+        can be served by a static web server.
+
+        The index pages and app shells are written as `<path>/index.html`, the
+        documentation of the apps as `<app>/documentation.json` and the static
+        files are copied. With nginx, `try_files $uri $uri/index.html $uri.json`
+        finds them and `gzip_static`/`brotli_static` serve the compressed files.
+
+        Args:
+            out_dir (str): The directory the files are written to.
+            application_root (str | None): The root the site is served at, None to use the one of the site.
+            compress (bool): If `.gz` (and `.br` if brotli is installed) files should be written as well.
+
+        Returns:
+            list[str]: The paths of all written files.
+        """
+        pages: dict[str, Callable[[], str]] = {
+            "index.html": lambda: self.render_index_page("README.md")
+        }
+        for folder in self.index_folders():
+            index_file_path = os.path.join(self.apps_path, folder, "index.md")
+            pages[f"{folder}/index.html"] = (
+                lambda f=index_file_path, folder=folder: self.render_index_page(
+                    f, folder + "/"
+                )
             )
-            if os.path.exists(f"{self.apps_path}/{app_path}.md"):
-                documentation = open(f"{self.apps_path}/{app_path}.md").read()
-            return jsonify({"text": documentation})
+        for app_name in self.apps:
+            if self.apps.get(app_name) is None:  # Not an app, only in lazy mode
+                continue
+            app_path = app_name.replace(".", "/")
+            pages[f"{app_path}/index.html"] = lambda a=app_name: self.render_app_page(a)
+            pages[f"{app_path}/documentation.json"] = lambda a=app_path: json.dumps(
+                {"text": self.documentation(a)}
+            )
+
+        written = []
+        root = self.application_root
+        if application_root is not None:
+            self.application_root = application_root
+        try:
+            with self.flask_app.test_request_context():
+                for name, render in pages.items():
+                    path = os.path.join(out_dir, *name.split("/"))
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    with open(path, "w") as f:
+                        f.write(render())
+                    written.append(path)
+        finally:
+            self.application_root = root
+
+        # Static files
+        static_folder = os.path.join(self.wepps_path, "static")
+        shutil.copy2(os.path.join(static_folder, "favicon.ico"), out_dir)
+        written.append(os.path.join(out_dir, "favicon.ico"))
+        folders = [
+            (os.path.join(static_folder, "assets"), os.path.join(out_dir, "assets")),
+            (
+                os.path.join(os.getcwd(), "doc", "images"),
+                os.path.join(out_dir, "doc", "images"),
+            ),
+        ]
+        for source, target in folders:
+            if os.path.isdir(source):
+                shutil.copytree(source, target, dirs_exist_ok=True)
+                written += [os.path.join(target, f) for f in os.listdir(source)]
+
+        if compress:
+            for path in list(written):
+                if path.endswith(COMPRESSIBLE_EXTENSIONS):
+                    written += write_compressed(path)
+
+        if self.verbose:
+            print(f"Exported {len(written)} files to {out_dir}")
+        return written
 
     def wsgi(self) -> Flask:
         return self.flask_app
 
-    def run(self) -> None:
-        self.flask_app.run(debug=True, host="0.0.0.0", port=8000)
+    def asgi(self, threads: int | None = None) -> ASGIApp:
+        """Returns the site as an ASGI application, e.g. for uvicorn. Compute
+        requests of apps with an `async def` compute function are awaited in the
+        event loop, everything else is run by flask in a pool of threads.
+
+        Args:
+            threads (int | None): The number of threads, None for the executors default.
+        """
+        return ASGIApp(self, threads)
+
+    def async_compute_app(self, environ: dict[str, Any]) -> str | None:
+        """Returns the name of the app, if the request can be answered by
+        `compute_response_async`, i.e. it's a compute request expecting plain
+        JSON of a loaded app with an `async def` compute function.
+        """
+        path = environ.get("PATH_INFO", "")
+        if (
+            environ["REQUEST_METHOD"] != "POST"
+            or not path.endswith("/compute")
+            or self.job_manager is not None
+        ):
+            return None
+        app_name = path[1 : -len("/compute")].replace("/", ".")
+        if isinstance(self.apps, LazyApps):  # Importing would block the event loop
+            app = self.apps.instances.get(app_name)
+        else:
+            app = self.apps.get(app_name)
+        if app is None or not app.is_async:
+            return None
+
+        stream_type = Request(environ).accept_mimetypes.best_match(
+            ["application/json", "application/x-ndjson", "text/event-stream"],
+            default="application/json",
+        )
+        return app_name if stream_type == "application/json" else None
+
+    async def compute_response_async(
+        self, app_name: str, environ: dict[str, Any]
+    ) -> Response:
+        """Answers a compute request like the compute route, but awaits the
+        computation in the event loop of the ASGI server.
+        """
+        with self.flask_app.request_context(environ):
+            if self.metrics is not None:
+                g.timer = RequestTimer(app_name)
+            try:
+                with self.timed("parse"):
+                    request_json = request.json
+            except HTTPException as e:
+                return self.flask_app.process_response(self.flask_app.make_response(e))
+            if self.verbose:
+                print(request_json)
+            request_data = None if not request_json else request_json
+
+            try:
+                payload = await self.compute_async(app_name, request_data)
+                with self.timed("jsonify"):
+                    rv = jsonify(self.delta(payload, self.known_stages()))
+            except Exception as e:
+                rv = error_response(e)
+            return self.flask_app.process_response(self.flask_app.make_response(rv))
+
+    def run(
+        self,
+        production: bool = False,
+        host: str = "0.0.0.0",
+        port: int = 8000,
+        workers: int | None = None,
+        threads: int = 8,
+        preload: bool = True,
+        server: str = "auto",
+    ) -> None:
+        """Serves the site, by default with the development server of flask.
+
+        Args:
+            production (bool): Serve with several worker processes forked from this process
+                instead, see `wepps.serving.serve`.
+            host (str): The host to listen on.
+            port (int): The port to listen on.
+            workers (int | None): The number of worker processes, None for the number of CPUs.
+            threads (int): The number of threads per worker.
+            preload (bool): Import all lazy apps and load all datasets before forking, so they
+                are shared by the workers instead of being loaded by each of them.
+            server (str): 'gunicorn', 'werkzeug' or 'auto' to use gunicorn if it is installed.
+        """
+        if not production:
+            self.flask_app.run(debug=True, host=host, port=port)
+            return
+
+        if preload:
+            if self.lazy_apps:
+                self.apps.load_all()
+            self.datasets.load_all()
+        # Removes the shared memory of datasets the workers loaded themselves
+        serve(self.flask_app, host, port, workers, threads, server, self.datasets.close)
@@ -0,0 +1,79 @@
+import re
+import warnings
+
+import numpy as np
+
+LINSPACE = re.compile(r"linspace\(([^()]*)\)")
+
+
+def _parse_values(text: str) -> np.ndarray:
+    # Values might be separated by commas, semicolons or whitespace. NumPy parses
+    # the whole string at once without creating a Python float for each value.
+    text = text.replace(",", " ").replace(";", " ")
+    if not text.strip():  # NumPy would return [-1.0] for only separators
+        return np.empty(0)
+    with warnings.catch_warnings():
+        # Older NumPy versions only warn about unparsable data and stop there
+        warnings.simplefilter("error", DeprecationWarning)
+        try:
+            return np.fromstring(text, dtype=np.float64, sep=" ")
+        except DeprecationWarning as e:
+            raise ValueError(str(e))
+
+
+def parse_array(text: str, max_size: int | None = None) -> np.ndarray:
+    """Parses a list of numbers like "1, 2.5, 3", where `linspace(a, b, n)`
+    inserts n evenly spaced values from a to b, e.g. "0, linspace(1, 2, 11), 5".
+
+    Args:
+        text (str): The input from the frontend.
+        max_size (int | None): The maximal number of values, None for no limit.
+
+    Raises:
+        ValueError: If the text can't be parsed or contains more than `max_size` values.
+
+    Returns:
+        np.ndarray: The flat float64 array.
+    """
+    if "(" not in text:  # Fast path for plain lists
+        array = _parse_values(text)
+    else:
+        parts = []
+        position = 0
+        for match in LINSPACE.finditer(text):
+            parts.append(_parse_values(text[position : match.start()]))
+            arguments = [a.strip() for a in match.group(1).split(",")]
+            if len(arguments) != 3:
+                raise ValueError(f"linspace needs three arguments: {match.group(0)}")
+            num = int(arguments[2])
+            if num < 0 or (max_size is not None and num > max_size):
+                raise ValueError(f"Invalid number of values: {match.group(0)}")
+            parts.append(np.linspace(float(arguments[0]), float(arguments[1]), num))
+            position = match.end()
+        parts.append(_parse_values(text[position:]))
+        array = np.concatenate(parts)
+
+    if max_size is not None and array.size > max_size:
+        raise ValueError(f"More than {max_size} values.")
+    return array
+
+
+def format_array(array: np.ndarray) -> str:
+    """Formats an array as text parsed by `parse_array`. Evenly spaced float
+    values are written as `linspace(a, b, n)`, if this reproduces them exactly.
+    Arrays with several dimensions are written row by row, separated by
+    semicolons, and an `Array` parameter with the same `shape` reshapes them again.
+    """
+    array = np.asarray(array)
+    if array.ndim > 1:
+        rows = array.reshape(array.shape[0], -1)
+        return "; ".join(format_array(row) for row in rows)
+    flat = array.ravel()
+    if flat.dtype.kind == "b":
+        flat = flat.astype(np.int64)
+    # Integer dtypes are never written as linspace, whose values are floats
+    if flat.size > 3 and flat.dtype.kind == "f":
+        start, stop = flat[0].item(), flat[-1].item()
+        if np.array_equal(np.linspace(start, stop, flat.size), flat):
+            return f"linspace({start}, {stop}, {flat.size})"
+    return ", ".join(str(v) for v in flat.tolist())
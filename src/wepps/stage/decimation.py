@@ -0,0 +1,253 @@
+import math
+from typing import Any
+
+import numpy as np
+
+from wepps.stage.figures import as_array, is_typed_array
+
+LINE_TRACES = ("scatter", "scattergl")
+GRID_TRACES = ("heatmap", "contour")
+
+# Above this many points per target point, min-max decimation preselects the
+# candidates for LTTB, which is slower as it loops over the buckets
+PRESELECT_FACTOR = 8
+
+
+def minmax_indices(y: np.ndarray, buckets: int) -> np.ndarray:
+    """Returns the sorted indices of the first and last point and of the
+    minimum and maximum of `buckets` equally sized chunks, which keeps the
+    envelope of a noisy signal.
+    """
+    n = len(y)
+    size = math.ceil(n / buckets)
+    chunks = math.ceil(n / size)
+    # Pad with the last value, so all chunks have the same size
+    padded = np.concatenate([y, np.full(chunks * size - n, y[-1])]).reshape(chunks, size)
+    offsets = np.arange(chunks) * size
+    indices = np.concatenate(
+        [[0, n - 1], offsets + padded.argmin(axis=1), offsets + padded.argmax(axis=1)]
+    )
+    return np.unique(np.minimum(indices, n - 1))
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """Returns the indices of `n_out` points selected by the Largest
+    Triangle Three Buckets algorithm, which keeps the visual shape of a line.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    # The first and the last point are kept, the others are split into n_out - 2 buckets
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.intp)
+    indices = np.empty(n_out, dtype=np.intp)
+    indices[0], indices[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        start, stop = edges[i], edges[i + 1]
+        next_stop = edges[i + 2] if i + 2 < len(edges) else n
+        next_x = x[stop:next_stop].mean()
+        next_y = y[stop:next_stop].mean()
+        # Twice the area of the triangles between a, each point of the bucket and the next average
+        areas = np.abs(
+            (x[a] - next_x) * (y[start:stop] - y[a]) - (x[a] - x[start:stop]) * (next_y - y[a])
+        )
+        a = start + int(np.argmax(areas)) if stop > start else start
+        indices[i + 1] = a
+    return indices
+
+
+def decimate_indices(x: np.ndarray, y: np.ndarray, max_points: int) -> np.ndarray:
+    """Selects at most `max_points` points of a line trace."""
+    if len(x) > PRESELECT_FACTOR * max_points:
+        candidates = minmax_indices(y, 2 * max_points)
+        return candidates[lttb_indices(x[candidates], y[candidates], max_points)]
+    return lttb_indices(x, y, max_points)
+
+
+def parse_range(axis_range: Any) -> tuple[float, float] | None:
+    """Returns the sorted limits of an axis range sent by the frontend.
+
+    Raises:
+        ValueError: If the range isn't None or a list of two numbers.
+    """
+    if axis_range is None:
+        return None
+    if not isinstance(axis_range, (list, tuple)) or len(axis_range) != 2:
+        raise ValueError("An axis range must be a list of two numbers.")
+    low, high = sorted(float(v) for v in axis_range)
+    return low, high
+
+
+def in_range(values: np.ndarray, axis_range: tuple[float, float]) -> np.ndarray:
+    # Includes one point beyond each end, so lines continue to the border of the plot
+    mask = (values >= axis_range[0]) & (values <= axis_range[1])
+    extended = mask.copy()
+    extended[1:] |= mask[:-1]
+    extended[:-1] |= mask[1:]
+    return extended
+
+
+def take(value: Any, n: int, selection: np.ndarray) -> Any:
+    """Applies the selection to per-point attributes of a trace (e.g. text or
+    marker colors), which have the same length as the coordinates.
+    """
+    if isinstance(value, dict) and not is_typed_array(value):
+        return {key: take(v, n, selection) for key, v in value.items()}
+    if isinstance(value, (list, tuple, np.ndarray, dict)):
+        array = as_array(value)
+        if array.ndim >= 1 and len(array) == n:
+            return array[selection]
+    return value
+
+
+def decimate_line(
+    trace: dict[str, Any],
+    max_points: int,
+    x_range: tuple[float, float] | None,
+) -> dict[str, Any] | None:
+    if "y" not in trace:
+        return None
+    y = as_array(trace["y"])
+    n = len(y) if y.ndim == 1 else 0
+    if y.dtype.kind not in "iuf" or n == 0:
+        return None
+    x = as_array(trace["x"]) if "x" in trace else np.arange(n)
+    if x.shape != y.shape or x.dtype.kind not in "iuf":
+        return None
+
+    selection = np.arange(n)
+    if x_range is not None:
+        selection = selection[in_range(x, x_range)]
+    if len(selection) > max_points:
+        selection = selection[
+            decimate_indices(x[selection].astype(float), y[selection].astype(float), max_points)
+        ]
+    if len(selection) == n:
+        return None
+
+    decimated = {key: take(value, n, selection) for key, value in trace.items()}
+    decimated["x"] = x[selection]
+    return decimated
+
+
+def coarsen_axis(
+    coordinates: np.ndarray, factor: int, axis_range: tuple[float, float] | None
+) -> tuple[np.ndarray, np.ndarray]:
+    """Returns the kept indices along one axis of a grid and the coordinates
+    of the coarsened cells, i.e. the means of `factor` neighboring ones.
+    """
+    kept = np.arange(len(coordinates))
+    if axis_range is not None:
+        kept = kept[in_range(coordinates, axis_range)]
+    size = math.ceil(len(kept) / factor) * factor
+    padded = np.concatenate([coordinates[kept], np.full(size - len(kept), np.nan)])
+    return kept, np.nanmean(padded.reshape(-1, factor), axis=1)
+
+
+def block_mean(z: np.ndarray, row_factor: int, col_factor: int) -> np.ndarray:
+    rows = math.ceil(z.shape[0] / row_factor) * row_factor
+    cols = math.ceil(z.shape[1] / col_factor) * col_factor
+    padded = np.full((rows, cols), np.nan)
+    padded[: z.shape[0], : z.shape[1]] = z
+    blocks = padded.reshape(rows // row_factor, row_factor, cols // col_factor, col_factor)
+    # Blocks of NaN only (e.g. masked regions of a contour) stay NaN
+    counts = np.sum(~np.isnan(blocks), axis=(1, 3))
+    sums = np.nansum(blocks, axis=(1, 3))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(counts > 0, sums / counts, np.nan)
+
+
+def axis_coordinates(trace: dict[str, Any], axis: str, n: int) -> np.ndarray | None:
+    if axis in trace:
+        coordinates = as_array(trace[axis]).astype(float)
+        return coordinates if coordinates.shape == (n,) else None
+    return trace.get(f"{axis}0", 0) + trace.get(f"d{axis}", 1) * np.arange(n, dtype=float)
+
+
+def coarsen_grid(
+    trace: dict[str, Any],
+    max_grid: int,
+    x_range: tuple[float, float] | None,
+    y_range: tuple[float, float] | None,
+) -> dict[str, Any] | None:
+    if "z" not in trace:
+        return None
+    z = as_array(trace["z"])
+    if z.ndim != 2 or z.dtype.kind not in "iuf" or trace.get("transpose"):
+        return None
+    x = axis_coordinates(trace, "x", z.shape[1])
+    y = axis_coordinates(trace, "y", z.shape[0])
+    if x is None or y is None:  # E.g. categories or cell edges
+        return None
+
+    cols = len(x) if x_range is None else int(in_range(x, x_range).sum())
+    rows = len(y) if y_range is None else int(in_range(y, y_range).sum())
+    col_factor = max(1, math.ceil(cols / max_grid))
+    row_factor = max(1, math.ceil(rows / max_grid))
+    if (cols, rows, col_factor, row_factor) == (len(x), len(y), 1, 1):
+        return None
+
+    kept_cols, x = coarsen_axis(x, col_factor, x_range)
+    kept_rows, y = coarsen_axis(y, row_factor, y_range)
+    z = z[np.ix_(kept_rows, kept_cols)].astype(float)
+
+    # Per-cell attributes can't be averaged, so they are dropped
+    coarsened = {
+        key: value
+        for key, value in trace.items()
+        if key not in ("x0", "dx", "y0", "dy", "text", "hovertext", "customdata")
+    }
+    coarsened["x"], coarsened["y"] = x, y
+    coarsened["z"] = block_mean(z, row_factor, col_factor)
+    return coarsened
+
+
+def decimate_figure(
+    figure: dict[str, Any],
+    max_points: int | None = None,
+    max_grid: int | None = None,
+    x_range: Any = None,
+    y_range: Any = None,
+) -> tuple[dict[str, Any], bool]:
+    """Reduces the traces of a figure to a bounded size. Line traces are
+    decimated to at most `max_points` points, heatmap and contour grids are
+    coarsened to at most `max_grid` cells along each axis. With axis ranges,
+    only the data within them is kept (and then decimated), e.g. for zooming in.
+
+    Args:
+        figure (dict[str, Any]): A Plotly figure dictionary, which isn't changed.
+        max_points (int | None): The maximal number of points per line trace, None to keep all.
+        max_grid (int | None): The maximal number of grid cells along each axis, None to keep all.
+        x_range (Any): The visible [min, max] of the x axis or None.
+        y_range (Any): The visible [min, max] of the y axis or None.
+
+    Raises:
+        ValueError: If a range isn't a list of two numbers.
+
+    Returns:
+        tuple[dict[str, Any], bool]: The figure with reduced traces and if any trace was reduced.
+    """
+    x_range, y_range = parse_range(x_range), parse_range(y_range)
+    reduced = False
+    data = []
+    for trace in figure.get("data") or []:
+        new = None
+        trace_type = trace.get("type", "scatter")
+        if trace_type in LINE_TRACES and (max_points is not None or x_range is not None):
+            new = decimate_line(trace, max_points or np.iinfo(np.intp).max, x_range)
+        elif trace_type in GRID_TRACES and (max_grid is not None or x_range or y_range):
+            new = coarsen_grid(trace, max_grid or np.iinfo(np.intp).max, x_range, y_range)
+        reduced |= new is not None
+        data.append(trace if new is None else new)
+
+    if not reduced and x_range is None and y_range is None:
+        return figure, False
+    figure = {**figure, "data": data}
+    if x_range is not None or y_range is not None:
+        # Keep the zoomed view instead of autoscaling to the reduced data
+        layout = dict(figure.get("layout") or {})
+        for axis, axis_range in (("xaxis", x_range), ("yaxis", y_range)):
+            if axis_range is not None:
+                layout[axis] = {**(layout.get(axis) or {}), "range": list(axis_range), "autorange": False}
+        figure["layout"] = layout
+    return figure, reduced
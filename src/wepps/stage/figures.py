@@ -0,0 +1,94 @@
+import base64
+from typing import Any
+
+import numpy as np
+
+# Lists shorter than this are kept as they are, as encoding wouldn't pay off
+MIN_ENCODED_LENGTH = 16
+
+
+def encode_array(array: np.ndarray) -> dict[str, str] | list[Any]:
+    """Encodes a numeric array as a base64 typed array in the format of
+    plotly.js, i.e. {"dtype": "f8", "bdata": "...", "shape": "rows, cols"}.
+
+    Args:
+        array (np.ndarray): The array to encode.
+
+    Returns:
+        dict[str, str] | list[Any]: The typed array or a list if the array can't be encoded.
+    """
+    kind = array.dtype.kind
+    if kind not in "iuf" or array.ndim > 2:
+        return array.tolist()
+
+    # JavaScript has neither 64 bit integer nor 16 bit float typed arrays
+    if kind in "iu" and array.dtype.itemsize == 8:
+        int32 = np.iinfo(np.int32)
+        fits = array.size == 0 or (array.min() >= int32.min and array.max() <= int32.max)
+        array = array.astype(np.int32 if fits else np.float64)
+    elif kind == "f" and array.dtype.itemsize == 2:
+        array = array.astype(np.float32)
+
+    array = np.ascontiguousarray(array, dtype=array.dtype.newbyteorder("<"))
+    encoded = {
+        "dtype": f"{array.dtype.kind}{array.dtype.itemsize}",
+        "bdata": base64.b64encode(array.tobytes()).decode("ascii"),
+    }
+    if array.ndim == 2:
+        encoded["shape"] = f"{array.shape[0]}, {array.shape[1]}"
+    return encoded
+
+
+def is_typed_array(value: Any) -> bool:
+    return isinstance(value, dict) and "bdata" in value and "dtype" in value
+
+
+def decode_array(value: dict[str, str]) -> np.ndarray:
+    """Decodes a typed array in the format of plotly.js, which newer Plotly
+    versions also create for NumPy arrays in `to_plotly_json`."""
+    dtype = np.dtype(value["dtype"]).newbyteorder("<")
+    array = np.frombuffer(base64.b64decode(value["bdata"]), dtype=dtype)
+    if "shape" in value:
+        array = array.reshape([int(n) for n in str(value["shape"]).split(",")])
+    return array
+
+
+def as_array(value: Any) -> np.ndarray:
+    return decode_array(value) if is_typed_array(value) else np.asarray(value)
+
+
+def encode_value(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {key: encode_value(v) for key, v in value.items()}
+    if isinstance(value, np.ndarray):
+        return value.item() if value.ndim == 0 else encode_array(value)
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (list, tuple)):
+        if len(value) >= MIN_ENCODED_LENGTH:
+            try:
+                array = np.asarray(value)
+            except ValueError:  # Ragged nested lists
+                array = None
+            if array is not None and array.dtype.kind in "iuf":
+                return encode_array(array)
+        return [encode_value(v) for v in value]
+    return value
+
+
+def encode_figure(plot: Any) -> Any:
+    """Converts a plot into an object that is JSON encoded only once, together
+    with the rest of the response. Numeric arrays are sent as typed arrays.
+
+    Args:
+        plot (Any): A Plotly figure, a figure dictionary (which might contain NumPy arrays),
+            a figure already converted to a JSON string or None.
+
+    Returns:
+        Any: The JSON serializable figure.
+    """
+    if plot is None or isinstance(plot, str):
+        return plot
+    if hasattr(plot, "to_plotly_json"):
+        plot = plot.to_plotly_json()
+    return encode_value(plot)
@@ -0,0 +1,66 @@
+import json
+from typing import Any, Callable
+
+
+class JSONFragment(dict):
+    __slots__ = ("json",)
+
+    def __init__(self, data: dict[str, Any], encoded: str) -> None:
+        """A serialized stage or parameter together with its JSON encoding. It
+        behaves like a normal dictionary, but responses embed the encoding
+        instead of encoding the dictionary again. It must not be modified.
+
+        Args:
+            data (dict[str, Any]): The serialized object.
+            encoded (str): The JSON encoding of `data`.
+        """
+        super().__init__(data)
+        self.json: str = encoded
+
+
+def make_fragment(data: dict[str, Any]) -> dict[str, Any]:
+    """Returns the data as a JSONFragment, or unchanged if it can't be encoded
+    by the json module (e.g. if it contains NumPy numbers). The keys are sorted
+    like by the JSON provider of flask, so the encoding of a stage is the same
+    whether it was memoized or not."""
+    try:
+        return JSONFragment(data, json.dumps(data, separators=(",", ":"), sort_keys=True))
+    except (TypeError, ValueError):
+        return data
+
+
+def dumps_with_fragments(obj: Any, dumps: Callable[[Any], str], depth: int = 4) -> str:
+    """Encodes an object with `dumps`, but embeds the encoding of the
+    JSONFragments within the first `depth` levels of lists and dictionaries.
+
+    Args:
+        obj (Any): The object to encode, e.g. a serialized response.
+        dumps (Callable[[Any], str]): Encodes everything that isn't a fragment.
+        depth (int): The nesting level up to which fragments are searched.
+
+    Returns:
+        str: The JSON encoding.
+    """
+    if isinstance(obj, JSONFragment):
+        return obj.json
+    if depth > 0 and isinstance(obj, dict):
+        # Sorted like the keys of fragments and of everything encoded by flask
+        items = (
+            f"{dumps(str(key))}:{dumps_with_fragments(value, dumps, depth - 1)}"
+            for key, value in sorted(obj.items(), key=lambda item: str(item[0]))
+        )
+        return "{" + ",".join(items) + "}"
+    if depth > 0 and isinstance(obj, (list, tuple)):
+        return "[" + ",".join(dumps_with_fragments(v, dumps, depth - 1) for v in obj) + "]"
+    return dumps(obj)
+
+
+class Memoized:
+    __slots__ = ("_serialized",)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        # Every change of an attribute invalidates the memoized serialization.
+        # Note, that changes inside of attributes (e.g. appending to a list) aren't noticed.
+        object.__setattr__(self, name, value)
+        if name != "_serialized":
+            object.__setattr__(self, "_serialized", None)
@@ -1,6 +1,13 @@
+import math
 from typing import Any
 from enum import Enum
 
+import numpy as np
+
+from wepps.stage.arrays import format_array, parse_array
+from wepps.stage.fragments import Memoized, make_fragment
+
+
 class WebType(Enum):
     Integer = "Integer"
     PositiveInteger = "PositiveInteger"
@@ -10,9 +17,11 @@ class WebType(Enum):
     Enumeration = "Enumeration"
     FloatList = "FloatList"
     Boolean = "Boolean"
+    Array = "Array"
 
 
-class Parameter:
+class Parameter(Memoized):
+    __slots__ = ("id", "name", "placeholder", "doc", "type", "optional", "choices", "value")
     ids: list[str] = []  # Keep track of all ids to check for uniqueness.
 
     def __init__(
@@ -52,16 +61,25 @@ class Parameter:
         ] | str | None = value  # None if no default value exists
 
     def serialize(self) -> dict[str, Any]:
-        return {
-            "id": self.id,
-            "name": self.name,
-            "placeholder": self.placeholder,
-            "doc": self.doc,
-            "type": self.type.value,
-            "optional": self.optional,
-            "choices": self.choices,
-            "value": self.value,
-        }
+        # Memoized until an attribute is set
+        if self._serialized is None:
+            self._serialized = make_fragment(
+                {
+                    "id": self.id,
+                    "name": self.name,
+                    "placeholder": self.placeholder,
+                    "doc": self.doc,
+                    "type": self.type.value,
+                    "optional": self.optional,
+                    "choices": self.choices,
+                    "value": self.serialize_value(self.value),
+                }
+            )
+        return self._serialized
+
+    def serialize_value(self, value: Any) -> Any:
+        """Converts a value of this parameter into the form sent to the frontend."""
+        return value
 
     def convert(self, value: str) -> Any:
         """Converts the value to the python type of this parameter.
@@ -78,8 +96,80 @@ class Parameter:
 
         raise NotImplementedError("Conversion function not implemented!")
 
+    def check(self, value: Any) -> None:
+        """Checks the constraints of this parameter on a converted value.
+
+        Args:
+            value (Any): The value returned by `convert`.
+
+        Raises:
+            ValueError: If the value violates a constraint, with a message shown to the user.
+        """
+        pass
+
+    def overlay(self, **overrides: Any) -> "ParameterOverlay":
+        """Returns a view of this parameter with some attributes overridden,
+        e.g. `parameter.overlay(value=3)`, without copying it.
+
+        Returns:
+            ParameterOverlay: The view of this parameter.
+        """
+        return ParameterOverlay(self, overrides)
+
+
+class ParameterOverlay:
+    __slots__ = ("template", "overrides", "_serialized")
+
+    def __init__(self, template: Parameter, overrides: dict[str, Any]) -> None:
+        """A per request view of a parameter. Only the overridden attributes are
+        stored, everything else is read from the shared template, which is never
+        modified. Setting an attribute only changes the overlay.
+
+        Args:
+            template (Parameter): The parameter as declared by the app.
+            overrides (dict[str, Any]): The overridden attributes, e.g. {"value": 3}.
+        """
+        object.__setattr__(self, "template", template)
+        object.__setattr__(self, "overrides", overrides)
+        # The serialized template and the serialization of the overlay based on it
+        object.__setattr__(self, "_serialized", None)
+
+    def __getattr__(self, name: str) -> Any:
+        # Only called for attributes that aren't set on the overlay itself
+        if name in self.__slots__:  # Not yet set, e.g. while unpickling
+            raise AttributeError(name)
+        overrides = self.overrides
+        if name in overrides:
+            return overrides[name]
+        return getattr(self.template, name)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        self.overrides[name] = value
+        object.__setattr__(self, "_serialized", None)
+
+    def overlay(self, **overrides: Any) -> "ParameterOverlay":
+        # Overlays of overlays share the template
+        return ParameterOverlay(self.template, {**self.overrides, **overrides})
+
+    def serialize(self) -> dict[str, Any]:
+        base = self.template.serialize()
+        if self._serialized is None or self._serialized[0] is not base:
+            result = dict(base)
+            for name, value in self.overrides.items():
+                if name == "value":
+                    value = self.template.serialize_value(value)
+                if name in result:
+                    result[name] = value.value if isinstance(value, WebType) else value
+            object.__setattr__(self, "_serialized", (base, make_fragment(result)))
+        return self._serialized[1]
+
+    def convert(self, value: str) -> Any:
+        return self.template.convert(value)
+
 
 class Integer(Parameter):
+    __slots__ = ()
+
     def __init__(
         self,
         unique_id: str,
@@ -98,6 +188,8 @@ class Integer(Parameter):
 
 
 class PositiveInteger(Parameter):
+    __slots__ = ()
+
     def __init__(
         self,
         unique_id: str,
@@ -121,8 +213,14 @@ class PositiveInteger(Parameter):
     def convert(self, value: str) -> Any:
         return int(value)
 
+    def check(self, value: Any) -> None:
+        if value < 0:
+            raise ValueError("Must be positive.")
+
 
 class StrictlyPositiveInteger(Parameter):
+    __slots__ = ()
+
     def __init__(
         self,
         unique_id: str,
@@ -146,8 +244,14 @@ class StrictlyPositiveInteger(Parameter):
     def convert(self, value: str) -> Any:
         return int(value)
 
+    def check(self, value: Any) -> None:
+        if value <= 0:
+            raise ValueError("Must be strictly positive.")
+
 
 class PositiveFloat(Parameter):
+    __slots__ = ()
+
     def __init__(
         self,
         unique_id: str,
@@ -171,8 +275,16 @@ class PositiveFloat(Parameter):
     def convert(self, value: str) -> Any:
         return float(value)
 
+    def check(self, value: Any) -> None:
+        if not math.isfinite(value):
+            raise ValueError("Must be a finite number.")
+        if value < 0:
+            raise ValueError("Must be positive.")
+
 
 class Float(Parameter):
+    __slots__ = ()
+
     def __init__(
         self,
         unique_id: str,
@@ -189,8 +301,14 @@ class Float(Parameter):
     def convert(self, value: str) -> Any:
         return float(value)
 
+    def check(self, value: Any) -> None:
+        if not math.isfinite(value):
+            raise ValueError("Must be a finite number.")
+
 
 class Enumeration(Parameter):
+    __slots__ = ()
+
     def __init__(
         self,
         unique_id: str,
@@ -215,8 +333,14 @@ class Enumeration(Parameter):
     def convert(self, value: str) -> Any:
         return value
 
+    def check(self, value: Any) -> None:
+        if value not in self.choices:
+            raise ValueError(f"Must be one of {', '.join(self.choices)}.")
+
 
 class FloatList(Parameter):
+    __slots__ = ()
+
     def __init__(
         self,
         unique_id: str,
@@ -231,10 +355,18 @@ class FloatList(Parameter):
         )
 
     def convert(self, value: str) -> Any:
+        if isinstance(value, (list, tuple)):  # Already converted
+            return [float(v) for v in value]
         return [float(v) for v in value.split(",") if v != ""]
 
+    def check(self, value: Any) -> None:
+        if not all(math.isfinite(v) for v in value):
+            raise ValueError("Must only contain finite numbers.")
+
 
 class Boolean(Parameter):
+    __slots__ = ()
+
     def __init__(
         self,
         unique_id: str,
@@ -249,4 +381,77 @@ class Boolean(Parameter):
         )
 
     def convert(self, value: str) -> Any:
+        # The frontend sends JSON booleans, but "false" must not become True
+        if isinstance(value, str):
+            if value.lower() not in ("true", "false", "1", "0"):
+                raise ValueError(value)
+            return value.lower() in ("true", "1")
         return bool(value)
+
+
+class Array(Parameter):
+    __slots__ = ("dtype", "shape", "max_size")
+
+    def __init__(
+        self,
+        unique_id: str,
+        name: str,
+        placeholder: str,
+        doc: str,
+        optional: bool,
+        value: np.ndarray | list[float] | str | None = None,
+        dtype: str = "float64",
+        shape: tuple[int | None, ...] | None = None,
+        max_size: int | None = 1_000_000,
+    ) -> None:
+        """Create a new array parameter, which is converted to a NumPy array.
+        The input is a list of numbers separated by commas or whitespace, where
+        `linspace(a, b, n)` inserts n evenly spaced values from a to b.
+
+        Args:
+            dtype (str): The NumPy dtype of the converted array, integer dtypes only accept integral values.
+            shape (tuple[int | None, ...] | None): The required shape, where None stands for any length,
+                e.g. (None, 2) for a list of pairs. The input is reshaped row by row. None for a flat array.
+            max_size (int | None): The maximal number of values, None for no limit.
+        """
+        self.dtype: np.dtype = np.dtype(dtype)
+        self.shape: tuple[int | None, ...] | None = shape
+        self.max_size: int | None = max_size
+        super().__init__(
+            unique_id, name, placeholder, doc, WebType.Array, optional, None, value
+        )
+
+    def serialize_value(self, value: Any) -> Any:
+        if value is None or isinstance(value, str):
+            return value
+        return format_array(np.asarray(value))
+
+    def convert(self, value: str) -> Any:
+        if isinstance(value, str):
+            array = parse_array(value, self.max_size)
+        else:  # Already converted or a JSON list
+            array = np.asarray(value, dtype=np.float64).ravel()
+
+        if self.dtype.kind in "iu":
+            if not np.all(np.isfinite(array)) or np.any(array != np.round(array)):
+                raise ValueError(value)
+        array = array.astype(self.dtype)
+
+        # Reshape if possible, otherwise check reports the required shape
+        if self.shape is not None:
+            known = math.prod(n for n in self.shape if n is not None)
+            unknown = self.shape.count(None)
+            if unknown <= 1 and known > 0 and array.size % known == 0:
+                if unknown == 1 or array.size == known:
+                    array = array.reshape([-1 if n is None else n for n in self.shape])
+        return array
+
+    def check(self, value: Any) -> None:
+        if value.dtype.kind == "f" and not np.all(np.isfinite(value)):
+            raise ValueError("Must only contain finite numbers.")
+        if self.shape is not None and (
+            value.ndim != len(self.shape)
+            or any(n is not None and n != m for n, m in zip(self.shape, value.shape))
+        ):
+            shape = ", ".join("n" if n is None else str(n) for n in self.shape)
+            raise ValueError(f"Must have the shape ({shape}), got {value.size} values.")
@@ -1,10 +1,15 @@
-from copy import deepcopy
 from typing import Any
 
-from wepps.stage.parameters import Parameter
+from wepps.stage.parameters import Parameter, ParameterOverlay
+from wepps.stage.decimation import decimate_figure
+from wepps.stage.figures import encode_figure
+from wepps.stage.fragments import Memoized, make_fragment
+from wepps.stage.validation import StageValidator
 
 
-class DocsStage:
+class DocsStage(Memoized):
+    __slots__ = ("title", "text")
+
     def __init__(
         self,
         title: str,
@@ -25,86 +30,138 @@ class DocsStage:
         )
 
     def serialize(self) -> dict[str, Any]:
-        return {
-            "title": self.title,
-            "text": self.text,
-        }
+        # Memoized until an attribute is set
+        if self._serialized is None:
+            self._serialized = make_fragment(
+                {
+                    "title": self.title,
+                    "text": self.text,
+                }
+            )
+        return self._serialized
+
 
+class SettingsStage(Memoized):
+    __slots__ = ("unique_name", "title", "parameters", "folded", "_validator")
 
-class SettingsStage:
     def __init__(
         self,
         unique_name: str,
         title: str,
-        parameters: list[Parameter],
+        parameters: list[Parameter | ParameterOverlay],
         folded: bool,
     ) -> None:
         self.unique_name: str = unique_name
         self.title: str = title
-        self.parameters: list[Parameter] = parameters
+        self.parameters: list[Parameter | ParameterOverlay] = parameters
         self.folded: bool = folded
+        self._validator: tuple[list, StageValidator] | None = None
+
+    @property
+    def validator(self) -> StageValidator:
+        """The validator of this stage, which is only created again if the parameters change."""
+        if self._validator is None or not (
+            len(self._validator[0]) == len(self.parameters)
+            and all(a is b for a, b in zip(self._validator[0], self.parameters))
+        ):
+            parameters = list(self.parameters)
+            self._validator = (parameters, StageValidator(self.unique_name, parameters))
+        return self._validator[1]
 
     def copy_from_response(self, response_data: dict[str, Any]):
         """Returns a new SettingsStage with updated parameter values.
         Used because of the stateless nature of the server.
+        The parameters aren't copied, but overlaid with the new values,
+        so the parameters of this stage stay unchanged.
 
         Args:
             response_data (dict[str, Any]): The response directly fed in from the frontend.
 
         Raises:
-            KeyError: If there is no 'settings' key in the response_data
+            KeyError: If a parameter is missing in the response_data.
 
         Returns:
             SettingsStage: A new SettingsStage.
         """
 
-        # Copy all parameters and set new default values
-        parameters = deepcopy(self.parameters)
+        # Overlay all parameters with the new values
+        parameters = []
         for parameter in self.parameters:
             try:
-                # Might raise another KeyError
-                parameter.optional = response_data[parameter.id]
+                value = response_data[parameter.id]
             except KeyError:  # If its from another
                 raise KeyError(f'"{parameter.id}" not in response settings data!')
+            parameters.append(parameter.overlay(value=value))
 
         return SettingsStage(self.unique_name, self.title, parameters, self.folded)
 
     def convert_to_types(self, response_data: dict[str, Any]) -> dict[str, Any]:
-        result = {}
-        for parameter in self.parameters:
-            try:
-                result[parameter.id] = parameter.convert(response_data[parameter.id])
-            except KeyError:  # If for some reason this parameter doesn't exist
-                print(
-                    f"The parameter {parameter.id} doesn't exist. This might be a development problem."
-                )
-            except ValueError:  # If for some reason the conversion doesn't work
-                print(
-                    f"The parameter {parameter.id} = {response_data[parameter.id]} couldn't be converted. This might be a development problem."
-                )
-        return result
+        """Converts the values of this stage to the types of the parameters and
+        checks their constraints.
+
+        Args:
+            response_data (dict[str, Any]): The values of this stage directly fed in from the frontend.
+
+        Raises:
+            ValidationError: If a value is missing, can't be converted or is invalid.
+
+        Returns:
+            dict[str, Any]: The converted values.
+        """
+        return self.validator(response_data)
 
     def serialize(
         self,
     ) -> dict[str, Any]:  # Returns a dictionary to be sent to the frontend
-        return {
-            "id": self.unique_name,
-            "title": self.title,
-            "parameters": [parameter.serialize() for parameter in self.parameters],
-            "folded": self.folded,
-        }
+        # Memoized until an attribute of the stage or one of its parameters is set
+        parameters = [parameter.serialize() for parameter in self.parameters]
+        if self._serialized is not None:
+            previous, serialized = self._serialized
+            if len(previous) == len(parameters) and all(
+                a is b for a, b in zip(previous, parameters)
+            ):
+                return serialized
+
+        serialized = make_fragment(
+            {
+                "id": self.unique_name,
+                "title": self.title,
+                "parameters": parameters,
+                "folded": self.folded,
+            }
+        )
+        self._serialized = (parameters, serialized)
+        return serialized
+
 
+class PlotsStage(Memoized):
+    __slots__ = ("title", "caption", "plot", "max_points", "max_grid")
 
-class PlotsStage:
     def __init__(
         self,
         title: str,
         caption: str = "",
         plot: Any | None = None,
+        max_points: int | None = None,
+        max_grid: int | None = None,
     ) -> None:
+        """Create a new plots stage.
+
+        Args:
+            title (str): The title of the plot.
+            caption (str): The caption below the plot, might contain markdown/LaTeX.
+            plot (Any | None): A Plotly figure or figure dictionary (which might contain NumPy arrays).
+                A figure converted with `fig.to_json()` works as well, but is encoded twice.
+            max_points (int | None): Line traces with more points are decimated to this many,
+                and more details are loaded when zooming in. None to send all points.
+            max_grid (int | None): Heatmap and contour grids with more cells along an axis are
+                coarsened to this many. None to send the whole grid.
+        """
         self.title: str = title
         self.caption: str = caption
         self.plot: Any | None = plot
+        self.max_points: int | None = max_points
+        self.max_grid: int | None = max_grid
 
     def copy(self):
         """Returns a new PlotsStage but as a copy.
@@ -116,11 +173,55 @@ class PlotsStage:
             self.title,
             self.caption,
             self.plot,
+            self.max_points,
+            self.max_grid,
+        )
+
+    @property
+    def decimates(self) -> bool:
+        return (self.max_points is not None or self.max_grid is not None) and not (
+            self.plot is None or isinstance(self.plot, str)
         )
 
     def serialize(self) -> dict[str, Any]:
-        return {
+        if self._serialized is not None:
+            return self._serialized
+        if self.decimates:
+            return self.serialize_range()
+
+        serialized = {
+            "title": self.title,
+            "caption": self.caption,
+            "plot": encode_figure(self.plot),
+        }
+        # Figures might be changed in place, so only stages without one are memoized
+        if self.plot is None or isinstance(self.plot, str):
+            self._serialized = make_fragment(serialized)
+            return self._serialized
+        return serialized
+
+    def freeze(self) -> None:
+        """Memoizes the serialization also with a figure, which then must not
+        be changed in place anymore, e.g. since the stage is cached."""
+        self._serialized = None
+        self._serialized = make_fragment(self.serialize())
+
+    def serialize_range(self, x_range: Any = None, y_range: Any = None) -> dict[str, Any]:
+        """Serializes the stage with the traces of the plot reduced to
+        `max_points` and `max_grid`, and only within the axis ranges if given.
+
+        Raises:
+            ValueError: If a range isn't a list of two numbers.
+        """
+        plot = self.plot
+        if hasattr(plot, "to_plotly_json"):
+            plot = plot.to_plotly_json()
+        plot, reduced = decimate_figure(plot, self.max_points, self.max_grid, x_range, y_range)
+        serialized = {
             "title": self.title,
             "caption": self.caption,
-            "plot": self.plot,
+            "plot": encode_figure(plot),
         }
+        if reduced:  # The frontend then asks for more details when zooming in
+            serialized["lod"] = True
+        return serialized
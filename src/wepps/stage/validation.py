@@ -0,0 +1,78 @@
+from typing import Any, Callable
+
+
+class ValidationError(Exception):
+    def __init__(self, errors: dict[str, dict[str, str]]) -> None:
+        """Raised if settings sent by the frontend are invalid.
+
+        Args:
+            errors (dict[str, dict[str, str]]): The error messages per settings stage and parameter id.
+        """
+        super().__init__(errors)  # Keeps the errors when pickled, e.g. from a job
+        self.errors: dict[str, dict[str, str]] = errors
+
+    def __str__(self) -> str:
+        lines = [
+            f"<b>{parameter_id}</b>: {message}"
+            for stage_errors in self.errors.values()
+            for parameter_id, message in stage_errors.items()
+        ]
+        return "Invalid settings:<br>" + "<br>".join(lines)
+
+    def serialize(self) -> dict[str, Any]:
+        return {"error": str(self), "fields": self.errors}
+
+
+class StageValidator:
+    def __init__(self, stage_id: str, parameters: list) -> None:
+        """Checks and converts all values of a settings stage in one pass.
+        The conversion and constraints of every parameter are looked up once,
+        when the validator is created.
+
+        Args:
+            stage_id (str): The unique name of the settings stage.
+            parameters (list[Parameter]): The parameters of the stage.
+        """
+        self.stage_id: str = stage_id
+        self.fields: list[tuple[str, bool, str, Callable[[Any], Any], Callable[[Any], None]]] = [
+            (p.id, p.optional, p.type.value, p.convert, p.check) for p in parameters
+        ]
+
+    def __call__(self, data: dict[str, Any]) -> dict[str, Any]:
+        """Converts the values sent for this stage.
+
+        Args:
+            data (dict[str, Any]): The values of the stage directly fed in from the frontend.
+
+        Raises:
+            ValidationError: If values are missing, can't be converted or violate a constraint.
+
+        Returns:
+            dict[str, Any]: The converted values, None for empty optional parameters.
+        """
+        result = {}
+        errors = {}
+        for parameter_id, optional, type_name, convert, check in self.fields:
+            value = data.get(parameter_id)
+            if value is None or (isinstance(value, str) and value.strip() == ""):
+                if optional:
+                    result[parameter_id] = None
+                else:
+                    errors[parameter_id] = "A value is required."
+                continue
+
+            try:
+                converted = convert(value)
+            except (TypeError, ValueError):
+                errors[parameter_id] = f'"{value}" is not a valid {type_name}.'
+                continue
+            try:
+                check(converted)
+            except ValueError as e:
+                errors[parameter_id] = str(e)
+                continue
+            result[parameter_id] = converted
+
+        if errors:
+            raise ValidationError({self.stage_id: errors})
+        return result
@@ -1,3 +1,17 @@
+import atexit
+import inspect
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    CancelledError,
+    ProcessPoolExecutor,
+    wait,
+)
+from functools import partial, wraps
+from multiprocessing import shared_memory
+
 import numpy as np
 import plotly.colors as c
 import plotly.graph_objects as go
@@ -5,15 +19,168 @@ import plotly.graph_objects as go
 from blockops import BlockProblem
 
 
-def fine_discretization_error(N, tEnd, M, scheme, points, quadType, form,
-                              reLambdaLow, reLambdaHigh, imLambdaLow,
-                              imLambdaHigh, nVals, eMin, eMax):
+# Number of lambda values evaluated at once, which bounds the memory of the solutions
+ERROR_CHUNK_SIZE = 4096
 
-    reLam = np.linspace(reLambdaLow, reLambdaHigh, nVals)
-    imLam = np.linspace(imLambdaLow, imLambdaHigh, nVals)
+# The process pool shared by all calls of evaluate_lambda_grid, started on
+# first use, so a pool is never inherited by forked processes (e.g. of the server)
+_grid_pool = None
+_grid_pool_lock = threading.Lock()
 
-    lam = reLam[:, None] + 1j * imLam[None, :]
-    prob = BlockProblem(lam.ravel(),
+
+def _get_grid_pool():
+    global _grid_pool
+    with _grid_pool_lock:
+        if _grid_pool is None:
+            _grid_pool = ProcessPoolExecutor(os.cpu_count() or 1)
+        return _grid_pool
+
+
+def _shutdown_grid_pool():
+    global _grid_pool
+    with _grid_pool_lock:
+        if _grid_pool is not None:
+            _grid_pool.shutdown(cancel_futures=True)
+            _grid_pool = None
+
+
+def _forget_grid_pool():
+    # The worker processes of the parent aren't usable in a forked child,
+    # which starts its own pool when needed
+    global _grid_pool, _grid_pool_lock
+    _grid_pool = None
+    _grid_pool_lock = threading.Lock()
+
+
+atexit.register(_shutdown_grid_pool)
+os.register_at_fork(after_in_child=_forget_grid_pool)
+
+
+def _lru_cache_ignoring(*ignored, maxsize=16):
+    """Caches the results of a function like `functools.lru_cache`, but
+    without the `ignored` arguments in the key, which only change how the
+    results are computed (e.g. the number of workers), not the results."""
+    def decorator(function):
+        signature = inspect.signature(function)
+        cache = OrderedDict()
+        lock = threading.Lock()
+
+        @wraps(function)
+        def cached(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            key = tuple((name, value) for name, value in bound.arguments.items()
+                        if name not in ignored)
+            with lock:
+                if key in cache:
+                    cache.move_to_end(key)
+                    return cache[key]
+            result = function(*args, **kwargs)
+            with lock:
+                cache[key] = result
+                if len(cache) > maxsize:
+                    cache.popitem(last=False)
+            return result
+
+        cached.cache_clear = cache.clear
+        return cached
+    return decorator
+
+
+def _evaluate_tile(function, lam, start, memoryName, size, dtype):
+    # Runs in a worker process and writes directly into the shared result
+    memory = shared_memory.SharedMemory(name=memoryName)
+    try:
+        result = np.ndarray(size, dtype, buffer=memory.buf)
+        result[start:start + lam.size] = function(lam)
+        del result
+    finally:
+        memory.close()
+    return lam.size
+
+
+def evaluate_lambda_grid(function, lam, chunkSize=ERROR_CHUNK_SIZE,
+                         workers=None, dtype=np.float64, progress=None,
+                         cancel=None):
+    """Evaluates a function for every value of a lambda grid, split into
+    tiles of `chunkSize` values which are evaluated in parallel by a pool of
+    processes. The pool is shared by all calls, each of which evaluates at most
+    `workers` tiles at the same time. The workers write their results into shared memory, so only the
+    lambda values of the tiles are sent to them.
+
+    Args:
+        function (Callable[[np.ndarray], np.ndarray]): Maps a flat array of lambda values
+            to one result each. Must be picklable, i.e. a module level function or a
+            `functools.partial` of one.
+        lam (np.ndarray): The lambda values, of any shape.
+        chunkSize (int): The number of values per tile, which bounds the memory per worker.
+        workers (int | None): The number of tiles evaluated at the same time, None for
+            the number of CPUs and 1 to evaluate in this process.
+        dtype (np.dtype): The data type of the results.
+        progress (Callable[[int, int], None] | None): Called with the number of evaluated
+            and of all values after each tile.
+        cancel (threading.Event | None): Stops the evaluation once set, e.g. by another thread.
+
+    Raises:
+        CancelledError: If the evaluation was cancelled.
+
+    Returns:
+        np.ndarray: The results with the shape of `lam`.
+    """
+    lam = np.asarray(lam)
+    flat = lam.ravel()
+    starts = range(0, flat.size, chunkSize)
+    workers = workers or os.cpu_count() or 1
+
+    if workers == 1 or len(starts) <= 1:
+        result = np.empty(flat.size, dtype)
+        for start in starts:
+            if cancel is not None and cancel.is_set():
+                raise CancelledError()
+            tile = flat[start:start + chunkSize]
+            result[start:start + tile.size] = function(tile)
+            if progress is not None:
+                progress(start + tile.size, flat.size)
+        return result.reshape(lam.shape)
+
+    itemsize = np.dtype(dtype).itemsize
+    memory = shared_memory.SharedMemory(create=True, size=max(flat.size * itemsize, 1))
+    pool = _get_grid_pool()
+    waiting = iter(starts)
+    pending = set()
+    try:
+        done = 0
+        while True:
+            # Submits further tiles, so at most `workers` are evaluated at once
+            while len(pending) < workers:
+                start = next(waiting, None)
+                if start is None:
+                    break
+                pending.add(pool.submit(_evaluate_tile, function, flat[start:start + chunkSize],
+                                        start, memory.name, flat.size, dtype))
+            if not pending:
+                break
+            finished, pending = wait(pending, timeout=0.1, return_when=FIRST_COMPLETED)
+            for future in finished:
+                done += future.result()
+            if finished and progress is not None:
+                progress(done, flat.size)
+            if cancel is not None and cancel.is_set():
+                raise CancelledError()
+        result = np.ndarray(flat.size, dtype, buffer=memory.buf).copy()
+    finally:
+        # Running tiles still write into the memory, so wait for them before removing it
+        for future in pending:
+            future.cancel()
+        wait(pending)
+        memory.close()
+        memory.unlink()
+    return result.reshape(lam.shape)
+
+
+def fine_error(lam, N, tEnd, M, scheme, points, quadType):
+    """Returns the maximal error of the fine solution for each lambda value."""
+    prob = BlockProblem(lam,
                         tEnd=tEnd,
                         nBlocks=N,
                         nPoints=M,
@@ -21,17 +188,150 @@ def fine_discretization_error(N, tEnd, M, scheme, points, quadType, form,
                         points=points,
                         quadType=quadType,
                         collUpdate=False)
-
     uExact = prob.getSolution('exact')
     uNum = prob.getSolution('fine')
-    err = np.abs(uExact - uNum)
-    err = np.max(err, axis=(0, -1)).reshape(lam.shape)
+    return np.max(np.abs(uNum - uExact), axis=(0, -1))
 
-    err = err.transpose()
-    log_err = np.log(err)
 
-    err[err < 10**eMin] = 10**eMin
-    err[err > 10**eMax] = 10**eMax
+@_lru_cache_ignoring('workers')
+def discretization_error_grid(N, tEnd, M, scheme, points, quadType,
+                              reLambdaLow, reLambdaHigh, imLambdaLow,
+                              imLambdaHigh, nVals, chunkSize=ERROR_CHUNK_SIZE,
+                              workers=1):
+    """Computes the maximal error of the fine solution on a grid of lambda
+    values, with `workers` processes (None for all CPUs), see
+    `evaluate_lambda_grid`. The results are cached independently of `workers`,
+    so changing only the presentation (e.g. the color range) or the number of
+    workers doesn't compute them again.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray, np.ndarray]: The real and imaginary parts of
+            lambda and the read-only error grid with shape (nVals, nVals), where
+            rows correspond to the imaginary parts.
+    """
+    reLam = np.linspace(reLambdaLow, reLambdaHigh, nVals)
+    imLam = np.linspace(imLambdaLow, imLambdaHigh, nVals)
+    lam = reLam[:, None] + 1j * imLam[None, :]
+
+    error = partial(fine_error, N=N, tEnd=tEnd, M=M, scheme=scheme,
+                    points=points, quadType=quadType)
+    err = evaluate_lambda_grid(error, lam, chunkSize, workers).transpose()
+    for array in (reLam, imLam, err):
+        array.flags.writeable = False  # Shared by all calls with the same arguments
+    return reLam, imLam, err
+
+
+def refine_cells(logErr, a0, a1, b0, b1, eMin, eMax, tolerance):
+    """Returns which cells of the grid have to be refined, because the
+    log10 error changes by more than `tolerance` or crosses eMin or eMax
+    between their corners."""
+    corners = np.stack([logErr[a0, b0], logErr[a0, b1],
+                        logErr[a1, b0], logErr[a1, b1]])
+    low, high = corners.min(axis=0), corners.max(axis=0)
+    steep = high - low > tolerance
+    crossing = ((low < eMin) & (high >= eMin)) | ((low < eMax) & (high >= eMax))
+    divisible = (a1 - a0 > 1) | (b1 - b0 > 1)
+    return (steep | crossing) & divisible
+
+
+def split_cells(a0, a1, b0, b1):
+    """Splits cells into four at their midpoints. Along an axis where a cell
+    has a width of one, it is only split into two."""
+    ma, mb = (a0 + a1) // 2, (b0 + b1) // 2
+    a0, a1 = np.concatenate([a0, a0, ma, ma]), np.concatenate([ma, ma, a1, a1])
+    b0, b1 = np.concatenate([b0, mb, b0, mb]), np.concatenate([mb, b1, mb, b1])
+    valid = (a1 > a0) & (b1 > b0)
+    return a0[valid], a1[valid], b0[valid], b1[valid]
+
+
+def interpolate_cells(logErr, a0, a1, b0, b1):
+    """Fills the unknown points of cells bilinearly from their corners, with
+    the cells grouped by size to interpolate each group at once."""
+    sizes = np.stack([a1 - a0, b1 - b0], axis=1)
+    for da, db in np.unique(sizes, axis=0):
+        if da <= 1 and db <= 1:
+            continue  # No points within the cell
+        group = (sizes[:, 0] == da) & (sizes[:, 1] == db)
+        ga, gb = a0[group], b0[group]
+        s = np.arange(da + 1) / da
+        t = np.arange(db + 1) / db
+        rows = ga[:, None, None] + np.arange(da + 1)[None, :, None]
+        cols = gb[:, None, None] + np.arange(db + 1)[None, None, :]
+        c00 = logErr[ga, gb][:, None, None]
+        c01 = logErr[ga, gb + db][:, None, None]
+        c10 = logErr[ga + da, gb][:, None, None]
+        c11 = logErr[ga + da, gb + db][:, None, None]
+        s, t = s[None, :, None], t[None, None, :]
+        values = logErr[rows, cols]
+        # Points on the edges may have been evaluated for a refined neighbor
+        logErr[rows, cols] = np.where(
+            np.isnan(values),
+            (1 - s) * (1 - t) * c00 + (1 - s) * t * c01 + s * (1 - t) * c10 + s * t * c11,
+            values)
+
+
+@_lru_cache_ignoring('workers')
+def adaptive_error_grid(N, tEnd, M, scheme, points, quadType, reLambdaLow,
+                        reLambdaHigh, imLambdaLow, imLambdaHigh, nVals, eMin,
+                        eMax, coarse=17, tolerance=0.5, workers=1):
+    """Computes the maximal error of the fine solution on the same grid as
+    `discretization_error_grid`, but evaluates it only on a coarse grid and
+    then recursively halves the cells where the log10 error changes by more
+    than `tolerance` or crosses 10**eMin or 10**eMax. The remaining points are
+    interpolated from the corners of their cells, so flat regions of the map
+    need few evaluations, while the stability boundary is still resolved.
+
+    Features smaller than the coarse cells may be missed, so `coarse`
+    must resolve the shape of the error map.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray, np.ndarray, int]: The real and imaginary parts of
+            lambda, the read-only (partly interpolated) error grid like
+            `discretization_error_grid` and the number of evaluated lambda values.
+    """
+    reLam = np.linspace(reLambdaLow, reLambdaHigh, nVals)
+    imLam = np.linspace(imLambdaLow, imLambdaHigh, nVals)
+    error = partial(fine_error, N=N, tEnd=tEnd, M=M, scheme=scheme,
+                    points=points, quadType=quadType)
+    logErr = np.full((nVals, nVals), np.nan)
+    tiny = np.finfo(float).tiny
+
+    def evaluate(a, b):
+        # Evaluates the points which aren't known yet
+        index = np.unique(np.ravel_multi_index((a.ravel(), b.ravel()), logErr.shape))
+        index = index[np.isnan(logErr.flat[index])]
+        a, b = np.unravel_index(index, logErr.shape)
+        err = evaluate_lambda_grid(error, reLam[a] + 1j * imLam[b], workers=workers)
+        logErr[a, b] = np.log10(np.maximum(err, tiny))
+        return index.size
+
+    axis = np.unique(np.linspace(0, nVals - 1, min(coarse, nVals)).round().astype(int))
+    evaluated = evaluate(*np.meshgrid(axis, axis, indexing='ij'))
+    a0, b0 = (v.ravel() for v in np.meshgrid(axis[:-1], axis[:-1], indexing='ij'))
+    a1, b1 = (v.ravel() for v in np.meshgrid(axis[1:], axis[1:], indexing='ij'))
+
+    leaves = []
+    while a0.size:
+        refine = refine_cells(logErr, a0, a1, b0, b1, eMin, eMax, tolerance)
+        leaves.append((a0[~refine], a1[~refine], b0[~refine], b1[~refine]))
+        a0, a1, b0, b1 = a0[refine], a1[refine], b0[refine], b1[refine]
+        a0, a1, b0, b1 = split_cells(a0, a1, b0, b1)
+        corners = np.concatenate([a0, a0, a1, a1]), np.concatenate([b0, b1, b0, b1])
+        evaluated += evaluate(*corners)
+
+    for a0, a1, b0, b1 in leaves:
+        interpolate_cells(logErr, a0, a1, b0, b1)
+    err = (10.0 ** logErr).transpose()
+    for array in (reLam, imLam, err):
+        array.flags.writeable = False  # Shared by all calls with the same arguments
+    return reLam, imLam, err, evaluated
+
+
+def error_map_figure(reLam, imLam, err, eMin, eMax):
+    """Plots an error grid as contour with a logarithmic color scale, whose
+    ticks range from 10**eMin to 10**eMax."""
+    log_err = np.log(err)
+    err = np.clip(err, 10.0**eMin, 10.0**eMax)
     ticks = [10**(i) for i in range(eMin, eMax + 1)]
 
     color_names = [
@@ -42,18 +342,46 @@ def fine_discretization_error(N, tEnd, M, scheme, points, quadType, form,
         np.max(log_err) + .5, len(color_names))
 
     fig = go.Figure(data=go.Contour(z=log_err,
-                                    x=reLam.ravel(),
-                                    y=imLam.ravel(),
+                                    x=reLam,
+                                    y=imLam,
                                     colorscale=c.sequential.Sunset,
                                     colorbar=dict(tickvals=color_vals,
                                                   ticktext=color_names),
                                     hovertext=err,
                                     hoverinfo='x+y+text'))
     fig.update_layout(margin=dict(l=0, r=0, b=0, t=0))
-    return fig.to_json()
+    return fig
 
 
-def compute_plot():
+def fine_discretization_error_figure(N, tEnd, M, scheme, points, quadType,
+                                     form, reLambdaLow, reLambdaHigh,
+                                     imLambdaLow, imLambdaHigh, nVals, eMin,
+                                     eMax, workers=1, adaptive=False):
+    """Same as `fine_discretization_error`, but returns the figure itself,
+    which a PlotsStage encodes without converting it to JSON twice."""
+    if adaptive:
+        # Refines the grid only where the error map changes, see adaptive_error_grid
+        reLam, imLam, err, _ = adaptive_error_grid(
+            N, tEnd, M, scheme, points, quadType, reLambdaLow, reLambdaHigh,
+            imLambdaLow, imLambdaHigh, nVals, eMin, eMax, workers=workers)
+    else:
+        reLam, imLam, err = discretization_error_grid(
+            N, tEnd, M, scheme, points, quadType, reLambdaLow, reLambdaHigh,
+            imLambdaLow, imLambdaHigh, nVals, workers=workers)
+    return error_map_figure(reLam, imLam, err, eMin, eMax)
+
+
+def fine_discretization_error(N, tEnd, M, scheme, points, quadType, form,
+                              reLambdaLow, reLambdaHigh, imLambdaLow,
+                              imLambdaHigh, nVals, eMin, eMax, workers=1,
+                              adaptive=False):
+    return fine_discretization_error_figure(
+        N, tEnd, M, scheme, points, quadType, form, reLambdaLow, reLambdaHigh,
+        imLambdaLow, imLambdaHigh, nVals, eMin, eMax, workers=workers,
+        adaptive=adaptive).to_json()
+
+
+def compute_plot_figure():
     fig = go.Figure(data=go.Contour(
         z=[[10, 10.625, 12.5, 15.625, 20], [5.625, 6.25, 8.125, 11.25, 15.625],
            [2.5, 3.125, 5., 8.125, 12.5], [0.625, 1.25, 3.125, 6.25, 10.625],
@@ -61,4 +389,8 @@ def compute_plot():
         colorscale='Electric',
     ))
     fig.update_layout(margin=dict(l=0, r=0, b=0, t=0))
-    return fig.to_json()
+    return fig
+
+
+def compute_plot():
+    return compute_plot_figure().to_json()
@@ -0,0 +1,95 @@
+import numpy as np
+import pytest
+
+from wepps.stage.arrays import format_array, parse_array
+from wepps.stage.parameters import Array
+
+
+@pytest.mark.parametrize(
+    "array",
+    [
+        np.array([0, 0, 0, 1]),
+        np.arange(10),
+        np.array([0.1, 0.2, 0.7]),
+        np.linspace(0, 1, 11),
+        np.linspace(-2.5, 3, 1000),
+        np.array([1e-300, 2.5e10, -0.0]),
+        np.linspace(0, 1, 5, dtype=np.float32),
+        np.array([], dtype=np.float64),
+    ],
+)
+def test_flat_arrays_round_trip(array):
+    parsed = parse_array(format_array(array))
+    assert np.array_equal(parsed.astype(array.dtype), array)
+
+
+def test_integer_arrays_are_written_as_values():
+    assert format_array(np.array([0, 0, 0, 1])) == "0, 0, 0, 1"
+    assert format_array(np.arange(4)) == "0, 1, 2, 3"
+    assert format_array(np.linspace(0, 3, 4)) == "linspace(0.0, 3.0, 4)"
+
+
+def test_linspace_is_only_used_if_exact():
+    values = np.linspace(0, 1, 7)
+    values[3] += 1e-12
+    assert "linspace" not in format_array(values)
+
+
+def test_multi_dimensional_arrays_are_written_by_row():
+    array = np.arange(6).reshape(3, 2)
+    assert format_array(array) == "0, 1; 2, 3; 4, 5"
+    parameter = Array("a", "a", "", "", False, dtype="int64", shape=(None, 2))
+    assert np.array_equal(parameter.convert(format_array(array)), array)
+
+
+def test_parameters_accept_their_default():
+    for dtype, shape, value in [
+        ("int64", None, np.array([0, 0, 0, 1])),
+        ("float64", (None, 2), np.linspace(0, 1, 8).reshape(4, 2)),
+        ("float64", None, np.linspace(0, 1, 8)),
+    ]:
+        parameter = Array("a", "a", "", "", False, value, dtype=dtype, shape=shape)
+        text = parameter.serialize()["value"]
+        converted = parameter.convert(text)
+        parameter.check(converted)
+        assert np.array_equal(converted, value)
+
+
+def test_rows_of_evenly_spaced_values_round_trip():
+    array = np.linspace(0, 7, 8).reshape(2, 4)
+    assert format_array(array) == "linspace(0.0, 3.0, 4); linspace(4.0, 7.0, 4)"
+    parameter = Array("a", "a", "", "", False, shape=(None, 4))
+    assert np.array_equal(parameter.convert(format_array(array)), array)
+
+
+@pytest.mark.parametrize(
+    "text, values",
+    [
+        ("linspace(0, 1, 3), linspace(2, 3, 2)", [0, 0.5, 1, 2, 3]),
+        ("linspace(0, 1, 3)linspace(2, 3, 2)", [0, 0.5, 1, 2, 3]),
+        ("linspace(0,1,3),", [0, 0.5, 1]),
+        (",", []),
+        (" ; ", []),
+        ("1, 2,", [1, 2]),
+    ],
+)
+def test_separators_alone_add_no_values(text, values):
+    assert np.array_equal(parse_array(text), values)
+
+
+def test_parse_linspace_within_values():
+    array = parse_array("0, linspace(1, 2, 3); 5")
+    assert np.array_equal(array, [0, 1, 1.5, 2, 5])
+
+
+@pytest.mark.parametrize(
+    "text", ["1, a", "linspace(1, 2)", "linspace(0, 1, -1)", "linspace(0, 1, 100)", "1 2 3 4 5 6"]
+)
+def test_invalid_text_is_rejected(text):
+    with pytest.raises(ValueError):
+        parse_array(text, max_size=5)
+
+
+def test_integer_parameters_reject_fractions():
+    with pytest.raises(ValueError):
+        Array("a", "a", "", "", False, dtype="int64").convert("linspace(0, 1, 4)")
@@ -0,0 +1,162 @@
+import os
+import textwrap
+import threading
+import time
+from contextlib import contextmanager
+
+import pytest
+
+from wepps.app import App, ResponseStages
+from wepps.batch import BatchRunner, expand_sweep
+from wepps.concurrency import AppRunner, ConcurrencyLimitError
+from wepps.site import Site
+from wepps.stage.stages import DocsStage
+
+APP = """
+import os
+
+from wepps.app import App, ResponseStages
+import wepps.stage.stages as stages
+from wepps.stage.parameters import Integer
+
+s1 = stages.SettingsStage("S1", "Settings", [Integer("x", "x", "", "", False)], False)
+
+
+class Square(App):
+    def __init__(self) -> None:
+        super().__init__(title="Square")
+        self.settings = [s1]
+
+    def compute(self, response_data):
+        x = s1.convert_to_types(response_data["S1"])["x"]
+        r = ResponseStages()
+        r.add_docs_stage(stages.DocsStage(str(os.getpid()), str(x**2)))
+        return r
+"""
+
+
+class SquareApp(App):
+    def __init__(self) -> None:
+        super().__init__(title="Square")
+
+    def compute(self, response_data):
+        if response_data["S1"]["x"] < 0:
+            raise ValueError("negative")
+        r = ResponseStages()
+        r.add_docs_stage(DocsStage("Square", str(response_data["S1"]["x"] ** 2)))
+        return r
+
+
+def test_sweep_is_the_cartesian_product():
+    requests = expand_sweep(
+        {"S1": {"i": 0, "b": True}, "S2": {"y": 1}},
+        {"S1": {"i": [1, 2], "phi": ["a", "b", "c"]}},
+    )
+    assert len(requests) == 6
+    assert requests[0] == {"S1": {"i": 1, "b": True, "phi": "a"}, "S2": {"y": 1}}
+    assert [r["S1"]["phi"] for r in requests[:3]] == ["a", "b", "c"]  # Last changes fastest
+    assert requests[-1]["S1"]["i"] == 2
+
+
+def test_sweep_copies_the_base():
+    base = {"S1": {"i": 0}}
+    requests = expand_sweep(base, {"S1": {"i": [1, 2]}, "S2": {"x": [3]}})
+    assert base == {"S1": {"i": 0}}
+    assert requests[0] is not requests[1]
+    assert requests[1] == {"S1": {"i": 2}, "S2": {"x": 3}}
+
+
+def test_sweep_without_base_or_values():
+    assert expand_sweep(None, {"S1": {"i": [1]}}) == [{"S1": {"i": 1}}]
+    assert expand_sweep(None, {"S1": {"i": []}}) == []
+
+
+@pytest.mark.parametrize("sweep", [{"S1": [1, 2]}, {"S1": {"i": 1}}])
+def test_invalid_sweeps(sweep):
+    with pytest.raises(ValueError):
+        expand_sweep(None, sweep)
+
+
+def test_runner_yields_all_results():
+    runner = BatchRunner({"square": SquareApp()}, workers=2, executor="thread")
+    try:
+        requests = [(i, {"S1": {"x": x}}) for i, x in enumerate([1, 2, -1, 3])]
+        results = dict(runner.run("square", requests))
+    finally:
+        runner.shutdown()
+    assert sorted(results) == [0, 1, 2, 3]
+    assert results[1].result()["docs"][0]["text"] == "4"
+    with pytest.raises(ValueError):
+        results[2].result()
+
+
+def test_unknown_executor():
+    with pytest.raises(ValueError):
+        BatchRunner({}, executor="fork")
+
+
+def test_process_batches_of_lazy_apps(tmp_path, monkeypatch):
+    package = tmp_path / "batch_test_apps"
+    (package / "demo").mkdir(parents=True)
+    (package / "__init__.py").write_text("")
+    (package / "demo" / "__init__.py").write_text("")
+    (package / "demo" / "square.py").write_text(textwrap.dedent(APP))
+    # Neither imported by the site nor by the workers
+    (package / "demo" / "helpers.py").write_text("raise ImportError('not an app')\n")
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.syspath_prepend(str(tmp_path))
+
+    site = Site("batch_test_apps", lazy_apps=True, batch_workers=2, batch_executor="process")
+    try:
+        client = site.flask_app.test_client()
+        for _ in range(2):  # The pool still works for the next batch
+            response = client.post(
+                "/demo/square/batch", json={"sweep": {"S1": {"x": ["1", "2", "3"]}}}
+            )
+            results = response.get_json()["results"]
+            assert [result["docs"][0]["text"] for result in results] == ["1", "4", "9"]
+            assert all(result["docs"][0]["title"] != str(os.getpid()) for result in results)
+    finally:
+        site.batch_runner.shutdown()
+    assert list(site.apps.instances) == ["demo.square"]
+
+
+def test_process_batches_hold_the_limit_of_the_app():
+    running, peak = [], []
+    lock = threading.Lock()
+
+    @contextmanager
+    def limit(app_name):
+        with lock:
+            running.append(app_name)
+            peak.append(len(running))
+        try:
+            time.sleep(0.01)
+            yield
+        finally:
+            with lock:
+                running.remove(app_name)
+
+    runner = BatchRunner({"square": SquareApp()}, workers=3, executor="process", limit=limit)
+    try:
+        requests = [(i, {"S1": {"x": i}}) for i in range(6)]
+        results = dict(runner.run("square", requests))
+    finally:
+        runner.shutdown()
+    assert [results[i].result()["docs"][0]["text"] for i in range(6)] == ["0", "1", "4", "9", "16", "25"]
+    assert len(peak) == 6 and max(peak) > 1  # Entered around every request, in parallel
+
+
+def test_busy_apps_fail_the_requests_of_process_batches():
+    app = SquareApp()
+    app.max_concurrent, app.queue_timeout = 1, 0.01
+    runner = AppRunner("square", app)
+    batch = BatchRunner({"square": app}, workers=2, executor="process", limit=lambda name: runner.acquire())
+    try:
+        with runner.acquire():
+            results = dict(batch.run("square", [(0, {"S1": {"x": 2}})]))
+        with pytest.raises(ConcurrencyLimitError):
+            results[0].result()
+        assert dict(batch.run("square", [(0, {"S1": {"x": 2}})]))[0].result()["docs"][0]["text"] == "4"
+    finally:
+        batch.shutdown()
@@ -0,0 +1,90 @@
+import os
+
+from wepps.app import App
+from wepps.cache import DiskResultCache, ResultCache, make_cache_key
+from wepps.stage.parameters import Float, Integer
+from wepps.stage.stages import SettingsStage
+
+
+class CachedApp(App):
+    def __init__(self) -> None:
+        super().__init__(title="Cached", cacheable=True, cache_ignored_stages=["S2"])
+        self.settings = [
+            SettingsStage(
+                "S1",
+                "Settings",
+                [Float("x", "x", "", "", False), Integer("n", "n", "", "", False)],
+                False,
+            )
+        ]
+
+
+def test_cache_key_normalizes_values():
+    app = CachedApp()
+    key = make_cache_key(app, {"S1": {"x": "3", "n": "2"}})
+    assert make_cache_key(app, {"S1": {"x": "3.0", "n": 2}}) == key
+    assert make_cache_key(app, {"S1": {"x": "3.5", "n": 2}}) != key
+
+
+def test_cache_key_skips_ignored_stages():
+    app = CachedApp()
+    key = make_cache_key(app, {"S1": {"x": "1", "n": "1"}})
+    assert make_cache_key(app, {"S1": {"x": "1", "n": "1"}, "S2": {"a": "b"}}) == key
+
+
+def test_cache_key_keeps_invalid_stages():
+    app = CachedApp()
+    assert make_cache_key(app, {"S1": {"x": "a"}}) != make_cache_key(app, {"S1": {"x": "b"}})
+
+
+def test_result_cache_evicts_least_recently_used():
+    cache = ResultCache(max_size=2)
+    cache.set("a", {"v": 1})
+    cache.set("b", {"v": 2})
+    assert cache.get("a") == {"v": 1}  # Now b is the least recently used
+    cache.set("c", {"v": 3})
+    assert cache.get("b") is None
+    assert cache.get("a") == {"v": 1}
+    assert cache.get("c") == {"v": 3}
+    assert cache.stats()["hits"] == 3
+    assert cache.stats()["misses"] == 1
+
+
+def test_result_cache_expires(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("wepps.cache.time.time", lambda: now[0])
+    cache = ResultCache(ttl=10)
+    cache.set("a", {"v": 1})
+    now[0] += 5
+    assert cache.get("a") == {"v": 1}
+    now[0] += 10
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_disk_cache_survives_instances(tmp_path):
+    DiskResultCache(str(tmp_path)).set("a", {"v": [1, 2]})
+    assert DiskResultCache(str(tmp_path)).get("a") == {"v": [1, 2]}
+    assert not [f for f in os.listdir(tmp_path) if f.endswith(".tmp")]
+
+
+def test_disk_cache_evicts_oldest_files(tmp_path):
+    cache = DiskResultCache(str(tmp_path), max_size=2)
+    for i, key in enumerate("ab"):
+        cache.set(key, {"v": i})
+        os.utime(cache.path(key), (i, i))
+    cache.set("c", {"v": 2})
+    assert len(cache) == 2
+    assert cache.get("a") is None
+    assert cache.get("b") == {"v": 1}
+
+
+def test_disk_cache_expires(tmp_path):
+    cache = DiskResultCache(str(tmp_path), ttl=10)
+    cache.set("a", {"v": 1})
+    os.utime(cache.path("a"), (0, 0))
+    assert cache.get("a") is None
+    assert not os.path.exists(cache.path("a"))
+    cache.set("b", {"v": 1})
+    cache.clear()
+    assert len(cache) == 0
@@ -0,0 +1,131 @@
+import asyncio
+import os
+import threading
+
+import pytest
+
+from wepps.app import App, ResponseStages
+from wepps.concurrency import AppRunner, ConcurrencyLimitError
+from wepps.stage.stages import DocsStage
+
+
+class PidApp(App):
+    def __init__(self, concurrency="shared", max_concurrent=None, queue_timeout=10) -> None:
+        super().__init__(
+            title="Pid",
+            concurrency=concurrency,
+            max_concurrent=max_concurrent,
+            queue_timeout=queue_timeout,
+        )
+
+    def compute(self, response_data):
+        r = ResponseStages()
+        r.add_docs_stage(DocsStage("Pid", str(os.getpid())))
+        return r
+
+
+class PidBatchApp(PidApp):
+    def compute_batch(self, requests):
+        return [self.compute(request) for request in requests]
+
+
+def test_unknown_mode():
+    with pytest.raises(ValueError):
+        AppRunner("pid", PidApp("forked"))
+
+
+def test_busy_after_queue_timeout():
+    runner = AppRunner("pid", PidApp(max_concurrent=1, queue_timeout=0.01))
+    with runner.acquire():
+        with pytest.raises(ConcurrencyLimitError):
+            with runner.acquire():
+                pass
+    with runner.acquire() as app:  # The slot is free again
+        assert app is runner.app
+
+
+def test_locked_apps_compute_one_request_at_a_time():
+    runner = AppRunner("pid", PidApp("locked", queue_timeout=0.01))
+    with runner.acquire():
+        with pytest.raises(ConcurrencyLimitError):
+            with runner.acquire():
+                pass
+
+
+def test_thread_mode_creates_an_instance_per_thread():
+    runner = AppRunner("pid", PidApp("thread"))
+    with runner.acquire() as first:
+        pass
+    with runner.acquire() as again:
+        assert again is first
+    instances = []
+    thread = threading.Thread(target=lambda: instances.append(runner.instance()))
+    thread.start()
+    thread.join()
+    assert instances[0] is not first
+    assert instances[0].datasets is runner.app.datasets
+
+
+def test_async_acquire_is_limited():
+    runner = AppRunner("pid", PidApp(max_concurrent=1, queue_timeout=0.05))
+
+    async def main():
+        async with runner.acquire_async() as app:
+            assert app is runner.app
+            with pytest.raises(ConcurrencyLimitError):
+                async with runner.acquire_async():
+                    pass
+        async with runner.acquire_async():
+            pass
+
+    asyncio.run(main())
+
+
+def test_process_mode_computes_in_workers():
+    runner = AppRunner("pid", PidApp("process", max_concurrent=1))
+    try:
+        payload = runner.compute(None)
+    finally:
+        runner.shutdown()
+    assert payload["docs"][0]["text"] != str(os.getpid())
+
+
+def test_shared_mode_computes_in_this_process():
+    payload = AppRunner("pid", PidApp()).compute(None)
+    assert payload["docs"][0]["text"] == str(os.getpid())
+
+
+def test_process_mode_returns_the_stages_of_workers():
+    runner = AppRunner("pid", PidApp("process", max_concurrent=1))
+    try:
+        stages = runner.compute_stages(None)
+    finally:
+        runner.shutdown()
+    assert isinstance(stages, ResponseStages)
+    assert stages.docs[0].text != str(os.getpid())
+
+
+def test_compute_stages_is_limited():
+    runner = AppRunner("pid", PidApp(max_concurrent=1, queue_timeout=0.01))
+    with runner.acquire():
+        with pytest.raises(ConcurrencyLimitError):
+            runner.compute_stages(None)
+    assert runner.compute_stages(None).docs[0].text == str(os.getpid())
+
+
+def test_process_apps_compute_batches_in_workers():
+    runner = AppRunner("pid", PidBatchApp("process", max_concurrent=1))
+    try:
+        results = runner.compute_batch([None, None])
+    finally:
+        runner.shutdown()
+    assert len(results) == 2
+    assert all(stages.docs[0].text != str(os.getpid()) for stages in results)
+
+
+def test_batches_are_limited():
+    runner = AppRunner("pid", PidBatchApp(max_concurrent=1, queue_timeout=0.01))
+    with runner.acquire():
+        with pytest.raises(ConcurrencyLimitError):
+            runner.compute_batch([None])
+    assert runner.compute_batch([None])[0].docs[0].text == str(os.getpid())
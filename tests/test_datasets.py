@@ -0,0 +1,86 @@
+import os
+import signal
+import socket
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pytest
+
+from wepps.app import App
+from wepps.datasets import Dataset, DatasetRegistry
+from wepps.jobs import _init_worker, _worker_app
+from wepps.serving import serve_with_werkzeug
+
+
+def table():
+    return np.arange(12.0).reshape(3, 4)
+
+
+def segment_exists(name):
+    return os.path.exists(f"/dev/shm/{name.lstrip('/')}")
+
+
+class TableApp(App):
+    def __init__(self) -> None:
+        super().__init__(title="Table")
+        self.datasets = [Dataset("table", loader=table)]
+
+
+def load_in_worker():
+    app = _worker_app("table")
+    return float(app.dataset("table").sum()), app.datasets[0]._layout[0]
+
+
+def test_registered_datasets_are_shared():
+    registry = DatasetRegistry()
+    first = registry.add(Dataset("table", loader=table))
+    assert registry.add(Dataset("table", loader=table)) is first
+    with pytest.raises(ValueError):
+        registry.add(Dataset("table", path="table.npy"))
+    array = first.array
+    assert not array.flags.writeable
+    name = first._layout[0]
+    assert segment_exists(name)
+    registry.close()
+    assert not segment_exists(name)
+
+
+def test_datasets_are_sent_to_workers_in_shared_memory():
+    dataset = Dataset("table", loader=table)
+    try:
+        with ProcessPoolExecutor(1) as pool:
+            assert pool.submit(np.sum, dataset.array).result() == 66
+            # Attaches to the memory created here instead of loading again
+            assert pool.submit(getattr, dataset, "_layout").result() == dataset._layout
+    finally:
+        dataset.close()
+
+
+def test_workers_remove_the_memory_they_created():
+    pool = ProcessPoolExecutor(1, initializer=_init_worker, initargs=(None, {"table": TableApp()}))
+    try:
+        total, name = pool.submit(load_in_worker).result()
+        assert total == 66 and segment_exists(name)
+    finally:
+        pool.shutdown()
+    assert not segment_exists(name)
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="Needs os.fork")
+def test_forked_server_workers_clean_up(tmp_path):
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+
+    pid = os.fork()
+    if pid == 0:  # The parent of the server workers
+        try:
+            on_exit = lambda: (tmp_path / str(os.getpid())).touch()  # noqa: E731
+            serve_with_werkzeug(lambda e, r: [], "127.0.0.1", port, 2, 1, on_exit)
+        finally:
+            os._exit(0)
+    time.sleep(1)
+    os.kill(pid, signal.SIGTERM)
+    os.waitpid(pid, 0)
+    assert len(list(tmp_path.iterdir())) == 2
@@ -0,0 +1,99 @@
+import numpy as np
+import pytest
+
+from wepps.stage.decimation import (
+    coarsen_grid,
+    decimate_figure,
+    decimate_indices,
+    lttb_indices,
+    minmax_indices,
+    parse_range,
+)
+
+
+def test_minmax_keeps_the_ends_and_extremes():
+    y = np.sin(np.linspace(0, 20, 1001))
+    y[500] = 5
+    indices = minmax_indices(y, 10)
+    assert indices[0] == 0 and indices[-1] == len(y) - 1
+    assert 500 in indices and np.argmin(y) in indices
+    assert np.all(np.diff(indices) > 0)
+    assert len(indices) <= 2 * 10 + 2
+
+
+def test_lttb_selects_sorted_points():
+    x = np.linspace(0, 1, 500)
+    y = np.cos(8 * x)
+    indices = lttb_indices(x, y, 50)
+    assert len(indices) == 50
+    assert indices[0] == 0 and indices[-1] == 499
+    assert np.all(np.diff(indices) > 0)
+    assert np.array_equal(lttb_indices(x[:10], y[:10], 20), np.arange(10))
+
+
+def test_decimation_of_long_lines_keeps_spikes():
+    x = np.arange(100_000, dtype=float)
+    y = np.zeros_like(x)
+    y[54321] = 1
+    indices = decimate_indices(x, y, 100)
+    assert len(indices) <= 100
+    assert 54321 in indices
+
+
+@pytest.mark.parametrize("axis_range", [[1], "ab", [1, 2, 3]])
+def test_invalid_ranges(axis_range):
+    with pytest.raises(ValueError):
+        parse_range(axis_range)
+
+
+def test_ranges_are_sorted():
+    assert parse_range(None) is None
+    assert parse_range([3, "1"]) == (1.0, 3.0)
+
+
+def test_decimate_figure():
+    x = np.arange(1000)
+    figure = {
+        "data": [
+            {"type": "scatter", "x": x, "y": x**2, "text": [str(v) for v in x]},
+            {"type": "bar", "x": x, "y": x},
+        ],
+        "layout": {"title": {"text": "Plot"}},
+    }
+    decimated, reduced = decimate_figure(figure, max_points=100)
+    assert reduced
+    line = decimated["data"][0]
+    assert len(line["x"]) == len(line["y"]) == len(line["text"]) <= 100
+    assert np.array_equal(line["y"], line["x"] ** 2)
+    assert decimated["data"][1] is figure["data"][1]
+    assert len(figure["data"][0]["x"]) == 1000  # Unchanged
+
+    assert decimate_figure(figure, max_points=1000) == (figure, False)
+
+
+def test_zoom_keeps_the_range():
+    x = np.arange(1000)
+    figure = {"data": [{"x": x, "y": x}], "layout": {"xaxis": {"title": "x"}}}
+    zoomed, reduced = decimate_figure(figure, max_points=100, x_range=[100, 200])
+    assert reduced
+    assert zoomed["data"][0]["x"].min() == 99 and zoomed["data"][0]["x"].max() == 201
+    assert zoomed["layout"]["xaxis"] == {"title": "x", "range": [100.0, 200.0], "autorange": False}
+
+
+def test_coarsen_grid():
+    z = np.arange(100 * 60, dtype=float).reshape(100, 60)
+    trace = {"type": "heatmap", "z": z, "x0": 0, "dx": 1, "text": "cells"}
+    coarsened = coarsen_grid(trace, 30, None, None)
+    assert coarsened["z"].shape == (25, 30)
+    assert coarsened["z"][0, 0] == z[:4, :2].mean()
+    assert np.array_equal(coarsened["x"], np.arange(0, 60, 2) + 0.5)
+    assert "dx" not in coarsened and "text" not in coarsened
+    assert coarsen_grid(trace, 100, None, None) is None
+
+
+def test_coarsened_nan_blocks_stay_nan():
+    z = np.ones((4, 4))
+    z[:2, :2] = np.nan
+    coarsened = coarsen_grid({"z": z}, 2, None, None)
+    assert np.isnan(coarsened["z"][0, 0])
+    assert np.array_equal(coarsened["z"][1], [1, 1])
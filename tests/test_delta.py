@@ -0,0 +1,47 @@
+import json
+from types import SimpleNamespace
+
+from flask import Flask
+
+from wepps.delta import DELTA_VERSION, delta_payload, parse_known_stages, stage_hash
+from wepps.site import FragmentJSONProvider, Site
+from wepps.stage.fragments import make_fragment
+
+
+def dumps(stage):
+    return json.dumps(stage, separators=(",", ":"), sort_keys=True)
+
+
+def test_parse_known_stages():
+    assert parse_known_stages(None, "a,b") is None
+    assert parse_known_stages(str(DELTA_VERSION + 1), "a") is None
+    assert parse_known_stages(f" {DELTA_VERSION} ", None) == set()
+    assert parse_known_stages(str(DELTA_VERSION), "a, b,,") == {"a", "b"}
+
+
+def test_known_stages_are_referenced():
+    docs = {"title": "Docs", "text": "Text"}
+    plot = {"title": "Plot", "caption": "", "plot": None}
+    payload = {"docs": [docs], "settings": [], "plots": [plot, plot], "job": "id"}
+    known = {stage_hash(dumps(docs))}
+    delta = delta_payload(payload, known, dumps)
+
+    assert delta["delta"] == DELTA_VERSION
+    assert delta["job"] == "id"
+    assert delta["docs"] == [{"hash": stage_hash(dumps(docs))}]
+    # The second plot refers to the first one sent in the same response
+    first, second = delta["plots"]
+    assert first["stage"] == plot and second == {"hash": first["hash"]}
+    assert first["hash"] in known
+    assert payload["plots"] == [plot, plot]  # Unchanged
+
+
+def test_stages_hash_like_their_fragments():
+    app = Flask(__name__)
+    app.json = FragmentJSONProvider(app)
+    site = SimpleNamespace(flask_app=app)
+    # Nested deeper than the fragments embedded by the provider
+    stage = {"title": "Plot", "plot": {"layout": {"xaxis": {"range": [1, 2]}}, "data": []}}
+    hash = stage_hash(make_fragment(stage).json)
+    assert Site.delta(site, {"plots": [stage]}, set())["plots"][0]["hash"] == hash
+    assert Site.delta(site, {"plots": [make_fragment(stage)]}, {hash})["plots"] == [{"hash": hash}]
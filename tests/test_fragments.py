@@ -0,0 +1,58 @@
+import json
+
+import numpy as np
+from flask import Flask
+
+from wepps.site import FragmentJSONProvider
+from wepps.stage.fragments import JSONFragment, dumps_with_fragments, make_fragment
+from wepps.stage.parameters import Integer
+from wepps.stage.stages import DocsStage
+
+
+def flask_dumps(obj):
+    app = Flask(__name__)
+    app.json = FragmentJSONProvider(app)
+    with app.app_context():
+        return app.json.dumps(obj, separators=(",", ":"))
+
+
+def test_fragment_encoding_matches_flask():
+    data = {"title": "T", "text": "x", "a": [1, {"z": 1, "b": 2}]}
+    fragment = make_fragment(data)
+    assert isinstance(fragment, JSONFragment)
+    assert fragment == data
+    assert fragment.json == flask_dumps(data)
+    # Also when the data isn't a fragment, e.g. loaded from the disk cache
+    assert flask_dumps(dict(data)) == flask_dumps(fragment)
+
+
+def test_unencodable_data_is_returned_unchanged():
+    data = {"value": np.int64(1)}
+    assert not isinstance(make_fragment(data), JSONFragment)
+
+
+def test_fragments_are_embedded():
+    fragment = JSONFragment({"a": 1}, '{"a":"embedded"}')
+    encoded = dumps_with_fragments({"docs": [fragment]}, json.dumps)
+    assert json.loads(encoded) == {"docs": [{"a": "embedded"}]}
+    # Below the depth, the data is encoded instead
+    encoded = dumps_with_fragments({"docs": [fragment]}, json.dumps, depth=1)
+    assert json.loads(encoded) == {"docs": [{"a": 1}]}
+
+
+def test_memoized_serialization_is_invalidated():
+    stage = DocsStage("Title", "Text")
+    first = stage.serialize()
+    assert stage.serialize() is first
+    stage.text = "Changed"
+    assert stage.serialize()["text"] == "Changed"
+
+
+def test_overlay_keeps_the_template():
+    parameter = Integer("i", "i", "", "", False, 1)
+    overlay = parameter.overlay(value=3)
+    assert overlay.serialize()["value"] == 3
+    assert parameter.serialize()["value"] == 1
+    overlay.value = 4
+    assert overlay.serialize()["value"] == 4
+    assert overlay.overlay(name="j").template is parameter
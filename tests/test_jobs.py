@@ -0,0 +1,97 @@
+import threading
+import time
+from concurrent.futures import CancelledError
+
+import pytest
+
+from wepps.jobs import JobManager
+
+
+class BlockingCompute:
+    def __init__(self) -> None:
+        self.release = threading.Event()
+        self.calls: list[dict | None] = []
+
+    def __call__(self, app_name, request_data):
+        self.calls.append(request_data)
+        self.release.wait(5)
+        if request_data == "fail":
+            raise ValueError("failed")
+        return {"result": request_data}
+
+
+@pytest.fixture
+def compute():
+    compute = BlockingCompute()
+    yield compute
+    compute.release.set()
+
+
+@pytest.fixture
+def manager(compute):
+    manager = JobManager({}, workers=1, executor="thread", compute=compute)
+    yield manager
+    manager.shutdown()
+
+
+def test_unknown_executor():
+    with pytest.raises(ValueError):
+        JobManager({}, executor="fork")
+
+
+def test_identical_requests_are_coalesced(manager, compute):
+    first = manager.submit("a", "key", {"x": 1})
+    assert manager.submit("a", "key", {"x": 1}) is first
+    assert manager.submit("b", "key", {"x": 1}) is not first
+    compute.release.set()
+    assert manager.result(first, wait=5) == {"result": {"x": 1}}
+    assert first.status == "done"
+    # Finished jobs aren't in flight anymore, so the request is computed again
+    assert manager.submit("a", "key", {"x": 1}) is not first
+
+
+def test_result_waits_and_calls_on_done(manager, compute):
+    done = []
+    called = threading.Event()
+    job = manager.submit("a", "key", 1, lambda payload: (done.append(payload), called.set()))
+    assert manager.result(job, wait=0.01) is None
+    compute.release.set()
+    assert manager.result(job, wait=5) == {"result": 1}
+    assert called.wait(5)
+    assert done == [{"result": 1}]
+
+
+def test_pending_jobs_can_be_cancelled(manager, compute):
+    running = manager.submit("a", "first", 1)
+    pending = manager.submit("a", "second", 2)
+    assert pending.status == "pending"
+    assert manager.cancel(pending)
+    assert pending.status == "cancelled"
+    with pytest.raises(CancelledError):
+        manager.result(pending)
+    compute.release.set()
+    manager.result(running, wait=5)
+    assert not manager.cancel(running)
+    assert compute.calls == [1]
+
+
+def test_failed_jobs(manager, compute):
+    compute.release.set()
+    job = manager.submit("a", "key", "fail")
+    with pytest.raises(ValueError):
+        manager.result(job, wait=5)
+    assert job.status == "failed"
+
+
+def test_jobs_belong_to_their_app_and_expire(manager, compute):
+    compute.release.set()
+    job = manager.submit("a", "key", 1)
+    manager.result(job, wait=5)
+    for _ in range(500):  # Set by the done callback, which might run a bit later
+        if job.finished is not None:
+            break
+        time.sleep(0.01)
+    assert manager.get("a", job.id) is job
+    assert manager.get("b", job.id) is None
+    job.finished -= manager.ttl + 1
+    assert manager.get("a", job.id) is None
@@ -0,0 +1,88 @@
+import pickle
+
+import pytest
+
+from wepps.app import App
+from wepps.producers import StageProducer
+from wepps.stage.parameters import Integer
+from wepps.stage.stages import DocsStage, PlotsStage, SettingsStage
+
+
+class Counted:
+    def __init__(self, title: str) -> None:
+        self.title = title
+        self.calls = 0
+
+    def __call__(self, values):
+        self.calls += 1
+        return DocsStage(self.title, str(values))
+
+
+def test_stages_are_cached_by_their_dependencies():
+    function = Counted("A")
+    producer = StageProducer(function, depends_on=["S1.a", "S2"])
+    first = producer.produce({"S1": {"a": 1, "b": 1}, "S2": {"c": 1}})
+    assert producer.produce({"S1": {"a": 1, "b": 2}, "S2": {"c": 1}}) is first
+    assert function.calls == 1
+    producer.produce({"S1": {"a": 1, "b": 2}, "S2": {"c": 2}})
+    producer.produce({"S1": {"a": 2}, "S2": {"c": 2}})
+    assert function.calls == 3
+
+
+def test_missing_dependencies():
+    producer = StageProducer(Counted("A"), depends_on=["S1.a", "S3", "S4.x"])
+    assert producer.inputs({"S1": {}, "S4": 1}) == {"S1.a": None, "S3": None, "S4.x": None}
+
+
+def test_without_dependencies_all_settings_are_used():
+    function = Counted("A")
+    producer = StageProducer(function)
+    producer.produce({"S1": {"a": 1}})
+    producer.produce({"S1": {"a": 1}, "S2": {}})
+    assert function.calls == 2
+
+
+def test_other_stages_are_rejected():
+    producer = StageProducer(lambda values: {"title": "A"})
+    with pytest.raises(TypeError):
+        producer.produce({})
+
+
+def test_plots_are_frozen():
+    producer = StageProducer(lambda values: PlotsStage("Plot", plot={"data": []}))
+    stage = producer.produce({})
+    assert stage.serialize() is stage.serialize()
+
+
+def test_pickled_producers_start_with_an_empty_cache():
+    producer = StageProducer(Counted("A"), depends_on=["S1"], cache_size=3)
+    producer.produce({"S1": {"a": 1}})
+    copy = pickle.loads(pickle.dumps(producer))
+    assert copy.cache.max_size == 3
+    assert copy.cache.get(producer.key({"S1": {"a": 1}})) is None
+    assert copy.depends_on == ["S1"]
+
+
+class Produced(App):
+    def __init__(self) -> None:
+        super().__init__(title="Produced")
+        self.docs = [DocsStage("Docs", "")]
+        parameters = [Integer("a", "a", "", "1", False), Integer("b", "b", "", "1", False)]
+        self.settings = [SettingsStage("S1", "S1", parameters, False)]
+        self.first, self.second = Counted("A"), Counted("B")
+        self.producers = [
+            StageProducer(self.first, depends_on=["S1.a"]),
+            StageProducer(self.second, depends_on=["S1.b"]),
+        ]
+
+
+def test_apps_only_recompute_changed_stages():
+    app = Produced()
+    initial = app.compute(None)
+    assert initial.docs == app.docs and initial.settings == app.settings
+
+    stages = app.compute({"S1": {"a": "1", "b": "1"}})
+    assert [stage.title for stage in stages.docs] == ["A", "B"]
+    assert stages.settings[0].parameters[0].value == "1"
+    app.compute({"S1": {"a": "1", "b": "2"}})
+    assert (app.first.calls, app.second.calls) == (1, 2)
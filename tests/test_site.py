@@ -0,0 +1,149 @@
+import json
+import textwrap
+import threading
+
+import pytest
+
+from wepps.site import Site
+
+APP = '''
+import threading
+
+import plotly.graph_objects as go
+
+from wepps.app import App, ResponseError, ResponseStages
+import wepps.stage.stages as stages
+from wepps.stage.parameters import Integer
+
+s1 = stages.SettingsStage("S1", "Settings", [Integer("i", "i", "", "", False)], False)
+release = threading.Event()
+calls = []
+
+
+class Checked(App):
+    def __init__(self) -> None:
+        super().__init__(title="Checked", cacheable=True, max_concurrent=1, queue_timeout=0.05)
+        self.settings = [s1]
+
+    def compute(self, response_data):
+        r = ResponseStages()
+        if not response_data:
+            r.add_settings_stage(s1)
+            return r
+        i = s1.convert_to_types(response_data["S1"])["i"]
+        calls.append(i)
+        if i == 13:
+            raise ResponseError("Unlucky")
+        if i == 0:
+            raise ZeroDivisionError("division by zero")
+        if i == 99:
+            release.wait(5)
+        r.add_settings_stage(s1.copy_from_response(response_data["S1"]))
+        plot = go.Figure(go.Scatter(x=list(range(100)), y=[i * k for k in range(100)]))
+        r.add_plot_stage(stages.PlotsStage("Plot", plot=plot, max_points=10))
+        return r
+'''
+
+
+@pytest.fixture(scope="module")
+def site(tmp_path_factory):
+    root = tmp_path_factory.mktemp("project")
+    package = root / "site_test_apps"
+    (package / "demo").mkdir(parents=True)
+    (package / "__init__.py").write_text("")
+    (package / "demo" / "__init__.py").write_text("")
+    (package / "demo" / "checked.py").write_text(textwrap.dedent(APP))
+    (root / "README.md").write_text("# Test site\n")
+    with pytest.MonkeyPatch.context() as mp:
+        mp.chdir(root)
+        mp.syspath_prepend(str(root))
+        yield Site("site_test_apps")
+
+
+@pytest.fixture
+def client(site):
+    return site.flask_app.test_client()
+
+
+def compute(client, i, **kwargs):
+    return client.post("/demo/checked/compute", json={"S1": {"i": i}}, **kwargs)
+
+
+def test_compute_and_cache(site, client):
+    module = site.apps["demo.checked"].__class__.__module__
+    calls = __import__(module, fromlist=["calls"]).calls
+    first = compute(client, 3)
+    assert first.status_code == 200
+    assert first.get_json()["plots"][0]["lod"] is True
+    assert compute(client, "3").get_json() == first.get_json()
+    assert calls.count(3) == 1
+
+
+def test_errors(client):
+    invalid = compute(client, "x")
+    assert invalid.status_code == 400
+    assert invalid.get_json()["fields"] == {"S1": {"i": '"x" is not a valid Integer.'}}
+    rejected = compute(client, 13)
+    assert (rejected.status_code, rejected.get_data(as_text=True)) == (400, "Unlucky")
+    failed = compute(client, 0)
+    assert failed.status_code == 400
+    assert failed.get_data(as_text=True).startswith("<b>Internal Error</b>")
+
+
+def test_busy_apps_answer_503(site, client):
+    module = __import__(site.apps["demo.checked"].__class__.__module__, fromlist=["release"])
+    module.release.clear()
+    thread = threading.Thread(target=compute, args=(site.flask_app.test_client(), 99))
+    thread.start()
+    try:
+        for _ in range(100):
+            busy = compute(client, 98)
+            if busy.status_code == 503:
+                break
+        assert busy.status_code == 503
+        assert busy.headers["Retry-After"] == "1"
+        # Zooming into a plot which isn't remembered computes it with the same limit
+        zoom = client.post("/demo/checked/zoom", json={"request": {"S1": {"i": 97}}, "plot": 0})
+        assert zoom.status_code == 503
+    finally:
+        module.release.set()
+        thread.join()
+
+
+def test_streamed_errors(client):
+    headers = {"Accept": "application/x-ndjson"}
+    assert compute(client, 13, headers=headers).status_code == 400
+    streamed = compute(client, 4, headers=headers)
+    assert streamed.status_code == 200
+    assert "plots" in json.loads(streamed.get_data(as_text=True).splitlines()[-1])
+
+
+def test_zoom(client):
+    zoom = client.post(
+        "/demo/checked/zoom", json={"request": {"S1": {"i": 5}}, "plot": 0, "x_range": [10, 20]}
+    )
+    assert zoom.status_code == 200
+    assert zoom.get_json()["plot"]["layout"]["xaxis"]["range"] == [10, 20]
+    invalid = client.post(
+        "/demo/checked/zoom", json={"request": {"S1": {"i": 5}}, "plot": 0, "x_range": [1]}
+    )
+    assert invalid.status_code == 400
+    missing = client.post("/demo/checked/zoom", json={"request": {"S1": {"i": 5}}, "plot": 3})
+    assert (missing.status_code, missing.get_data(as_text=True)) == (400, "There is no plot 3.")
+
+
+def test_batch(client):
+    batch = client.post(
+        "/demo/checked/batch", json={"sweep": {"S1": {"i": [1, 13, "x"]}}}
+    ).get_json()
+    results = batch["results"]
+    assert "plots" in results[0]
+    assert results[1] == {"error": "Unlucky"}
+    assert "fields" in results[2]
+
+
+def test_index_renders_the_readme(site, client):
+    assert not hasattr(site, "index_text")
+    index = client.get("/")
+    assert index.status_code == 200
+    assert "Test site" in index.get_data(as_text=True)
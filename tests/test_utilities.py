@@ -0,0 +1,161 @@
+import importlib.util
+import os
+import sys
+import threading
+import types
+from concurrent.futures import CancelledError
+
+import numpy as np
+import plotly.graph_objects as go
+import pytest
+
+HAS_BLOCKOPS = importlib.util.find_spec("blockops") is not None
+if not HAS_BLOCKOPS:
+    # Only fine_error uses BlockProblem, which the other tests replace
+    sys.modules["blockops"] = types.ModuleType("blockops")
+    sys.modules["blockops"].BlockProblem = None
+
+from wepps import utilities  # noqa: E402
+
+
+@pytest.mark.parametrize("workers", [1, 3])
+def test_evaluate_lambda_grid(workers):
+    lam = np.linspace(-1, 1, 70).reshape(7, 10) * (1 + 1j)
+    progress = []
+    err = utilities.evaluate_lambda_grid(
+        np.abs, lam, chunkSize=16, workers=workers, progress=lambda *p: progress.append(p)
+    )
+    assert np.array_equal(err, np.abs(lam))
+    assert progress[-1] == (70, 70)
+
+
+def test_cancelled_evaluation():
+    cancel = threading.Event()
+    cancel.set()
+    with pytest.raises(CancelledError):
+        utilities.evaluate_lambda_grid(np.abs, np.ones(100), chunkSize=10, workers=2, cancel=cancel)
+
+
+def test_one_pool_is_shared_and_not_inherited():
+    utilities.evaluate_lambda_grid(np.abs, np.ones(100), chunkSize=10, workers=2)
+    pool = utilities._grid_pool
+    utilities.evaluate_lambda_grid(np.abs, np.ones(100), chunkSize=10, workers=3)
+    assert utilities._grid_pool is pool
+
+    pid = os.fork()
+    if pid == 0:  # The child has to start its own pool
+        fresh = utilities._grid_pool is None
+        err = utilities.evaluate_lambda_grid(np.abs, -np.ones(40), chunkSize=10, workers=2)
+        utilities._shutdown_grid_pool()
+        os._exit(0 if fresh and np.all(err == 1) else 1)
+    assert os.waitstatus_to_exitcode(os.waitpid(pid, 0)[1]) == 0
+
+
+@pytest.fixture
+def evaluations(monkeypatch):
+    calls = []
+
+    def evaluate_lambda_grid(function, lam, chunkSize=4096, workers=None, **kwargs):
+        calls.append(workers)
+        return np.abs(np.asarray(lam))
+
+    monkeypatch.setattr(utilities, "evaluate_lambda_grid", evaluate_lambda_grid)
+    utilities.discretization_error_grid.cache_clear()
+    utilities.adaptive_error_grid.cache_clear()
+    yield calls
+    utilities.discretization_error_grid.cache_clear()
+    utilities.adaptive_error_grid.cache_clear()
+
+
+PROBLEM = (4, 1.0, 3, "RK4", "LEGENDRE", "GAUSS", -2, 0, -1, 1, 9)
+
+
+def test_error_grid_is_cached_independently_of_workers(evaluations):
+    first = utilities.discretization_error_grid(*PROBLEM, workers=1)
+    again = utilities.discretization_error_grid(*PROBLEM, workers=4)
+    assert again is first
+    assert evaluations == [1]
+    reLam, imLam, err = first
+    assert err.shape == (9, 9) and not err.flags.writeable
+    assert err[0, 0] == abs(reLam[0] + 1j * imLam[0])
+
+    utilities.discretization_error_grid(*PROBLEM[:-1], 5, workers=4)
+    assert evaluations == [1, 4]
+
+
+def test_adaptive_grid_is_cached_independently_of_workers(evaluations):
+    first = utilities.adaptive_error_grid(*PROBLEM, -3, 1, workers=2)
+    assert utilities.adaptive_error_grid(*PROBLEM, -3, 1, workers=1) is first
+    assert set(evaluations) == {2}
+
+
+@pytest.mark.skipif(not HAS_BLOCKOPS, reason="Needs blockops")
+def test_fine_error_of_each_lambda():
+    lam = np.array([-1.0, -0.5 + 0.5j])
+    err = utilities.fine_error(lam, 2, 1.0, 3, "RK4", "LEGENDRE", "GAUSS")
+    assert err.shape == lam.shape
+    assert np.all(np.isfinite(err)) and np.all(err >= 0)
+
+
+def test_split_cells():
+    a0, a1, b0, b1 = utilities.split_cells(
+        np.array([0, 0]), np.array([4, 1]), np.array([0, 2]), np.array([2, 6])
+    )
+    cells = sorted(zip(a0, a1, b0, b1))
+    # The second cell has a width of one along a, so it's only split along b
+    assert cells == [(0, 1, 2, 4), (0, 1, 4, 6), (0, 2, 0, 1), (0, 2, 1, 2), (2, 4, 0, 1), (2, 4, 1, 2)]
+
+
+def test_refine_steep_and_crossing_cells():
+    logErr = np.array([[-3.0, -3.0, 0.0], [-3.0, -3.1, 0.0], [-3.0, -3.0, 0.0]])
+    a0, a1 = np.array([0, 0, 0]), np.array([2, 2, 1])
+    b0, b1 = np.array([0, 1, 0]), np.array([1, 2, 1])
+    refine = utilities.refine_cells(logErr, a0, a1, b0, b1, -5, 5, 0.5)
+    assert refine.tolist() == [False, True, False]  # The last is flat, but too small
+    logErr[2, 1] = -3.1  # Flat, but crossing eMin
+    refine = utilities.refine_cells(logErr, a0, a1, b0, b1, -3.05, 5, 0.5)
+    assert refine.tolist() == [True, True, False]
+
+
+def test_interpolate_cells_keeps_known_points():
+    logErr = np.full((3, 5), np.nan)
+    logErr[[0, 0, 2, 2], [0, 4, 0, 4]] = [0.0, 4.0, 2.0, 6.0]
+    logErr[1, 1] = 10.0
+    utilities.interpolate_cells(logErr, *(np.array([v]) for v in (0, 2, 0, 4)))
+    assert logErr[1, 1] == 10.0
+    assert logErr[1, 2] == 3.0 and logErr[0, 2] == 2.0
+
+
+def smooth_error(lam, **kwargs):
+    return 10.0 ** np.clip(np.real(lam), -6, 0)
+
+
+def test_adaptive_grid_approximates_the_full_grid(monkeypatch):
+    monkeypatch.setattr(utilities, "fine_error", smooth_error)
+    utilities.discretization_error_grid.cache_clear()
+    utilities.adaptive_error_grid.cache_clear()
+    problem = (4, 1.0, 3, "RK4", "LEGENDRE", "GAUSS", -8, 2, -1, 1, 65)
+    try:
+        reLam, imLam, full = utilities.discretization_error_grid(*problem)
+        reLam2, imLam2, err, evaluated = utilities.adaptive_error_grid(*problem, -7, 1, coarse=9)
+    finally:
+        utilities.discretization_error_grid.cache_clear()
+        utilities.adaptive_error_grid.cache_clear()
+    assert np.array_equal(reLam, reLam2) and np.array_equal(imLam, imLam2)
+    assert evaluated < full.size / 2
+    assert np.max(np.abs(np.log10(err) - np.log10(full))) < 0.5
+    assert not err.flags.writeable
+
+
+def test_figures_and_their_json(monkeypatch):
+    monkeypatch.setattr(utilities, "fine_error", smooth_error)
+    utilities.discretization_error_grid.cache_clear()
+    problem = (4, 1.0, 3, "RK4", "LEGENDRE", "GAUSS", "Z2N", -8, 2, -1, 1, 9, -6, 0)
+    try:
+        figure = utilities.fine_discretization_error_figure(*problem)
+        encoded = utilities.fine_discretization_error(*problem)
+    finally:
+        utilities.discretization_error_grid.cache_clear()
+    assert isinstance(figure, go.Figure)
+    assert encoded == figure.to_json()
+    assert utilities.compute_plot() == utilities.compute_plot_figure().to_json()
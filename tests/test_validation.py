@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+
+from wepps.stage.parameters import (
+    Array,
+    Boolean,
+    Enumeration,
+    Float,
+    FloatList,
+    Integer,
+    PositiveFloat,
+    StrictlyPositiveInteger,
+)
+from wepps.stage.stages import SettingsStage
+from wepps.stage.validation import ValidationError
+
+
+@pytest.fixture
+def stage():
+    return SettingsStage(
+        "S1",
+        "Settings",
+        [
+            Integer("i", "i", "", "", False),
+            StrictlyPositiveInteger("n", "n", "", "", False),
+            PositiveFloat("x", "x", "", "", True),
+            Enumeration("e", "e", "", "", False, ["A", "B"]),
+            Boolean("b", "b", "", "", False),
+            FloatList("l", "l", "", "", True),
+        ],
+        False,
+    )
+
+
+def test_values_are_converted(stage):
+    values = stage.convert_to_types(
+        {"i": "-3", "n": 2, "x": "1.5", "e": "B", "b": "false", "l": "1,2.5"}
+    )
+    assert values == {"i": -3, "n": 2, "x": 1.5, "e": "B", "b": False, "l": [1.0, 2.5]}
+
+
+def test_empty_optional_values_are_none(stage):
+    values = stage.convert_to_types({"i": 1, "n": 1, "x": " ", "e": "A", "b": True})
+    assert values["x"] is None
+    assert values["l"] is None
+
+
+def test_all_errors_are_reported(stage):
+    with pytest.raises(ValidationError) as info:
+        stage.convert_to_types({"i": "a", "n": "0", "x": "-1", "e": "C", "b": "maybe"})
+    assert set(info.value.errors["S1"]) == {"i", "n", "x", "e", "b"}
+    assert info.value.errors["S1"]["n"] == "Must be strictly positive."
+    serialized = info.value.serialize()
+    assert serialized["fields"] == info.value.errors
+    assert "<b>e</b>" in serialized["error"]
+
+
+def test_missing_required_values(stage):
+    with pytest.raises(ValidationError) as info:
+        stage.convert_to_types({})
+    assert info.value.errors["S1"]["i"] == "A value is required."
+    assert "x" not in info.value.errors["S1"]
+
+
+def test_non_finite_floats_are_rejected():
+    stage = SettingsStage("S", "S", [Float("f", "f", "", "", False)], False)
+    with pytest.raises(ValidationError):
+        stage.convert_to_types({"f": "nan"})
+
+
+def test_validator_follows_the_parameters():
+    stage = SettingsStage("S", "S", [Integer("i", "i", "", "", False)], False)
+    assert stage.validator is stage.validator
+    stage.parameters = [Array("a", "a", "", "", False, shape=(None, 2))]
+    values = stage.convert_to_types({"a": "1, 2, 3, 4"})
+    assert np.array_equal(values["a"], [[1, 2], [3, 4]])
+    with pytest.raises(ValidationError):
+        stage.convert_to_types({"a": "1, 2, 3"})